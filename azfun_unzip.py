@@ -1,47 +1,152 @@
+import io
+import json
 import os
-import tempfile
+import posixpath
 import zipfile
 import azure.functions as func
 
+# Size of each ranged read from the source blob and of each staged output block
+BLOCK_SIZE = 4 * 1024 * 1024
+
+# Extracted members go to this container, under a folder named after the archive
+OUTPUT_CONTAINER = os.environ.get("UNZIP_OUTPUT_CONTAINER", "unzipped")
+
+
+class BlobRangeReader(io.RawIOBase):
+    """Read-only, seekable file object over a blob.
+
+    Bytes are fetched with ranged downloads of at least block_size, so
+    zipfile only pulls the central directory and the members it reads
+    instead of the whole archive.
+    """
+
+    def __init__(self, blob_client, block_size=BLOCK_SIZE):
+        self._blob_client = blob_client
+        self._block_size = block_size
+        self.size = blob_client.get_blob_properties().size
+        self._position = 0
+        # Last fetched range
+        self._buffer = b""
+        self._buffer_start = 0
+        self.requests = 0
+        self.bytes_fetched = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence {whence}")
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+        self._position = position
+        return position
+
+    def _fetch(self, offset, length):
+        length = min(max(length, self._block_size), self.size - offset)
+        self._buffer = self._blob_client.download_blob(offset=offset, length=length).readall()
+        self._buffer_start = offset
+        self.requests += 1
+        self.bytes_fetched += len(self._buffer)
+
+    def readinto(self, buffer):
+        if self._position >= self.size:
+            return 0
+        wanted = min(len(buffer), self.size - self._position)
+        start = self._position - self._buffer_start
+        count = 0
+        if 0 <= start < len(self._buffer):
+            # Use up what the last range still holds before fetching more
+            count = min(wanted, len(self._buffer) - start)
+            buffer[:count] = self._buffer[start:start + count]
+        if count < wanted:
+            # Continue from the end of the buffer so no byte is downloaded twice
+            self._fetch(self._position + count, wanted - count)
+            buffer[count:wanted] = self._buffer[:wanted - count]
+        self._position += wanted
+        return wanted
+
+
+def safe_member_name(name):
+    """Normalised relative path of a zip member, or None for directories and paths escaping the archive."""
+    name = posixpath.normpath(name.replace("\\", "/"))
+    if name in (".", "") or name.startswith("/") or name == ".." or name.startswith("../"):
+        return None
+    return name
+
+
+def stream_member_to_blob(member_file, blob_client, block_size=BLOCK_SIZE):
+    """Copy a readable stream to a block blob one staged block at a time; returns the bytes written."""
+    block_ids = []
+    written = 0
+    while True:
+        data = member_file.read(block_size)
+        if not data:
+            break
+        # Block ids must all have the same length within a blob
+        block_id = f"{len(block_ids):08d}"
+        blob_client.stage_block(block_id, data, length=len(data))
+        block_ids.append(block_id)
+        written += len(data)
+    blob_client.commit_block_list(block_ids)
+    return written
+
+
+def unzip_blob_to_container(source_blob_client, container_client, prefix="", members=None,
+                            block_size=BLOCK_SIZE):
+    """Stream each member of a zip blob into its own blob named prefix + member name.
+
+    members optionally limits extraction to those member names. Memory use is
+    about two blocks regardless of the archive size and nothing touches the
+    local disk. Returns one {'name', 'blob', 'size'} entry per extracted member.
+    """
+    extracted = []
+    reader = BlobRangeReader(source_blob_client, block_size)
+    with zipfile.ZipFile(reader) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or (members is not None and info.filename not in members):
+                continue
+            name = safe_member_name(info.filename)
+            if name is None:
+                print(f"Skipping unsafe member name: {info.filename}")
+                continue
+            blob_name = prefix + name
+            with archive.open(info) as member_file:
+                size = stream_member_to_blob(member_file, container_client.get_blob_client(blob_name), block_size)
+            extracted.append({"name": info.filename, "blob": blob_name, "size": size})
+    print(f"Extracted {len(extracted)} members with {reader.requests} ranged reads "
+          f"({reader.bytes_fetched} of {reader.size} archive bytes)")
+    return extracted
+
+
 def unzip_blob(trigger: func.BlobTrigger, outputblob: func.Out[str]) -> None:
     # Get the blob name
     blob_name = os.path.basename(trigger.name)
 
-    # Temporary directory to extract files
-    temp_dir = tempfile.mkdtemp()
-
-    # Path to save the extracted files
-    extract_path = os.path.join(temp_dir, blob_name)
-
     # Connect to Azure Blob Storage
     blob_service_client = trigger.bindings[0].blob_service_client
 
-    # Get the blob
+    # Read the archive in place; members are streamed to OUTPUT_CONTAINER/<archive name>/
     blob_client = blob_service_client.get_blob_client(container=trigger.container_name, blob=trigger.name)
-    blob_properties = blob_client.get_blob_properties()
+    container_client = blob_service_client.get_container_client(OUTPUT_CONTAINER)
 
     try:
-        # Download the blob into a temporary file
-        download_path = os.path.join(temp_dir, blob_name)
-        with open(download_path, "wb") as file:
-            download_stream = blob_client.download_blob()
-            file.write(download_stream.readall())
-
-        # Unzip the file
-        with zipfile.ZipFile(download_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_path)
-
-        # List extracted files for demonstration purposes
-        extracted_files = os.listdir(extract_path)
-        for file_name in extracted_files:
-            file_path = os.path.join(extract_path, file_name)
-            with open(file_path, 'rb') as file:
-                outputblob.set(file.read())
-                # Here, you can process the extracted files as needed (e.g., upload to another location)
-
-        # Clean up temporary directory
-        os.remove(download_path)
-        os.rmdir(temp_dir)
+        extracted = unzip_blob_to_container(blob_client, container_client, prefix=f"{blob_name}/")
+
+        # The output binding can only take a whole value, so it gets the list of extracted blobs
+        outputblob.set(json.dumps(extracted))
     except Exception as e:
         # Handle exceptions
         print(f"Error: {e}")
@@ -1,17 +1,89 @@
 import azure.functions as func
 import azure.durable_functions as df
 
+# Function names as registered in the function app
+ORCHESTRATOR_NAME = "OrchestratorFunction"
+BATCH_ACTIVITY_NAME = "BatchActivityFunction"
+
+# Items handled by one activity call, activity calls (or sub-orchestrations)
+# pending at once, and the input size above which the items are split
+# across sub-orchestrations so no single history grows without bound
+BATCH_SIZE = 100
+MAX_IN_FLIGHT = 20
+MAX_SUB_ORCHESTRATIONS = 10
+SUB_ORCHESTRATION_ITEMS = 10000
+
+
+def fan_out_settings(input_data):
+    """Split the orchestration input into (items, settings).
+
+    The input is either the list of items or a dict with "items" and any
+    of batch_size, max_in_flight, max_sub_orchestrations,
+    sub_orchestration_items and sub_orchestration.
+    """
+    settings = {
+        "batch_size": BATCH_SIZE,
+        "max_in_flight": MAX_IN_FLIGHT,
+        "max_sub_orchestrations": MAX_SUB_ORCHESTRATIONS,
+        "sub_orchestration_items": SUB_ORCHESTRATION_ITEMS,
+        "sub_orchestration": False,
+    }
+    if isinstance(input_data, dict):
+        items = input_data.get("items") or []
+        settings.update({key: input_data[key] for key in settings if key in input_data})
+    else:
+        items = input_data or []
+    return items, settings
+
+
+def windowed(context, task_factories, max_in_flight):
+    """Run tasks with at most max_in_flight pending, starting the next as each one finishes.
+
+    task_factories is a list of callables that create (and so schedule)
+    one task each; they are only called when the window has room. Use with
+    "yield from"; returns the task results in factory order.
+    """
+    results = [None] * len(task_factories)
+    pending = []
+    next_index = 0
+    while next_index < len(task_factories) or pending:
+        while next_index < len(task_factories) and len(pending) < max(max_in_flight, 1):
+            pending.append((next_index, task_factories[next_index]()))
+            next_index += 1
+        done = yield context.task_any([task for _, task in pending])
+        position = next(i for i, (_, task) in enumerate(pending) if task is done)
+        index, task = pending.pop(position)
+        # Yielding the finished task returns its result at once, or raises if it failed
+        results[index] = yield task
+    return results
+
+
 def orchestrator_function(context: df.DurableOrchestrationContext):
     # Retrieve input data
-    input_data = context.get_input()
+    items, settings = fan_out_settings(context.get_input())
 
-    # Define tasks to be executed in parallel
-    tasks = []
-    for item in input_data:
-        tasks.append(context.call_activity("ActivityFunction", item))
+    if len(items) > settings["sub_orchestration_items"]:
+        # Very large inputs: one sub-orchestration per slice, each fanning out on its own
+        size = settings["sub_orchestration_items"]
+        factories = []
+        for number, start in enumerate(range(0, len(items), size)):
+            sub_input = dict(settings, items=items[start:start + size], sub_orchestration=True)
+            instance_id = f"{context.instance_id}:{number}"
+            factories.append(lambda sub_input=sub_input, instance_id=instance_id:
+                             context.call_sub_orchestrator(ORCHESTRATOR_NAME, sub_input, instance_id))
+        sub_results = yield from windowed(context, factories, settings["max_sub_orchestrations"])
+        results = [result for sub_result in sub_results for result in sub_result]
+    else:
+        # One activity call per batch of items, with a bounded number pending
+        size = max(settings["batch_size"], 1)
+        factories = [lambda batch=items[start:start + size]: context.call_activity(BATCH_ACTIVITY_NAME, batch)
+                     for start in range(0, len(items), size)]
+        batch_results = yield from windowed(context, factories, settings["max_in_flight"])
+        results = [result for batch_result in batch_results for result in batch_result]
 
-    # Wait for all parallel tasks to complete
-    results = yield context.task_all(tasks)
+    if settings["sub_orchestration"]:
+        # The parent merges every slice before the final processing
+        return results
 
     # Perform some final processing with the results
     final_result = process_results(results)
@@ -32,3 +104,7 @@ def activity_function(context: df.DurableActivityContext, input_data):
     result = process_activity(input_data)
 
     return result
+
+# Batch activity function: one call processes a whole batch of items
+def batch_activity_function(context: df.DurableActivityContext, batch):
+    return [process_activity(item) for item in batch]
@@ -0,0 +1,259 @@
+"""
+Local stand-in for the Durable Functions runtime, for measuring orchestrators
+without Azure. The orchestrator generator is replayed from the start on every
+episode, as the real runtime does: tasks that already completed in the
+history resolve immediately, and the episode ends at the first yield that is
+still waiting. Activities then run in-process, completions_per_episode at a
+time (the runtime delivers queued completions in batches), and the next
+episode begins. Sub-orchestrations run as nested harness runs.
+
+Supports get_input, instance_id, is_replaying, call_activity,
+call_sub_orchestrator, task_all and task_any. Inputs and results go through
+a JSON round trip like the real payloads.
+"""
+
+import argparse
+import json
+import time
+from collections import Counter
+
+
+class HarnessTask:
+    def __init__(self, sequence, kind, name, input_data):
+        self.sequence = sequence
+        self.kind = kind
+        self.name = name
+        self.input = input_data
+        self.is_completed = False
+        self.is_faulted = False
+        self.result = None
+        self.exception = None
+        self._completion = None
+
+
+class _TaskSet:
+    def __init__(self, mode, tasks):
+        self.mode = mode
+        self.tasks = list(tasks)
+
+
+class HarnessContext:
+    """What the orchestrator sees during one episode."""
+
+    def __init__(self, run, episode_start):
+        self._run = run
+        self._episode_start = episode_start
+        self._sequence = 0
+        self.instance_id = run.instance_id
+        self.is_replaying = True
+
+    def get_input(self):
+        return json.loads(self._run.input_json)
+
+    def _task(self, kind, name, input_data):
+        sequence = self._sequence
+        self._sequence += 1
+        run = self._run
+        if sequence in run.scheduled:
+            scheduled_kind, scheduled_name, _ = run.scheduled[sequence]
+            if (scheduled_kind, scheduled_name) != (kind, name):
+                raise RuntimeError(f"Non-deterministic orchestrator: task {sequence} was {scheduled_name}, now {name}")
+        else:
+            run.schedule(sequence, kind, name, input_data)
+        task = HarnessTask(sequence, kind, name, input_data)
+        if sequence in run.completed:
+            task._completion, ok, value = run.completed[sequence]
+            task.is_completed = True
+            if ok:
+                task.result = value
+            else:
+                task.is_faulted = True
+                task.exception = value
+        return task
+
+    def call_activity(self, name, input_=None):
+        return self._task("activity", name, input_)
+
+    def call_sub_orchestrator(self, name, input_=None, instance_id=None):
+        return self._task("orchestrator", name, {"input": input_, "instance_id": instance_id})
+
+    def task_all(self, activities):
+        return _TaskSet("all", activities)
+
+    def task_any(self, activities):
+        return _TaskSet("any", activities)
+
+    def resolve(self, awaited):
+        """Return (ready, value, exception) for a yielded task or task set."""
+        tasks = [awaited] if isinstance(awaited, HarnessTask) else awaited.tasks
+        completed = [task for task in tasks if task.is_completed]
+        if isinstance(awaited, _TaskSet) and awaited.mode == "any":
+            if not completed:
+                return False, None, None
+            first = min(completed, key=lambda task: task._completion)
+            self._mark_live(first)
+            return True, first, None
+        faulted = sorted((task for task in completed if task.is_faulted), key=lambda task: task._completion)
+        if faulted:
+            self._mark_live(faulted[0])
+            return True, None, faulted[0].exception
+        if len(completed) < len(tasks):
+            return False, None, None
+        for task in completed:
+            self._mark_live(task)
+        if isinstance(awaited, HarnessTask):
+            return True, awaited.result, None
+        return True, [task.result for task in tasks], None
+
+    def _mark_live(self, task):
+        # Past the completions seen by earlier episodes the orchestrator is running live
+        if task._completion >= self._episode_start:
+            self.is_replaying = False
+
+
+class OrchestrationRun:
+    """One orchestration instance: its history and the episodes replaying it."""
+
+    def __init__(self, orchestrator, input_data, activities, orchestrators=None, completions_per_episode=1,
+                 instance_id="harness", stats=None):
+        self.orchestrator = orchestrator
+        self.input_json = json.dumps(input_data)
+        self.activities = activities
+        self.orchestrators = orchestrators or {}
+        self.completions_per_episode = completions_per_episode
+        self.instance_id = instance_id
+        # sequence -> (kind, name, input) and sequence -> (completion number, ok, value)
+        self.scheduled = {}
+        self.completed = {}
+        self.history_events = 0
+        self._completions_before = 0
+        self.stats = stats if stats is not None else Counter()
+        self.stats["payload_bytes"] += len(self.input_json)
+
+    def schedule(self, sequence, kind, name, input_data):
+        payload = json.dumps(input_data)
+        self.scheduled[sequence] = (kind, name, payload)
+        self.history_events += 1
+        self.stats["payload_bytes"] += len(payload)
+        self.stats["activities" if kind == "activity" else "sub_orchestrations"] += 1
+
+    def _complete(self, sequence):
+        kind, name, payload = self.scheduled[sequence]
+        input_data = json.loads(payload)
+        try:
+            if kind == "activity":
+                value = self.activities[name](input_data)
+            else:
+                nested = OrchestrationRun(self.orchestrators[name], input_data["input"], self.activities,
+                                          self.orchestrators, self.completions_per_episode,
+                                          input_data["instance_id"] or f"{self.instance_id}:{sequence}", self.stats)
+                value = nested.run()
+            result_json = json.dumps(value)
+            self.stats["payload_bytes"] += len(result_json)
+            self.completed[sequence] = (len(self.completed), True, json.loads(result_json))
+        except Exception as e:
+            self.completed[sequence] = (len(self.completed), False, e)
+        self.history_events += 1
+
+    def _episode(self):
+        """Replay the orchestrator; returns (finished, output)."""
+        self.stats["episodes"] += 1
+        self.stats["replayed_events"] += self.history_events
+        self.stats["max_history_events"] = max(self.stats["max_history_events"], self.history_events)
+        context = HarnessContext(self, self._completions_before)
+        generator = self.orchestrator(context)
+        value, exception = None, None
+        while True:
+            try:
+                awaited = generator.throw(exception) if exception is not None else generator.send(value)
+            except StopIteration as stop:
+                return True, stop.value
+            self.stats["yields"] += 1
+            ready, value, exception = context.resolve(awaited)
+            if not ready:
+                return False, None
+
+    def run(self):
+        """Run episodes until the orchestrator returns; returns its output."""
+        while True:
+            finished, output = self._episode()
+            if finished:
+                return output
+            outstanding = [sequence for sequence in self.scheduled if sequence not in self.completed]
+            if not outstanding:
+                raise RuntimeError("Orchestrator is waiting on a task that was never scheduled")
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], len(outstanding))
+            self._completions_before = len(self.completed)
+            for sequence in outstanding[:self.completions_per_episode]:
+                self._complete(sequence)
+
+
+def run_orchestration(orchestrator, input_data, activities, orchestrators=None, completions_per_episode=1):
+    """Run an orchestrator to completion; returns (output, stats).
+
+    activities and orchestrators map function names to callables (an
+    activity callable takes the activity input). stats totals episodes,
+    replayed history events, yields, scheduled activities and
+    sub-orchestrations and payload bytes over the whole run, with the
+    largest single history and the most tasks pending at once.
+    """
+    stats = Counter(dict.fromkeys(("episodes", "replayed_events", "max_history_events", "yields", "activities",
+                                   "sub_orchestrations", "max_in_flight", "payload_bytes"), 0))
+    start = time.perf_counter()
+    output = OrchestrationRun(orchestrator, input_data, activities, orchestrators, completions_per_episode,
+                              stats=stats).run()
+    stats["seconds"] = time.perf_counter() - start
+    return output, dict(stats)
+
+
+def per_item_orchestrator(context):
+    """The original fan-out: one activity per item and one task_all over all of them."""
+    results = yield context.task_all([context.call_activity("ActivityFunction", item)
+                                      for item in context.get_input()])
+    return results
+
+
+def benchmark(items=5000, completions_per_episode=10, batch_size=100, max_in_flight=20, sub_orchestration_items=1000):
+    """Compare the per-item fan-out with durable_fun's batched and sub-orchestrated modes."""
+    import durable_fun
+
+    # durable_fun leaves these to the function app; the benchmark only needs something cheap
+    process_activity = getattr(durable_fun, "process_activity", lambda item: item * 2)
+    durable_fun.process_activity = process_activity
+    if not hasattr(durable_fun, "process_results"):
+        durable_fun.process_results = lambda results: len(results)
+
+    activities = {
+        "ActivityFunction": process_activity,
+        durable_fun.BATCH_ACTIVITY_NAME: lambda batch: durable_fun.batch_activity_function(None, batch),
+    }
+    orchestrators = {durable_fun.ORCHESTRATOR_NAME: durable_fun.orchestrator_function}
+    data = list(range(items))
+    settings = {"batch_size": batch_size, "max_in_flight": max_in_flight}
+    cases = [
+        ("per item", per_item_orchestrator, data),
+        ("batched", durable_fun.orchestrator_function,
+         dict(settings, items=data, sub_orchestration_items=items)),
+        ("batched + sub-orchestrations", durable_fun.orchestrator_function,
+         dict(settings, items=data, sub_orchestration_items=sub_orchestration_items)),
+    ]
+    results = {}
+    for label, orchestrator, input_data in cases:
+        _, stats = run_orchestration(orchestrator, input_data, activities, orchestrators, completions_per_episode)
+        results[label] = stats
+        print(f"{label:<30} episodes {stats['episodes']:>6} replayed events {stats['replayed_events']:>10} "
+              f"max history {stats['max_history_events']:>7} activities {stats['activities']:>6} "
+              f"max in flight {stats['max_in_flight']:>6} {items / stats['seconds']:>10.0f} items/s")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure replay cost of the durable_fun orchestrator locally")
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--completions-per-episode", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--max-in-flight", type=int, default=20)
+    parser.add_argument("--sub-orchestration-items", type=int, default=1000)
+    args = parser.parse_args()
+    benchmark(args.items, args.completions_per_episode, args.batch_size, args.max_in_flight,
+              args.sub_orchestration_items)
@@ -1,28 +1,147 @@
 from azure.identity import DefaultAzureCredential
 from azure.keyvault.secrets import SecretClient
+from concurrent.futures import Future, ThreadPoolExecutor
 import logging
+import threading
+import time
 
-def retrieve_secret_from_keyvault():
-    logging.info('Retrieving secret from Azure Key Vault.')
+# Azure Key Vault URL and secret name
+KEY_VAULT_URL = "https://your-key-vault-name.vault.azure.net/"
+SECRET_NAME = "your-secret-name"
 
-    # Azure Key Vault URL and secret name
-    key_vault_url = "https://your-key-vault-name.vault.azure.net/"
-    secret_name = "your-secret-name"
+# Seconds a fetched secret is served from the cache, and how long past that
+# a stale value may still be returned while it is refreshed in the background
+DEFAULT_TTL = 300
+MAX_STALE = 600
 
-    try:
-        # Create a DefaultAzureCredential object to authenticate
-        credential = DefaultAzureCredential()
 
-        # Create a SecretClient using the key vault URL and credential
-        client = SecretClient(vault_url=key_vault_url, credential=credential)
+def default_client_factory():
+    # Create a DefaultAzureCredential object to authenticate and a SecretClient using it
+    return SecretClient(vault_url=KEY_VAULT_URL, credential=DefaultAzureCredential())
+
+
+class SecretCache:
+    """Process-wide cache of Key Vault secrets.
+
+    A secret is fetched once and served from memory for its TTL. Between
+    the TTL and TTL + max_stale the cached value is still returned, and a
+    single background refresh replaces it; after that, callers wait for a
+    fresh fetch. Concurrent requests for the same secret share one fetch.
+    The SecretClient is created once, from client_factory, on first use.
+    """
+
+    def __init__(self, client_factory=default_client_factory, ttl=DEFAULT_TTL, max_stale=MAX_STALE,
+                 clock=time.monotonic):
+        self._client_factory = client_factory
+        self._client = None
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._clock = clock
+        self._lock = threading.Lock()
+        # name -> (value, fetched_at, ttl)
+        self._entries = {}
+        # name -> Future of the fetch in progress
+        self._in_flight = {}
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="secret-refresh")
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self._client_factory()
+            return self._client
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "stale_hits": self.stale_hits, "misses": self.misses,
+                    "refreshes": self.refreshes, "errors": self.errors, "cached": len(self._entries)}
+
+    def _fetch(self, name, ttl, future):
+        try:
+            value = self.client.get_secret(name).value
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+                del self._in_flight[name]
+            future.set_exception(e)
+            return
+        with self._lock:
+            self._entries[name] = (value, self._clock(), ttl)
+            del self._in_flight[name]
+        future.set_result(value)
+
+    def _refresh(self, name, ttl, future):
+        try:
+            self._fetch(name, ttl, future)
+            future.result()
+        except Exception as e:
+            # The stale value keeps being served until max_stale runs out
+            logging.warning(f"Background refresh of secret '{name}' failed: {str(e)}")
 
-        # Get the secret value by its name
-        retrieved_secret = client.get_secret(secret_name)
+    def get(self, name, ttl=None):
+        """Return the secret's value, from the cache when it is fresh enough."""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            now = self._clock()
+            entry = self._entries.get(name)
+            if entry is not None:
+                value, fetched_at, entry_ttl = entry
+                age = now - fetched_at
+                if age < entry_ttl:
+                    self.hits += 1
+                    return value
+                if age < entry_ttl + self.max_stale:
+                    self.stale_hits += 1
+                    if name not in self._in_flight:
+                        future = self._in_flight[name] = Future()
+                        self.refreshes += 1
+                        self._refresher.submit(self._refresh, name, ttl, future)
+                    return value
 
-        # Access the secret value
-        secret_value = retrieved_secret.value
+            self.misses += 1
+            future = self._in_flight.get(name)
+            owner = future is None
+            if owner:
+                future = self._in_flight[name] = Future()
+        if owner:
+            self._fetch(name, ttl, future)
+        return future.result()
+
+    def invalidate(self, name=None):
+        """Drop one secret (or every secret) so the next get fetches it again."""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+
+_secret_cache = None
+_secret_cache_lock = threading.Lock()
+
+
+def get_secret_cache():
+    """The cache shared by every invocation in this worker process."""
+    global _secret_cache
+    with _secret_cache_lock:
+        if _secret_cache is None:
+            _secret_cache = SecretCache()
+        return _secret_cache
+
+
+def retrieve_secret_from_keyvault(secret_name=SECRET_NAME):
+    logging.info(f"Retrieving secret '{secret_name}' from Azure Key Vault.")
+
+    try:
+        # Served from the process-wide cache; only a miss goes to Key Vault
+        secret_value = get_secret_cache().get(secret_name)
 
-        logging.info(f"Retrieved Secret Value: {secret_value}")
+        logging.info(f"Retrieved secret '{secret_name}' ({get_secret_cache().stats()})")
         return secret_value
 
     except Exception as e:
@@ -0,0 +1,254 @@
+"""
+In-memory stand-in for the parts of azure.storage.blob used by these scripts
+(BlobServiceClient, ContainerClient, BlobClient), so the blob streaming code
+can be exercised locally without a storage account. Every call is counted in
+MemoryBlobServiceClient.calls and downloaded bytes in bytes_downloaded;
+fail_next() makes upcoming calls raise a transient ServiceRequestError, and
+latency / bytes_per_second slow transfers down like a remote service would.
+Every write gives the blob a new etag, and downloads honour
+match_condition=MatchConditions.IfNotModified against it.
+"""
+
+import enum
+import threading
+import time
+from collections import Counter
+
+try:
+    from azure.core import MatchConditions
+    from azure.core.exceptions import (ResourceExistsError, ResourceModifiedError, ResourceNotFoundError,
+                                       ServiceRequestError)
+except ImportError:
+    class MatchConditions(enum.Enum):
+        Unconditionally = 1
+        IfNotModified = 2
+        IfModified = 3
+        IfPresent = 4
+        IfMissing = 5
+
+    class ResourceNotFoundError(Exception):
+        pass
+
+    class ResourceExistsError(Exception):
+        pass
+
+    class ResourceModifiedError(Exception):
+        pass
+
+    class ServiceRequestError(Exception):
+        pass
+
+
+class BlobProperties:
+    def __init__(self, name, container, size, etag=None):
+        self.name = name
+        self.container = container
+        self.size = size
+        self.etag = etag
+
+
+class BlobBlock:
+    def __init__(self, block_id, size):
+        self.id = block_id
+        self.size = size
+
+
+class MemoryDownloader:
+    """Mimics StorageStreamDownloader for an already fetched byte range."""
+
+    def __init__(self, data, chunk_size=4 * 1024 * 1024):
+        self._data = data
+        self._chunk_size = chunk_size
+        self.size = len(data)
+
+    def readall(self):
+        return self._data
+
+    def readinto(self, stream):
+        stream.write(self._data)
+        return len(self._data)
+
+    def chunks(self):
+        for start in range(0, len(self._data), self._chunk_size):
+            yield self._data[start:start + self._chunk_size]
+
+
+class MemoryBlobClient:
+    def __init__(self, service, container, blob):
+        self._service = service
+        self.container_name = container
+        self.blob_name = blob
+
+    @property
+    def _key(self):
+        return self.container_name, self.blob_name
+
+    def _record(self, operation):
+        with self._service.lock:
+            self._service.calls[operation] += 1
+            if self._service.failures[operation] > 0:
+                self._service.failures[operation] -= 1
+                raise ServiceRequestError(f"Injected {operation} failure")
+
+    def _transfer(self, size):
+        # Sleeps outside the lock, so concurrent requests overlap like separate connections
+        delay = self._service.latency
+        if self._service.bytes_per_second:
+            delay += size / self._service.bytes_per_second
+        if delay:
+            time.sleep(delay)
+
+    def _committed(self):
+        try:
+            return self._service.blobs[self._key]
+        except KeyError:
+            raise ResourceNotFoundError(f"Blob {self.container_name}/{self.blob_name} not found") from None
+
+    def exists(self):
+        self._record('exists')
+        return self._key in self._service.blobs
+
+    def get_blob_properties(self, **kwargs):
+        self._record('get_blob_properties')
+        return BlobProperties(self.blob_name, self.container_name, len(self._committed()),
+                              self._service.etags.get(self._key))
+
+    def download_blob(self, offset=None, length=None, etag=None, match_condition=None, **kwargs):
+        """Download the whole blob, or length bytes (default: to the end) from offset."""
+        self._record('download_blob')
+        with self._service.lock:
+            data = self._committed()
+            current_etag = self._service.etags.get(self._key)
+        if match_condition == MatchConditions.IfNotModified and etag != current_etag:
+            raise ResourceModifiedError(f"Blob {self.container_name}/{self.blob_name} was modified")
+        if offset is None:
+            offset = 0
+        end = len(data) if length is None else min(offset + length, len(data))
+        if offset > len(data) or (offset == len(data) and data):
+            raise ValueError(f"Range {offset}-{end} not satisfiable for a blob of {len(data)} bytes")
+        chunk = bytes(data[offset:end])
+        self._transfer(len(chunk))
+        with self._service.lock:
+            self._service.bytes_downloaded += len(chunk)
+        return MemoryDownloader(chunk)
+
+    def upload_blob(self, data, overwrite=False, length=None, **kwargs):
+        self._record('upload_blob')
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            data = data.read() if length is None else data.read(length)
+        with self._service.lock:
+            if not overwrite and self._key in self._service.blobs:
+                raise ResourceExistsError(f"Blob {self.container_name}/{self.blob_name} already exists")
+            self._service.blobs[self._key] = bytes(data)
+            self._service.etags[self._key] = self._service.new_etag()
+            self._service.blocks.pop(self._key, None)
+
+    def stage_block(self, block_id, data, length=None, **kwargs):
+        self._record('stage_block')
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            data = data.read() if length is None else data.read(length)
+        self._transfer(len(data))
+        with self._service.lock:
+            self._service.uncommitted.setdefault(self._key, {})[block_id] = bytes(data)
+
+    def commit_block_list(self, block_list, **kwargs):
+        """Commit blocks by id (strings or objects with .id), from the staged or the committed blocks."""
+        self._record('commit_block_list')
+        with self._service.lock:
+            staged = self._service.uncommitted.get(self._key, {})
+            committed = dict(self._service.blocks.get(self._key, []))
+            blocks = []
+            for block in block_list:
+                block_id = getattr(block, 'id', block)
+                if block_id in staged:
+                    blocks.append((block_id, staged[block_id]))
+                elif block_id in committed:
+                    blocks.append((block_id, committed[block_id]))
+                else:
+                    raise ValueError(f"Block {block_id!r} was never staged")
+            self._service.blocks[self._key] = blocks
+            self._service.blobs[self._key] = b''.join(data for _, data in blocks)
+            self._service.etags[self._key] = self._service.new_etag()
+            # Committing discards every uncommitted block of the blob
+            self._service.uncommitted.pop(self._key, None)
+
+    def get_block_list(self, block_list_type='committed', **kwargs):
+        """Return (committed, uncommitted) lists of BlobBlock."""
+        self._record('get_block_list')
+        with self._service.lock:
+            committed = [BlobBlock(block_id, len(data)) for block_id, data in self._service.blocks.get(self._key, [])]
+            uncommitted = [BlobBlock(block_id, len(data))
+                           for block_id, data in self._service.uncommitted.get(self._key, {}).items()]
+        if block_list_type == 'committed':
+            return committed, []
+        if block_list_type == 'uncommitted':
+            return [], uncommitted
+        return committed, uncommitted
+
+    def delete_blob(self, **kwargs):
+        self._record('delete_blob')
+        with self._service.lock:
+            self._committed()
+            del self._service.blobs[self._key]
+            self._service.etags.pop(self._key, None)
+            self._service.blocks.pop(self._key, None)
+            self._service.uncommitted.pop(self._key, None)
+
+
+class MemoryContainerClient:
+    def __init__(self, service, container):
+        self._service = service
+        self.container_name = container
+
+    def get_blob_client(self, blob):
+        return MemoryBlobClient(self._service, self.container_name, blob)
+
+    def upload_blob(self, name, data, overwrite=False, **kwargs):
+        blob_client = self.get_blob_client(name)
+        blob_client.upload_blob(data, overwrite=overwrite, **kwargs)
+        return blob_client
+
+    def list_blobs(self, name_starts_with=None, **kwargs):
+        with self._service.lock:
+            keys = sorted(self._service.blobs)
+        for container, name in keys:
+            if container == self.container_name and name.startswith(name_starts_with or ''):
+                yield BlobProperties(name, container, len(self._service.blobs[container, name]))
+
+
+class MemoryBlobServiceClient:
+    """Holds every container's blobs in a dict keyed by (container, blob name)."""
+
+    def __init__(self):
+        self.blobs = {}
+        self.etags = {}
+        self.blocks = {}
+        self.uncommitted = {}
+        self.calls = Counter()
+        self.failures = Counter()
+        self.bytes_downloaded = 0
+        self.lock = threading.Lock()
+        # Simulated per-request latency (seconds) and per-connection bandwidth
+        self.latency = 0.0
+        self.bytes_per_second = None
+        self._etag_counter = 0
+
+    def fail_next(self, operation, count=1):
+        """Make the next count calls of operation (e.g. 'stage_block') raise ServiceRequestError."""
+        with self.lock:
+            self.failures[operation] += count
+
+    def new_etag(self):
+        """Next etag value; call with the lock held."""
+        self._etag_counter += 1
+        return f'"0x{self._etag_counter:X}"'
+
+    @classmethod
+    def from_connection_string(cls, connection_string, **kwargs):
+        return cls()
+
+    def get_container_client(self, container):
+        return MemoryContainerClient(self, container)
+
+    def get_blob_client(self, container, blob):
+        return MemoryBlobClient(self, container, blob)
@@ -1,17 +1,253 @@
+import argparse
+import asyncio
+import functools
+import os
+import signal
 import subprocess
+import sys
+import time
 
-def run_shell_command(command):
+# Bytes read from a pipe at a time; output is split into lines as it arrives
+READ_SIZE = 64 * 1024
+
+# Seconds a timed out or cancelled command gets after SIGTERM before SIGKILL,
+# and that output is drained for after the command exits
+KILL_GRACE = 5.0
+
+
+class CommandResult:
+    def __init__(self, command):
+        self.command = command
+        self.returncode = None
+        self.timed_out = False
+        self.cancelled = False
+        self.error = None
+        self.seconds = 0.0
+
+    @property
+    def ok(self):
+        return self.returncode == 0
+
+    def __repr__(self):
+        return (f"CommandResult({self.command!r}, returncode={self.returncode}, timed_out={self.timed_out}, "
+                f"error={self.error!r}, seconds={self.seconds:.3f})")
+
+
+def _line_sink(target):
+    """Turn a callback(line) or a writable text file into a callback; None discards the output."""
+    if target is None:
+        return None
+    if callable(target):
+        return target
+    return lambda line: target.write(line + "\n")
+
+
+def _fan_out(sinks):
+    if not sinks:
+        return None
+    if len(sinks) == 1:
+        return sinks[0]
+    return lambda line: [sink(line) for sink in sinks]
+
+
+async def _pump(stream, sink):
+    # Split on newlines as chunks arrive so only a partial line is ever held
+    pending = b""
+    while True:
+        chunk = await stream.read(READ_SIZE)
+        if not chunk:
+            break
+        if sink is None:
+            continue
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            sink(line.decode("utf-8", errors="replace").rstrip("\r"))
+    if pending and sink is not None:
+        sink(pending.decode("utf-8", errors="replace").rstrip("\r"))
+
+
+class _ExitProtocol(asyncio.subprocess.SubprocessStreamProtocol):
+    """Stream protocol that also resolves a future as soon as the process exits.
+
+    Process.wait() only returns once the pipes are closed as well, which a
+    background child holding them open can put off indefinitely.
+    """
+
+    def __init__(self, loop):
+        super().__init__(limit=READ_SIZE, loop=loop)
+        self.exited = loop.create_future()
+
+    def process_exited(self):
+        super().process_exited()
+        if not self.exited.done():
+            self.exited.set_result(None)
+
+
+async def _spawn(command, options):
+    """Start a command (argv list, or a string for the shell); returns (process, transport, exited future)."""
+    loop = asyncio.get_running_loop()
+    if isinstance(command, str):
+        transport, protocol = await loop.subprocess_shell(lambda: _ExitProtocol(loop), command, **options)
+    else:
+        transport, protocol = await loop.subprocess_exec(lambda: _ExitProtocol(loop), *command, **options)
+    return asyncio.subprocess.Process(transport, protocol, loop), transport, protocol.exited
+
+
+async def _stop(process, exited):
+    """Terminate the command's whole process group, killing it if it does not exit in time."""
+    def signal_group(sig):
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, sig)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+
+    signal_group(signal.SIGTERM)
     try:
-        result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        return result.stdout, result.stderr
-    except subprocess.CalledProcessError as e:
-        return None, e.stderr
-
-# Example usage
-command_to_run = "ls -l"
-stdout, stderr = run_shell_command(command_to_run)
-
-if stdout is not None:
-    print(f"Command output:\n{stdout}")
-else:
-    print(f"Command failed with error:\n{stderr}")
+        await asyncio.wait_for(asyncio.shield(exited), KILL_GRACE)
+    except asyncio.TimeoutError:
+        signal_group(signal.SIGKILL)
+        await exited
+
+
+async def run_command(command, on_stdout=None, on_stderr=None, timeout=None, cwd=None, env=None):
+    """Run one command, streaming its output line by line; returns a CommandResult.
+
+    A list is executed directly as argv, a string through the shell.
+    on_stdout / on_stderr take each line (without the newline) and may be
+    callables or writable text files. After timeout seconds, or when the
+    calling task is cancelled, the command's process group is terminated.
+    """
+    result = CommandResult(command)
+    start = time.monotonic()
+    options = dict(stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd, env=env,
+                   start_new_session=os.name == "posix")
+    try:
+        process, transport, exited = await _spawn(command, options)
+    except OSError as e:
+        result.error = str(e)
+        result.seconds = time.monotonic() - start
+        return result
+
+    pumps = asyncio.gather(_pump(process.stdout, _line_sink(on_stdout)), _pump(process.stderr, _line_sink(on_stderr)))
+    try:
+        await asyncio.wait_for(asyncio.shield(exited), timeout)
+    except asyncio.TimeoutError:
+        result.timed_out = True
+        await _stop(process, exited)
+    except asyncio.CancelledError:
+        result.cancelled = True
+        await _stop(process, exited)
+        pumps.cancel()
+        transport.close()
+        raise
+    finally:
+        result.returncode = process.returncode
+        result.seconds = time.monotonic() - start
+    # Output left in the pipes is still delivered, but a background child that keeps
+    # them open (e.g. "sleep 600 &") is only waited for up to KILL_GRACE seconds
+    try:
+        await asyncio.wait_for(pumps, KILL_GRACE)
+    except asyncio.TimeoutError:
+        pass
+    transport.close()
+    return result
+
+
+async def run_commands(commands, concurrency=8, timeout=None, on_stdout=None, on_stderr=None, log_dir=None,
+                       cwd=None, env=None):
+    """Run many commands with at most concurrency at once; returns their CommandResults in order.
+
+    on_stdout / on_stderr are called as (index, line) with the command's
+    position in commands. With log_dir each command's output is also
+    streamed to <log_dir>/<index>.out and .err.
+    """
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+
+    async def run_one(index, command):
+        async with semaphore:
+            files = []
+            sinks = []
+            try:
+                for callback, suffix in ((on_stdout, "out"), (on_stderr, "err")):
+                    targets = [] if callback is None else [functools.partial(callback, index)]
+                    if log_dir:
+                        log_file = open(os.path.join(log_dir, f"{index:04d}.{suffix}"), "w", encoding="utf-8")
+                        files.append(log_file)
+                        targets.append(_line_sink(log_file))
+                    sinks.append(_fan_out(targets))
+                return await run_command(command, sinks[0], sinks[1], timeout, cwd, env)
+            finally:
+                for log_file in files:
+                    log_file.close()
+
+    return await asyncio.gather(*(run_one(index, command) for index, command in enumerate(commands)))
+
+
+def run_shell_command(command, timeout=None):
+    """Run one command and return (stdout, stderr), or (None, stderr) if it failed."""
+    stdout, stderr = [], []
+    result = asyncio.run(run_command(command, stdout.append, stderr.append, timeout))
+    stderr_text = "".join(line + "\n" for line in stderr)
+    if not result.ok:
+        if result.error:
+            stderr_text += result.error
+        return None, stderr_text
+    return "".join(line + "\n" for line in stdout), stderr_text
+
+
+def benchmark(count=300, concurrency_levels=(1, 8, 32), workloads=("echo hello", "sleep 0.05")):
+    """Time count copies of each workload: serially through subprocess and the shell, then with the async runner.
+
+    "echo" measures process start-up cost; "sleep" stands in for commands
+    that mostly wait on the network, such as az or terraform calls.
+    """
+    results = {}
+    for workload in workloads:
+        start = time.perf_counter()
+        for _ in range(count):
+            subprocess.run(workload, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        serial = time.perf_counter() - start
+        results[(workload, "serial")] = serial
+        print(f"{workload:<12} serial subprocess shell : {serial:6.2f}s {count / serial:8.1f} commands/s")
+
+        for concurrency in concurrency_levels:
+            for label, command in (("argv", workload.split()), ("shell", workload)):
+                lines = []
+                start = time.perf_counter()
+                outcome = asyncio.run(run_commands([command] * count, concurrency,
+                                                   on_stdout=lambda index, line: lines.append(line)))
+                elapsed = time.perf_counter() - start
+                assert all(result.ok for result in outcome)
+                results[(workload, label, concurrency)] = elapsed
+                print(f"{workload:<12} async {label:<5} x{concurrency:<3}      : {elapsed:6.2f}s "
+                      f"{count / elapsed:8.1f} commands/s")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run shell commands concurrently, streaming their output")
+    parser.add_argument("commands", nargs="*", default=["ls -l"], help="Shell command strings to run")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=None)
+    parser.add_argument("--benchmark", action="store_true", help="Time a few hundred short commands instead")
+    parser.add_argument("--count", type=int, default=300)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.count)
+    else:
+        def show(stream):
+            return lambda index, line: print(f"[{index}] {line}", file=stream)
+
+        results = asyncio.run(run_commands(args.commands, args.concurrency, args.timeout,
+                                           show(sys.stdout), show(sys.stderr)))
+        for index, result in enumerate(results):
+            if not result.ok:
+                print(f"Command {index} failed: {result}")
+        sys.exit(0 if all(result.ok for result in results) else 1)
@@ -1,12 +1,160 @@
+import bisect
+import os
+import struct
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import snappy
 
-def compress_large_file(input_filename, output_filename, chunk_size=1024*1024):
+# Uncompressed bytes per block; blocks are compressed independently so they
+# can be spread over processes and decompressed on their own
+BLOCK_SIZE = 4 * 1024 * 1024
+
+_STREAM_IDENTIFIER = b'\xff\x06\x00\x00sNaPpY'
+
+# Skippable chunk types (0x80-0xfd) holding the block index and its footer;
+# standard snappy framing readers ignore them
+INDEX_CHUNK_TYPE = 0x99
+FOOTER_CHUNK_TYPE = 0x9a
+FOOTER_MAGIC = b'sNaPpYiX'
+_FOOTER = struct.Struct('<QQQ8s')
+_FOOTER_CHUNK_SIZE = 4 + _FOOTER.size
+_INDEX_ENTRY = struct.Struct('<QQ')
+
+
+def _chunk(chunk_type, body):
+    if len(body) >= 1 << 24:
+        raise ValueError("Chunk body too large for the snappy framing format")
+    return bytes([chunk_type]) + len(body).to_bytes(3, 'little') + body
+
+
+def compress_block(data):
+    """Frame one block as a complete snappy stream (stream identifier plus CRC-checked chunks)."""
+    return snappy.StreamCompressor().add_chunk(data)
+
+
+def _compressed_blocks(input_file, chunk_size, workers):
+    """Yield (uncompressed size, framed block) in file order, compressing up to 2 * workers blocks at once."""
+    def blocks():
+        while True:
+            chunk = input_file.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    if workers <= 1:
+        for chunk in blocks():
+            yield len(chunk), compress_block(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in blocks():
+            pending.append((len(chunk), executor.submit(compress_block, chunk)))
+            if len(pending) >= 2 * workers:
+                size, future = pending.popleft()
+                yield size, future.result()
+        while pending:
+            size, future = pending.popleft()
+            yield size, future.result()
+
+
+def compress_large_file(input_filename, output_filename, chunk_size=BLOCK_SIZE, workers=None):
+    """Compress a file to the snappy framing format with a trailing block index; returns the block count.
+
+    Blocks of chunk_size bytes are compressed across workers processes
+    (default: one per CPU) and written in order. Each block starts with its
+    own stream identifier, so the output is a valid framed stream for any
+    snappy reader and every block can also be decompressed on its own.
+    """
+    workers = workers or os.cpu_count() or 1
+    index = []
+    uncompressed_offset = 0
     with open(input_filename, 'rb') as input_file:
         with open(output_filename, 'wb') as output_file:
-            while True:
-                chunk = input_file.read(chunk_size)
-                if not chunk:
-                    break
+            output_file.write(_STREAM_IDENTIFIER)
+            for size, block in _compressed_blocks(input_file, chunk_size, workers):
+                index.append((uncompressed_offset, output_file.tell()))
+                output_file.write(block)
+                uncompressed_offset += size
+
+            index_offset = output_file.tell()
+            output_file.write(_chunk(INDEX_CHUNK_TYPE, b''.join(_INDEX_ENTRY.pack(*entry) for entry in index)))
+            output_file.write(_chunk(FOOTER_CHUNK_TYPE,
+                                     _FOOTER.pack(len(index), index_offset, uncompressed_offset, FOOTER_MAGIC)))
+    return len(index)
+
+
+def read_index(compressed_file):
+    """Read the block index of an indexed file.
+
+    Returns (entries, index_offset, uncompressed_size) where entries lists
+    (uncompressed offset, compressed offset) per block.
+    """
+    compressed_file.seek(0, os.SEEK_END)
+    if compressed_file.tell() < _FOOTER_CHUNK_SIZE:
+        raise ValueError("File is too short to hold a block index")
+    compressed_file.seek(-_FOOTER_CHUNK_SIZE, os.SEEK_END)
+    footer = compressed_file.read(_FOOTER_CHUNK_SIZE)
+    if footer[0] != FOOTER_CHUNK_TYPE or int.from_bytes(footer[1:4], 'little') != _FOOTER.size:
+        raise ValueError("No block index footer; the file was not written by compress_large_file")
+    count, index_offset, uncompressed_size, magic = _FOOTER.unpack(footer[4:])
+    if magic != FOOTER_MAGIC:
+        raise ValueError("Bad block index footer magic")
+
+    compressed_file.seek(index_offset)
+    header = compressed_file.read(4)
+    body = compressed_file.read(count * _INDEX_ENTRY.size)
+    if header[:1] != bytes([INDEX_CHUNK_TYPE]) or len(body) != count * _INDEX_ENTRY.size:
+        raise ValueError("Corrupt block index")
+    entries = [_INDEX_ENTRY.unpack_from(body, i * _INDEX_ENTRY.size) for i in range(count)]
+    return entries, index_offset, uncompressed_size
+
+
+def decompress_stream(input_file, output_file, read_size=1024 * 1024):
+    """Decompress a snappy framed stream from one file object to another, read_size bytes at a time."""
+    decompressor = snappy.StreamDecompressor()
+    total = 0
+    while True:
+        data = input_file.read(read_size)
+        if not data:
+            break
+        chunk = decompressor.decompress(data)
+        output_file.write(chunk)
+        total += len(chunk)
+    tail = decompressor.flush()
+    output_file.write(tail)
+    return total + len(tail)
+
+
+def decompress_large_file(input_filename, output_filename):
+    """Decompress a snappy framed file (indexed or not); returns the uncompressed size."""
+    with open(input_filename, 'rb') as input_file:
+        with open(output_filename, 'wb') as output_file:
+            return decompress_stream(input_file, output_file)
+
+
+def read_range(compressed_filename, start, length):
+    """Return uncompressed bytes [start, start + length) of an indexed file.
+
+    Only the blocks overlapping the range are read and decompressed.
+    """
+    with open(compressed_filename, 'rb') as compressed_file:
+        entries, index_offset, uncompressed_size = read_index(compressed_file)
+        end = min(start + length, uncompressed_size)
+        if start < 0 or length < 0:
+            raise ValueError("start and length must not be negative")
+        if start >= end:
+            return b''
+
+        offsets = [uncompressed for uncompressed, _ in entries]
+        first = bisect.bisect_right(offsets, start) - 1
+        last = bisect.bisect_left(offsets, end) - 1
+        block_start = entries[first][1]
+        block_end = entries[last + 1][1] if last + 1 < len(entries) else index_offset
 
-                compressed_chunk = snappy.compress(chunk)
-                output_file.write(compressed_chunk)
+        compressed_file.seek(block_start)
+        decompressor = snappy.StreamDecompressor()
+        data = decompressor.decompress(compressed_file.read(block_end - block_start)) + decompressor.flush()
+        skip = start - offsets[first]
+        return data[skip:skip + end - start]
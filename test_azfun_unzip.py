@@ -0,0 +1,77 @@
+import io
+import os
+import random
+import zipfile
+
+import pytest
+
+pytest.importorskip("azure.functions")
+
+from azfun_unzip import BlobRangeReader, safe_member_name, unzip_blob_to_container
+from memory_blob import MemoryBlobServiceClient
+
+BLOCK_SIZE = 64 * 1024
+
+
+def make_archive():
+    rng = random.Random(17)
+    members = {
+        "stored.bin": os.urandom(300 * 1024),
+        "docs/deflated.txt": "".join(f"line {rng.randint(0, 10 ** 9)}\n" for _ in range(60000)).encode(),
+        "../escape.txt": b"outside",
+        "empty.txt": b"",
+    }
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr(zipfile.ZipInfo("docs/"), b"")
+        archive.writestr("stored.bin", members["stored.bin"], compress_type=zipfile.ZIP_STORED)
+        archive.writestr("docs/deflated.txt", members["docs/deflated.txt"], compress_type=zipfile.ZIP_DEFLATED)
+        archive.writestr("../escape.txt", members["../escape.txt"], compress_type=zipfile.ZIP_DEFLATED)
+        archive.writestr("empty.txt", b"")
+    return buffer.getvalue(), members
+
+
+@pytest.fixture
+def service():
+    data, members = make_archive()
+    service = MemoryBlobServiceClient()
+    service.get_container_client("uploads").upload_blob("archive.zip", data)
+    service.archive, service.members = data, members
+    return service
+
+
+def test_safe_member_name():
+    assert safe_member_name("a/b/../c.txt") == "a/c.txt"
+    assert safe_member_name("dir\\file.txt") == "dir/file.txt"
+    for name in ("../escape.txt", "a/../../escape.txt", "/etc/passwd", "..", "./"):
+        assert safe_member_name(name) is None
+
+
+def test_unzip_blob_to_container(service):
+    source = service.get_blob_client("uploads", "archive.zip")
+    extracted = unzip_blob_to_container(source, service.get_container_client("out"), "archive.zip/",
+                                        block_size=BLOCK_SIZE)
+
+    assert sorted(entry["name"] for entry in extracted) == ["docs/deflated.txt", "empty.txt", "stored.bin"]
+    for name in ("stored.bin", "docs/deflated.txt", "empty.txt"):
+        assert service.blobs["out", f"archive.zip/{name}"] == service.members[name]
+    assert not any(container == "out" and "escape" in blob for container, blob in service.blobs)
+    # Every archive byte is downloaded about once, whatever crosses a range boundary
+    assert service.bytes_downloaded <= len(service.archive) + 2 * BLOCK_SIZE
+
+
+def test_reader_fetches_each_byte_once(service):
+    reader = BlobRangeReader(service.get_blob_client("uploads", "archive.zip"), BLOCK_SIZE)
+    with zipfile.ZipFile(reader) as archive:
+        for info in archive.infolist():
+            with archive.open(info) as member_file:
+                while member_file.read(100000):
+                    pass
+    assert reader.bytes_fetched <= len(service.archive) + 2 * BLOCK_SIZE
+
+    # Reads straddling the buffered range return the right bytes
+    reader.seek(BLOCK_SIZE - 10)
+    assert reader.read(BLOCK_SIZE + 20) == service.archive[BLOCK_SIZE - 10:2 * BLOCK_SIZE + 10]
+    reader.seek(-5, io.SEEK_END)
+    assert reader.read(100) == service.archive[-5:]
+    assert reader.read(100) == b""
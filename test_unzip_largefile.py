@@ -0,0 +1,79 @@
+import io
+import random
+import struct
+import zipfile
+
+import pytest
+
+pytest.importorskip("azure.functions")
+pytest.importorskip("azure.storage.blob")
+
+from azfun_unzip import BlobRangeReader
+from memory_blob import MemoryBlobServiceClient
+from unzip_largefile import repackage_zip, strip_zip64_extra, upload_chunks
+
+BLOCK_SIZE = 256 * 1024
+
+
+@pytest.fixture
+def source():
+    rng = random.Random(19)
+    members = {f"part{i}.txt": "".join(f"{rng.random()}\n" for _ in range(40000)).encode() for i in range(3)}
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data, compress_type=zipfile.ZIP_DEFLATED, compresslevel=6)
+        archive.writestr("stored.bin", b"\x00" * 1000, compress_type=zipfile.ZIP_STORED)
+    members["stored.bin"] = b"\x00" * 1000
+    service = MemoryBlobServiceClient()
+    service.get_container_client("uploads").upload_blob("archive.zip", buffer.getvalue())
+    return service, buffer.getvalue(), members
+
+
+@pytest.mark.parametrize("level", [None, 9])
+def test_repackage_from_blob_reads_archive_once(source, level):
+    service, data, members = source
+    reader = BlobRangeReader(service.get_blob_client("uploads", "archive.zip"), BLOCK_SIZE)
+    output = service.get_blob_client("repackaged", "archive.zip")
+    size = upload_chunks(repackage_zip(reader, level, workers=2, chunk_size=64 * 1024), output, BLOCK_SIZE)
+
+    repackaged = service.blobs["repackaged", "archive.zip"]
+    assert size == len(repackaged)
+    with zipfile.ZipFile(io.BytesIO(repackaged)) as archive:
+        assert archive.testzip() is None
+        assert {info.filename: archive.read(info) for info in archive.infolist()} == members
+    # Raw copies and recompression both read each source byte about once
+    assert reader.bytes_fetched <= len(data) + 2 * BLOCK_SIZE
+
+
+def local_extra(data, info):
+    name_length, extra_length = struct.unpack_from("<HH", data, info.header_offset + 26)
+    start = info.header_offset + 30 + name_length
+    return data[start:start + extra_length]
+
+
+@pytest.mark.parametrize("level", [None, 9])
+def test_repackage_keeps_extra_fields(level):
+    # Extended timestamp with the modification time only, as in the central directory
+    timestamp = struct.pack("<HHBI", 0x5455, 5, 1, 1700000000)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        info = zipfile.ZipInfo("stamped.txt", (2023, 11, 14, 22, 13, 20))
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.extra = timestamp
+        archive.writestr(info, b"stamped " * 1000)
+    repackaged = b"".join(repackage_zip(io.BytesIO(buffer.getvalue()), level, workers=1))
+
+    with zipfile.ZipFile(io.BytesIO(repackaged)) as archive:
+        assert archive.testzip() is None
+        info = archive.getinfo("stamped.txt")
+        assert info.extra == timestamp
+        assert local_extra(repackaged, info) == timestamp
+
+
+def test_strip_zip64_extra():
+    zip64 = struct.pack("<HHQ", 0x0001, 8, 2 ** 33)
+    aes = struct.pack("<HHH2sBH", 0x9901, 7, 2, b"AE", 3, 8)
+    assert strip_zip64_extra(zip64 + aes) == aes
+    assert strip_zip64_extra(aes + zip64) == aes
+    assert strip_zip64_extra(b"") == b""
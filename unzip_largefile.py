@@ -1,52 +1,329 @@
+import json
 import os
+import struct
+import threading
 import zipfile
-import tempfile
-import shutil
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import azure.functions as func
+from azure.storage.blob import BlobServiceClient
+
+from azfun_unzip import BlobRangeReader
+
+# Size of copied/recompressed pieces and of the staged output blocks
+CHUNK_SIZE = 1024 * 1024
+BLOCK_SIZE = 4 * 1024 * 1024
+
+# The repackaged archive is written to this container under the uploaded file's name
+OUTPUT_CONTAINER = os.environ.get("REPACK_OUTPUT_CONTAINER", "repackaged")
+
+# Deflate level to recompress members with; unset keeps the source compression
+REPACK_LEVEL = os.environ.get("REPACK_LEVEL")
+
+_ZIP64_LIMIT = 0xFFFFFFFF
+_ZIP64_COUNT_LIMIT = 0xFFFF
+_FLAG_DATA_DESCRIPTOR = 0x08
+# Flag bits 1-2 of deflated entries: 0 normal, 1 maximum, 2 fast, 3 super fast
+_FLAG_LEVEL_MASK = 0x06
+_ZIP64_EXTRA_ID = 0x0001
+
+# Shared across invocations of the same worker so its connection pool is reused
+_blob_service_client = None
+_client_lock = threading.Lock()
+
+
+def get_blob_service_client():
+    global _blob_service_client
+    with _client_lock:
+        if _blob_service_client is None:
+            _blob_service_client = BlobServiceClient.from_connection_string(os.environ["AzureWebJobsStorage"])
+        return _blob_service_client
+
+
+def _level_flags(level):
+    if level >= 8:
+        return 0x02
+    if level == 2:
+        return 0x04
+    if level <= 1:
+        return 0x06
+    return 0x00
+
+
+def _dos_date_time(date_time):
+    year, month, day, hour, minute, second = date_time
+    return ((max(year, 1980) - 1980) << 9 | month << 5 | day), (hour << 11 | minute << 5 | second // 2)
+
+
+def strip_zip64_extra(extra):
+    """An extra field without its ZIP64 record, which the writer recomputes; other records are kept as they are."""
+    kept = []
+    position = 0
+    while position + 4 <= len(extra):
+        header_id, length = struct.unpack_from("<HH", extra, position)
+        end = position + 4 + length
+        if end > len(extra):
+            break
+        if header_id != _ZIP64_EXTRA_ID:
+            kept.append(extra[position:end])
+        position = end
+    return b"".join(kept)
+
+
+def needs_recompression(info, level):
+    """Whether a member must be recompressed to honour level (None keeps every member as it is).
+
+    Deflated members are raw-copied when their level flags already match
+    the requested level; encrypted members are always raw-copied.
+    """
+    if level is None or info.flag_bits & 0x01 or info.is_dir():
+        return False
+    if info.compress_type != zipfile.ZIP_DEFLATED:
+        return True
+    return info.flag_bits & _FLAG_LEVEL_MASK != _level_flags(level)
+
+
+class ZipStreamWriter:
+    """Minimal zip writer producing bytes for a non-seekable output.
+
+    Raw-copied members are written with their known CRC and sizes;
+    recompressed members get a data descriptor since their compressed size
+    is only known afterwards. ZIP64 records are added when sizes, offsets
+    or the entry count need them; any other extra records (AES, timestamps)
+    of the source member are carried over.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self._central_directory = []
+
+    def _emit(self, data):
+        self.offset += len(data)
+        return data
+
+    def local_header(self, info, flags, method, crc, compress_size, file_size, descriptor, local_extra=b""):
+        """Bytes of a local file header; sizes are ignored (written as 0) when descriptor is True.
+
+        local_extra is the source member's local extra field; the central
+        directory gets info.extra. Their ZIP64 records are replaced.
+        """
+        name = info.filename.encode("utf-8")
+        if any(ord(c) > 127 for c in info.filename):
+            flags |= 0x800
+        zip64 = file_size >= _ZIP64_LIMIT or compress_size >= _ZIP64_LIMIT
+        if descriptor:
+            flags |= _FLAG_DATA_DESCRIPTOR
+            crc = 0
+            compress_size = file_size = 0
+        extra = strip_zip64_extra(local_extra)
+        if zip64:
+            extra = struct.pack("<HHQQ", _ZIP64_EXTRA_ID, 16, file_size, compress_size) + extra
+            compress_size = file_size = _ZIP64_LIMIT
+        date, time = _dos_date_time(info.date_time)
+        self._pending = {
+            "info": info, "name": name, "flags": flags, "method": method, "date": date, "time": time,
+            "offset": self.offset, "zip64": zip64, "extra": strip_zip64_extra(info.extra),
+        }
+        header = struct.pack("<IHHHHHIIIHH", 0x04034B50, 45 if zip64 else 20, flags, method, time, date,
+                             crc, compress_size, file_size, len(name), len(extra))
+        return self._emit(header + name + extra)
+
+    def data(self, chunk):
+        return self._emit(chunk)
+
+    def end_member(self, crc, compress_size, file_size, descriptor):
+        """Finish the current member; returns its data descriptor bytes (empty when not needed)."""
+        entry = dict(self._pending, crc=crc, compress_size=compress_size, file_size=file_size)
+        self._central_directory.append(entry)
+        if not descriptor:
+            return b""
+        if entry["zip64"]:
+            return self._emit(struct.pack("<IIQQ", 0x08074B50, crc, compress_size, file_size))
+        return self._emit(struct.pack("<IIII", 0x08074B50, crc, compress_size, file_size))
+
+    def finish(self, comment=b""):
+        """Bytes of the central directory and end records."""
+        start = self.offset
+        records = []
+        for entry in self._central_directory:
+            info = entry["info"]
+            sizes = [entry["file_size"], entry["compress_size"], entry["offset"]]
+            zip64_values = [value for value in sizes if value >= _ZIP64_LIMIT]
+            extra = struct.pack("<HH", _ZIP64_EXTRA_ID, 8 * len(zip64_values)) + b"".join(
+                struct.pack("<Q", value) for value in zip64_values) if zip64_values else b""
+            extra += entry["extra"]
+            file_size, compress_size, offset = [min(value, _ZIP64_LIMIT) for value in sizes]
+            version_needed = 45 if zip64_values or entry["zip64"] else 20
+            records.append(struct.pack(
+                "<IBBHHHHHIIIHHHHHII", 0x02014B50, version_needed, info.create_system, version_needed,
+                entry["flags"], entry["method"], entry["time"], entry["date"], entry["crc"], compress_size,
+                file_size, len(entry["name"]), len(extra), 0, 0, info.internal_attr, info.external_attr, offset,
+            ) + entry["name"] + extra)
+        central_directory = b"".join(records)
+        size = len(central_directory)
+        count = len(records)
+
+        end = b""
+        if count >= _ZIP64_COUNT_LIMIT or start >= _ZIP64_LIMIT or size >= _ZIP64_LIMIT:
+            zip64_end_offset = start + size
+            end += struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0, count, count, size, start)
+            end += struct.pack("<IIQI", 0x07064B50, 0, zip64_end_offset, 1)
+        end += struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, min(count, _ZIP64_COUNT_LIMIT),
+                           min(count, _ZIP64_COUNT_LIMIT), min(size, _ZIP64_LIMIT),
+                           min(start, _ZIP64_LIMIT), len(comment))
+        return self._emit(central_directory + end + comment)
+
+
+def _local_extra(source, info):
+    """Read a member's local header; returns (local extra field, offset of the member data)."""
+    source.seek(info.header_offset)
+    header = source.read(30)
+    if len(header) != 30 or header[:4] != b"PK\x03\x04":
+        raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    source.seek(info.header_offset + 30 + name_length)
+    extra = source.read(extra_length)
+    if len(extra) != extra_length:
+        raise zipfile.BadZipFile(f"Truncated local header for {info.filename}")
+    return extra, info.header_offset + 30 + name_length + extra_length
+
+
+def _raw_member_data(source, info, data_offset, chunk_size):
+    """Yield the stored (still compressed) bytes of a member, starting at data_offset of the source file."""
+    source.seek(data_offset)
+    remaining = info.compress_size
+    while remaining:
+        chunk = source.read(min(chunk_size, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated member {info.filename}")
+        remaining -= len(chunk)
+        yield chunk
+
+
+def _deflate_block(block, level, last):
+    # Each block is an independent raw deflate run ending on a byte boundary,
+    # so the compressed blocks can simply be concatenated (as pigz does)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(block) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_FULL_FLUSH)
+
+
+def _parallel_deflate(blocks, level, executor, window):
+    """Deflate (data, last) blocks in the executor, yielding the results in order."""
+    pending = deque()
+    try:
+        for block, last in blocks:
+            pending.append(executor.submit(_deflate_block, block, level, last))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _member_blocks(member_file, chunk_size):
+    """Yield (block, is_last) over a member's uncompressed data; an empty member is one empty last block."""
+    block = member_file.read(chunk_size)
+    while True:
+        following = member_file.read(chunk_size)
+        yield block, not following
+        if not following:
+            return
+        block = following
+
+
+def repackage_zip(source, level=None, workers=os.cpu_count() or 1, chunk_size=CHUNK_SIZE):
+    """Yield the bytes of a new zip archive holding every member of the seekable source archive.
+
+    With level None members are raw-copied without being decompressed;
+    otherwise members whose compression does not match level are inflated
+    and deflated again, chunk_size blocks at a time across workers threads.
+    Memory stays around 2 * workers chunks whatever the archive size.
+    """
+    writer = ZipStreamWriter()
+    with zipfile.ZipFile(source) as archive, ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        for info in archive.infolist():
+            local_extra, data_offset = _local_extra(archive.fp, info)
+            if not needs_recompression(info, level):
+                # Traditional encryption checks its header against the time instead of
+                # the CRC when there is a data descriptor, so such members keep theirs
+                descriptor = info.flag_bits & 0x09 == 0x09
+                yield writer.local_header(info, info.flag_bits & ~_FLAG_DATA_DESCRIPTOR, info.compress_type,
+                                          info.CRC, info.compress_size, info.file_size, descriptor, local_extra)
+                for chunk in _raw_member_data(archive.fp, info, data_offset, chunk_size):
+                    yield writer.data(chunk)
+                yield writer.end_member(info.CRC, info.compress_size, info.file_size, descriptor)
+                continue
+
+            yield writer.local_header(info, _level_flags(level), zipfile.ZIP_DEFLATED, 0, 0,
+                                      info.file_size, descriptor=True, local_extra=local_extra)
+            crc = 0
+            compress_size = 0
+            with archive.open(info) as member_file:
+                def blocks():
+                    nonlocal crc
+                    for block, last in _member_blocks(member_file, chunk_size):
+                        crc = zlib.crc32(block, crc)
+                        yield block, last
+                for compressed in _parallel_deflate(blocks(), level, executor, 2 * max(workers, 1)):
+                    compress_size += len(compressed)
+                    yield writer.data(compressed)
+            yield writer.end_member(crc, compress_size, info.file_size, descriptor=True)
+        yield writer.finish(archive.comment)
+
+
+def upload_chunks(chunks, blob_client, block_size=BLOCK_SIZE):
+    """Stage a stream of byte chunks as block_size blocks of a block blob and commit them; returns the size."""
+    block_ids = []
+    buffer = bytearray()
+    size = 0
+
+    def stage(data):
+        block_id = f"{len(block_ids):08d}"
+        blob_client.stage_block(block_id, bytes(data), length=len(data))
+        block_ids.append(block_id)
+
+    for chunk in chunks:
+        buffer += chunk
+        size += len(chunk)
+        while len(buffer) >= block_size:
+            stage(buffer[:block_size])
+            del buffer[:block_size]
+    if buffer:
+        stage(buffer)
+    blob_client.commit_block_list(block_ids)
+    return size
+
+
+def repackage_file(source_path, output_path, level=None, workers=os.cpu_count() or 1):
+    """Repackage a local zip file into output_path; returns the output size."""
+    size = 0
+    with open(source_path, "rb") as source, open(output_path, "wb") as output:
+        for chunk in repackage_zip(source, level, workers):
+            output.write(chunk)
+            size += len(chunk)
+    return size
+
 
 def unzip_blob(trigger: func.InputStream, outputBlob: func.Out[bytes]) -> None:
     try:
-        # Create a temporary directory to extract the contents
-        temp_dir = tempfile.mkdtemp()
-
-        # Get the name of the uploaded file
-        file_name = os.path.basename(trigger.name)
-
-        # Create a temporary file path
-        temp_file_path = os.path.join(temp_dir, file_name)
-
-        # Open the temporary file for writing in binary mode
-        with open(temp_file_path, 'wb') as file:
-            # Stream chunks of the input file and write to the temporary file
-            for chunk in trigger:
-                file.write(chunk)
-
-        # Unzip the file
-        with zipfile.ZipFile(temp_file_path, 'r') as zip_ref:
-            # Extract all contents to the temporary directory
-            zip_ref.extractall(temp_dir)
-
-        # Create a new ZIP file with the extracted contents
-        output_zip_path = os.path.join(temp_dir, 'combined.zip')
-        with zipfile.ZipFile(output_zip_path, 'w') as output_zip:
-            for root, _, files in os.walk(temp_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    # Add each extracted file to the new ZIP file
-                    output_zip.write(file_path, os.path.relpath(file_path, temp_dir))
-
-        # Read the content of the combined ZIP file
-        with open(output_zip_path, 'rb') as output_file:
-            output_content = output_file.read()
-
-        # Output the content to the outputBlob
-        outputBlob.set(output_content)
+        # Get the name of the uploaded file; trigger.name is "<container>/<blob path>"
+        container_name, blob_name = trigger.name.split("/", 1)
+        file_name = os.path.basename(blob_name)
+
+        blob_service_client = get_blob_service_client()
+        source_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
+        output_client = blob_service_client.get_blob_client(container=OUTPUT_CONTAINER, blob=file_name)
+
+        # Read the upload in place with ranged reads and stream the new archive out block by block
+        level = int(REPACK_LEVEL) if REPACK_LEVEL else None
+        size = upload_chunks(repackage_zip(BlobRangeReader(source_client), level), output_client)
+
+        # The output binding can only take a whole value, so it gets where the archive went
+        outputBlob.set(json.dumps({"container": OUTPUT_CONTAINER, "blob": file_name, "size": size}).encode("utf-8"))
 
     except Exception as e:
         # Handle exceptions
         print(f"An error occurred: {e}")
-    finally:
-        # Clean up temporary directory
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
-
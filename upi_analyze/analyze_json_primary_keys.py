@@ -4,72 +4,243 @@ JSON Primary Key Detection Script
 Analyzes JSON files to identify potential primary keys and data structure patterns.
 """
 
-import json
 import os
-import glob
+import argparse
+import math
+import random
+import re
+import time
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 from collections import defaultdict, Counter
-from typing import Dict, List, Set, Any, Tuple
+from typing import Dict, List, Set, Any, Tuple, Iterable, Iterator, Optional, Union
 import pandas as pd
 
-def load_json_lines(file_path: str, max_records: int = 1000) -> List[Dict]:
-    """Load JSON lines from a file, limiting to max_records for performance."""
-    records = []
+from jsonl_ranges import split_byte_ranges, iter_range_lines
+from compressed_input import compression_of, find_json_files, open_input
+from sketches import HyperLogLog
+from composite_keys import ColumnEncoder, find_composite_keys
+from json_backends import BACKENDS, get_decoder
+from result_cache import DEFAULT_CACHE_DIR, ResultCache
+from metrics import METRICS, measured_call, profiled
+from sampling import (SAMPLE_MODES, RANDOM_SEEK_MIN_BYTES, reservoir_sample, random_line_sample,
+                      stratified_sample)
+
+def iter_json_lines(file_path: str, max_records: Optional[int] = None,
+                    json_backend: str = 'auto') -> Iterator[Dict]:
+    """Yield JSON records from a file one at a time, stopping after max_records if given.
+
+    Lines are read as bytes and handed straight to the selected decoder (see
+    json_backends), skipping a separate UTF-8 text decoding step. Compressed
+    files are decompressed on the fly (see compressed_input).
+    """
+    decode = get_decoder(json_backend)
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
+        with open_input(file_path) as f:
             for i, line in enumerate(f):
-                if i >= max_records:
+                if max_records is not None and i >= max_records:
                     break
                 try:
-                    record = json.loads(line.strip())
-                    records.append(record)
-                except json.JSONDecodeError as e:
+                    yield decode(line)
+                except ValueError as e:
                     print(f"Error parsing line {i+1} in {file_path}: {e}")
                     continue
     except Exception as e:
         print(f"Error reading file {file_path}: {e}")
+
+def iter_json_range(file_path: str, start: int, end: int, json_backend: str = 'auto') -> Iterator[Dict]:
+    """Yield JSON records whose lines start within the byte range [start, end)."""
+    decode = get_decoder(json_backend)
+    for line_num, line in iter_range_lines(file_path, start, end):
+        try:
+            yield decode(line)
+        except ValueError as e:
+            print(f"Error parsing line {line_num} of byte range {start}-{end} in {file_path}: {e}")
+            continue
+
+def load_json_lines(file_path: str, max_records: int = 1000, json_backend: str = 'auto',
+                    sample: str = 'first', seed: Optional[int] = 0) -> List[Dict]:
+    """Load JSON lines from a file, limiting to max_records for performance.
+
+    sample selects which records (see sampling.SAMPLE_MODES): the first
+    max_records, a reservoir sample of the whole file, lines at random byte
+    offsets (compressed files and files under RANDOM_SEEK_MIN_BYTES use a
+    reservoir instead), or
+    a sample stratified by Header.AssetClass/InstrumentType. Sampled
+    records keep their file order; seed makes the sample reproducible.
+    """
+    if sample not in SAMPLE_MODES:
+        raise ValueError(f"sample must be one of {SAMPLE_MODES}")
+    if sample == 'first' or max_records is None:
+        return list(iter_json_lines(file_path, max_records, json_backend))
+
+    rng = random.Random(seed)
+    if sample == 'stratified':
+        return stratified_sample(iter_json_lines(file_path, json_backend=json_backend), max_records, rng)
+
+    try:
+        if (sample == 'random' and compression_of(file_path) is None
+                and os.path.getsize(file_path) >= RANDOM_SEEK_MIN_BYTES):
+            lines = random_line_sample(file_path, max_records, rng)
+        else:
+            with open_input(file_path) as f:
+                lines = reservoir_sample((line for line in f if line.strip()), max_records, rng)
+    except Exception as e:
+        print(f"Error reading file {file_path}: {e}")
+        return []
+
+    decode = get_decoder(json_backend)
+    records = []
+    for line in lines:
+        try:
+            records.append(decode(line))
+        except ValueError as e:
+            print(f"Error parsing sampled line in {file_path}: {e}")
     return records
 
-def extract_all_paths(obj: Any, prefix: str = "") -> Set[str]:
-    """Extract all possible field paths from a nested JSON object."""
+# Path step that selects every element of a list, written as [*]
+WILDCARD = Ellipsis
+
+# How lists are walked when discovering paths: only the first element
+# ([0], the historical behaviour), every element by index ([0], [1], ...),
+# or all elements folded into one [*] path
+ARRAY_MODES = ('first', 'all', 'wildcard')
+
+_PATH_SEGMENT = r'[^.\[\]]+(?:\[(?:\d+|\*)\])*'
+_PATH_SYNTAX = re.compile(rf'{_PATH_SEGMENT}(?:\.{_PATH_SEGMENT})*')
+_PATH_TOKEN = re.compile(r'\[(\d+|\*)\]|([^.\[\]]+)')
+
+def child_path(prefix: str, step: Union[str, int, type(WILDCARD)]) -> str:
+    """Format the path of a dict key, list index or wildcard step below prefix."""
+    if isinstance(step, str):
+        return f"{prefix}.{step}" if prefix else step
+    if step is WILDCARD:
+        return f"{prefix}[*]"
+    return f"{prefix}[{step}]"
+
+class FieldPath:
+    """A dotted field path such as 'Derived.CFI[1].Attributes[*].Name', parsed once.
+
+    The path is held as a tuple of steps: str for dict keys, int for list
+    indices and WILDCARD for [*], which explodes every element of a list.
+    """
+
+    __slots__ = ('text', 'steps', 'has_wildcard', '_plan')
+
+    def __init__(self, text: str):
+        if not _PATH_SYNTAX.fullmatch(text):
+            raise ValueError(f"Invalid field path: {text!r}")
+
+        steps = []
+        for index, key in _PATH_TOKEN.findall(text):
+            if index == '*':
+                steps.append(WILDCARD)
+            elif index:
+                steps.append(int(index))
+            else:
+                steps.append(key)
+
+        self.text = text
+        self.steps = tuple(steps)
+        self.has_wildcard = WILDCARD in self.steps
+        # (step, is_index) pairs so get() need not inspect step types per record
+        self._plan = tuple((step, not isinstance(step, str)) for step in self.steps)
+
+    def __repr__(self) -> str:
+        return f"FieldPath({self.text!r})"
+
+    def get(self, record: Any) -> Any:
+        """Return the value at this path, or None when any step is missing."""
+        if self.has_wildcard:
+            values = self.values(record)
+            return values[0] if values else None
+
+        current = record
+        try:
+            for step, is_index in self._plan:
+                # Only lists may be indexed; a str would otherwise yield a character
+                if is_index and type(current) is not list:
+                    return None
+                current = current[step]
+        except (KeyError, IndexError, TypeError):
+            return None
+        return current
+
+    def values(self, record: Any) -> List[Any]:
+        """Return every non-null value at this path, exploding [*] steps."""
+        if not self.has_wildcard:
+            value = self.get(record)
+            return [] if value is None else [value]
+
+        current = [record]
+        for step in self.steps:
+            matched = []
+            for obj in current:
+                if isinstance(step, str):
+                    if isinstance(obj, dict) and step in obj:
+                        matched.append(obj[step])
+                elif step is WILDCARD:
+                    if isinstance(obj, list):
+                        matched.extend(obj)
+                elif isinstance(obj, list) and -len(obj) <= step < len(obj):
+                    matched.append(obj[step])
+            current = matched
+            if not current:
+                break
+        return [value for value in current if value is not None]
+
+@lru_cache(maxsize=None)
+def compile_path(field_path: str) -> FieldPath:
+    """Parse a field path once and reuse the compiled form."""
+    return FieldPath(field_path)
+
+def extract_all_paths(obj: Any, prefix: str = "", array_mode: str = 'first') -> Set[str]:
+    """Extract all possible field paths from a nested JSON object.
+
+    array_mode is one of ARRAY_MODES; every returned path can be passed to
+    compile_path.
+    """
     paths = set()
     
     if isinstance(obj, dict):
         for key, value in obj.items():
-            current_path = f"{prefix}.{key}" if prefix else key
+            current_path = child_path(prefix, key)
             paths.add(current_path)
-            paths.update(extract_all_paths(value, current_path))
+            paths.update(extract_all_paths(value, current_path, array_mode))
     elif isinstance(obj, list) and obj:
-        # For lists, analyze the first element to understand structure
-        paths.update(extract_all_paths(obj[0], f"{prefix}[0]"))
+        if array_mode == 'first':
+            # For lists, analyze the first element to understand structure
+            paths.update(extract_all_paths(obj[0], child_path(prefix, 0), array_mode))
+        elif array_mode == 'all':
+            for index, element in enumerate(obj):
+                element_path = child_path(prefix, index)
+                paths.add(element_path)
+                paths.update(extract_all_paths(element, element_path, array_mode))
+        else:
+            element_path = child_path(prefix, WILDCARD)
+            paths.add(element_path)
+            for element in obj:
+                paths.update(extract_all_paths(element, element_path, array_mode))
     
     return paths
 
-def analyze_field_uniqueness(records: List[Dict], field_path: str) -> Tuple[int, int, float]:
-    """Analyze uniqueness of a field across records."""
+def analyze_field_uniqueness(records: Iterable[Dict], field_path: Union[str, FieldPath]) -> Tuple[int, int, float]:
+    """Analyze uniqueness of a field across records.
+
+    Paths with [*] steps count every exploded element as a value.
+    """
+    path = compile_path(field_path) if isinstance(field_path, str) else field_path
     values = []
     
-    for record in records:
-        try:
-            # Navigate nested path
-            current = record
-            for part in field_path.split('.'):
-                if '[0]' in part:
-                    part = part.replace('[0]', '')
-                    if part in current and isinstance(current[part], list) and current[part]:
-                        current = current[part][0]
-                    else:
-                        current = None
-                        break
-                elif part in current:
-                    current = current[part]
-                else:
-                    current = None
-                    break
-            
-            if current is not None:
-                values.append(str(current))
-        except:
-            continue
+    if path.has_wildcard:
+        for record in records:
+            values.extend(str(value) for value in path.values(record))
+    else:
+        get = path.get
+        for record in records:
+            value = get(record)
+            if value is not None:
+                values.append(str(value))
     
     total_values = len(values)
     unique_values = len(set(values))
@@ -77,126 +248,534 @@ def analyze_field_uniqueness(records: List[Dict], field_path: str) -> Tuple[int,
     
     return total_values, unique_values, uniqueness_ratio
 
-def detect_primary_keys(records: List[Dict]) -> Dict[str, Any]:
-    """Detect potential primary keys in the dataset."""
-    if not records:
-        return {}
-    
-    # Extract all possible field paths
-    all_paths = set()
-    for record in records[:10]:  # Sample first 10 records for path discovery
-        all_paths.update(extract_all_paths(record))
-    
-    # Analyze each field for primary key characteristics
-    primary_key_candidates = []
-    field_analysis = {}
-    
-    for field_path in sorted(all_paths):
-        total_count, unique_count, uniqueness_ratio = analyze_field_uniqueness(records, field_path)
-        
-        field_analysis[field_path] = {
-            'total_count': total_count,
-            'unique_count': unique_count,
-            'uniqueness_ratio': uniqueness_ratio,
-            'coverage': total_count / len(records) if records else 0
-        }
-        
-        # Primary key criteria:
-        # 1. High uniqueness ratio (>= 0.95)
-        # 2. High coverage (>= 0.9)
-        # 3. Reasonable number of values
-        if (uniqueness_ratio >= 0.95 and 
-            total_count >= len(records) * 0.9 and 
-            unique_count > 1):
-            primary_key_candidates.append({
-                'field': field_path,
+class FieldStats:
+    """Running coverage, distinct-value and type counters for a single field path.
+
+    In approximate mode distinct values are counted with a HyperLogLog instead
+    of an exact set, keeping memory constant per path.
+    """
+
+    __slots__ = ('total_count', 'distinct', 'types')
+
+    def __init__(self, approximate: bool = False):
+        self.total_count = 0
+        self.distinct = HyperLogLog() if approximate else set()
+        # Keyed by type object on the hot path; type_counts() names them
+        self.types: Dict[type, int] = {}
+
+    def add(self, value: Any) -> None:
+        self.total_count += 1
+        self.distinct.add(str(value))
+        value_type = type(value)
+        self.types[value_type] = self.types.get(value_type, 0) + 1
+
+    def merge(self, other: 'FieldStats') -> None:
+        self.total_count += other.total_count
+        if isinstance(self.distinct, HyperLogLog):
+            self.distinct.merge(other.distinct)
+        else:
+            self.distinct |= other.distinct
+        for value_type, count in other.types.items():
+            self.types[value_type] = self.types.get(value_type, 0) + count
+
+    def type_counts(self) -> Dict[str, int]:
+        """Value type tally by type name, most common first."""
+        return dict(Counter({value_type.__name__: count for value_type, count in self.types.items()}).most_common())
+
+    def unique_count(self) -> Tuple[int, int]:
+        """Return (distinct values, error bound); the bound is 0 when exact.
+
+        Approximate counts carry a bound of two standard errors (about 95%
+        confidence) and are capped at total_count.
+        """
+        if isinstance(self.distinct, HyperLogLog):
+            estimate = min(self.distinct.count(), self.total_count)
+            return estimate, int(math.ceil(2 * self.distinct.relative_error * estimate))
+        return len(self.distinct), 0
+
+class PathNode:
+    """A node of the compiled path tree walked by PrimaryKeyAccumulator.
+
+    Children are keyed by path step, so walking a record only does dict
+    lookups; path strings are built once, when a node is first created.
+    """
+
+    __slots__ = ('path', 'stats', 'children')
+
+    def __init__(self, path: str, stats: Optional['FieldStats']):
+        self.path = path
+        self.stats = stats
+        self.children: Dict[Union[str, int, type(WILDCARD)], 'PathNode'] = {}
+
+class PrimaryKeyAccumulator:
+    """Streaming primary key analysis: each record is walked exactly once.
+
+    Paths are discovered in every record (not just a leading sample) and values
+    are compared the same way as analyze_field_uniqueness, i.e. by str(value).
+    array_mode selects how lists are walked (see ARRAY_MODES); with 'all' and
+    'wildcard' the list elements themselves are profiled as well, and a
+    wildcard path counts one value per element, so its coverage can exceed 1.
+    """
+
+    def __init__(self, approximate: bool = False, array_mode: str = 'first'):
+        if array_mode not in ARRAY_MODES:
+            raise ValueError(f"array_mode must be one of {ARRAY_MODES}")
+        self.approximate = approximate
+        self.array_mode = array_mode
+        self.total_records = 0
+        self.fields: Dict[str, FieldStats] = {}
+        self._root = PathNode("", None)
+
+    def add_record(self, record: Any) -> None:
+        self.total_records += 1
+        self._walk(record, self._root)
+
+    def merge(self, other: 'PrimaryKeyAccumulator') -> None:
+        """Fold in the statistics of an accumulator that saw a later part of the file."""
+        self.total_records += other.total_records
+        for field_path, other_stats in other.fields.items():
+            stats = self.fields.get(field_path)
+            if stats is None:
+                self.fields[field_path] = other_stats
+            else:
+                stats.merge(other_stats)
+        # Rebuild the path tree lazily so it points at the merged statistics
+        self._root = PathNode("", None)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_root'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._root = PathNode("", None)
+
+    def _child(self, node: PathNode, step: Union[str, int, type(WILDCARD)], profiled: bool = True) -> PathNode:
+        path = child_path(node.path, step)
+        stats = None
+        if profiled:
+            stats = self.fields.get(path)
+            if stats is None:
+                stats = self.fields[path] = FieldStats(self.approximate)
+        child = node.children[step] = PathNode(path, stats)
+        return child
+
+    def _walk(self, obj: Any, node: PathNode) -> None:
+        if isinstance(obj, dict):
+            children = node.children
+            for key, value in obj.items():
+                child = children.get(key)
+                if child is None:
+                    child = self._child(node, key)
+                if value is not None:
+                    child.stats.add(value)
+                if isinstance(value, (dict, list)):
+                    self._walk(value, child)
+        elif isinstance(obj, list) and obj:
+            array_mode = self.array_mode
+            if array_mode == 'first':
+                # For lists, analyze the first element to understand structure
+                child = node.children.get(0)
+                if child is None:
+                    child = self._child(node, 0, profiled=False)
+                self._walk(obj[0], child)
+            elif array_mode == 'all':
+                children = node.children
+                for index, element in enumerate(obj):
+                    child = children.get(index)
+                    if child is None:
+                        child = self._child(node, index)
+                    self._profile_element(element, child)
+            else:
+                child = node.children.get(WILDCARD)
+                if child is None:
+                    child = self._child(node, WILDCARD)
+                for element in obj:
+                    self._profile_element(element, child)
+
+    def _profile_element(self, element: Any, node: PathNode) -> None:
+        if element is not None:
+            node.stats.add(element)
+        if isinstance(element, (dict, list)):
+            self._walk(element, node)
+
+    def result(self) -> Dict[str, Any]:
+        if not self.total_records:
+            return {}
+
+        total_records = self.total_records
+        primary_key_candidates = []
+        field_analysis = {}
+
+        for field_path in sorted(self.fields):
+            stats = self.fields[field_path]
+            total_count = stats.total_count
+            unique_count, unique_count_error = stats.unique_count()
+            uniqueness_ratio = unique_count / total_count if total_count > 0 else 0
+
+            field_analysis[field_path] = {
+                'total_count': total_count,
+                'unique_count': unique_count,
+                'unique_count_error': unique_count_error,
                 'uniqueness_ratio': uniqueness_ratio,
-                'coverage': total_count / len(records),
-                'total_values': total_count,
-                'unique_values': unique_count
-            })
-    
-    # Sort candidates by uniqueness ratio and coverage
-    primary_key_candidates.sort(key=lambda x: (x['uniqueness_ratio'], x['coverage']), reverse=True)
-    
-    return {
-        'primary_key_candidates': primary_key_candidates,
-        'field_analysis': field_analysis,
-        'total_records': len(records)
-    }
+                'coverage': total_count / total_records,
+                'types': stats.type_counts()
+            }
+
+            # Primary key criteria:
+            # 1. High uniqueness ratio (>= 0.95)
+            # 2. High coverage (>= 0.9)
+            # 3. Reasonable number of values
+            if (uniqueness_ratio >= 0.95 and
+                total_count >= total_records * 0.9 and
+                unique_count > 1):
+                candidate = {
+                    'field': field_path,
+                    'uniqueness_ratio': uniqueness_ratio,
+                    'coverage': total_count / total_records,
+                    'total_values': total_count,
+                    'unique_values': unique_count
+                }
+                if self.approximate:
+                    candidate['unique_values_error'] = unique_count_error
+                    candidate['uniqueness_ratio_error'] = unique_count_error / total_count
+                primary_key_candidates.append(candidate)
+
+        # Sort candidates by uniqueness ratio and coverage
+        primary_key_candidates.sort(key=lambda x: (x['uniqueness_ratio'], x['coverage']), reverse=True)
+
+        return {
+            'primary_key_candidates': primary_key_candidates,
+            'field_analysis': field_analysis,
+            'total_records': total_records,
+            'approximate': self.approximate
+        }
 
-def analyze_data_structure(records: List[Dict]) -> Dict[str, Any]:
+class StructureAccumulator:
+    """Streaming counterpart of analyze_data_structure."""
+
+    def __init__(self):
+        self.total_records = 0
+        self.sample_record: Any = None
+        self.top_level_fields = Counter()
+        self.asset_classes = Counter()
+        self.instrument_types = Counter()
+        self.use_cases = Counter()
+
+    def add_record(self, record: Any) -> None:
+        if self.total_records == 0:
+            self.sample_record = record
+        self.total_records += 1
+
+        if not isinstance(record, dict):
+            return
+        self.top_level_fields.update(record.keys())
+
+        # Detect asset classes if present
+        header = record.get('Header')
+        if isinstance(header, dict):
+            if 'AssetClass' in header:
+                self.asset_classes[header['AssetClass']] += 1
+            if 'InstrumentType' in header:
+                self.instrument_types[header['InstrumentType']] += 1
+            if 'UseCase' in header:
+                self.use_cases[header['UseCase']] += 1
+
+    def merge(self, other: 'StructureAccumulator') -> None:
+        """Fold in the counters of an accumulator that saw a later part of the file."""
+        if self.total_records == 0:
+            self.sample_record = other.sample_record
+        self.total_records += other.total_records
+        self.top_level_fields.update(other.top_level_fields)
+        self.asset_classes.update(other.asset_classes)
+        self.instrument_types.update(other.instrument_types)
+        self.use_cases.update(other.use_cases)
+
+    def result(self) -> Dict[str, Any]:
+        if not self.total_records:
+            return {}
+
+        sample_record = self.sample_record
+        return {
+            'top_level_fields': dict(self.top_level_fields.most_common()),
+            'sample_record_keys': list(sample_record.keys()) if isinstance(sample_record, dict) else [],
+            'asset_classes': dict(self.asset_classes.most_common()),
+            'instrument_types': dict(self.instrument_types.most_common()),
+            'use_cases': dict(self.use_cases.most_common())
+        }
+
+def detect_primary_keys(records: Iterable[Dict], approximate: bool = False) -> Dict[str, Any]:
+    """Detect potential primary keys in the dataset."""
+    with METRICS.stage('detect_primary_keys') as stage:
+        accumulator = PrimaryKeyAccumulator(approximate)
+        for record in records:
+            accumulator.add_record(record)
+        stage.records = accumulator.total_records
+        return accumulator.result()
+
+def analyze_data_structure(records: Iterable[Dict]) -> Dict[str, Any]:
     """Analyze the general structure of the data."""
-    if not records:
-        return {}
-    
-    # Common top-level fields
-    top_level_fields = Counter()
+    with METRICS.stage('analyze_data_structure') as stage:
+        accumulator = StructureAccumulator()
+        for record in records:
+            accumulator.add_record(record)
+        stage.records = accumulator.total_records
+        return accumulator.result()
+
+def _consume_instrumented(records: Iterable[Dict], pk_accumulator: 'PrimaryKeyAccumulator',
+                          structure_accumulator: 'StructureAccumulator', column_encoder: Optional[ColumnEncoder],
+                          bytes_read: int = 0) -> None:
+    """The analyze_file record loop with per-stage timings, used only while METRICS is enabled.
+
+    Time spent waiting for the next record is attributed to parsing.
+    """
+    clock = time.perf_counter
+    parse = detect = structure = encode = 0.0
+    count = 0
+    last = clock()
     for record in records:
-        if isinstance(record, dict):
-            top_level_fields.update(record.keys())
-    
-    # Sample record structure
-    sample_record = records[0] if records else {}
-    
-    # Detect asset classes if present
-    asset_classes = Counter()
-    instrument_types = Counter()
-    use_cases = Counter()
-    
+        t0 = clock()
+        pk_accumulator.add_record(record)
+        t1 = clock()
+        structure_accumulator.add_record(record)
+        t2 = clock()
+        if column_encoder is not None:
+            column_encoder.add_record(record)
+        t3 = clock()
+        parse += t0 - last
+        detect += t1 - t0
+        structure += t2 - t1
+        encode += t3 - t2
+        count += 1
+        last = t3
+    parse += clock() - last
+    METRICS.add('parse', parse, count, bytes_read)
+    METRICS.add('detect_primary_keys', detect, count)
+    METRICS.add('analyze_data_structure', structure, count)
+    if column_encoder is not None:
+        METRICS.add('composite_encode', encode, count)
+
+def _column_encoder(composite_max_records: int, array_mode: str) -> ColumnEncoder:
+    # Exploded [*] paths are multi-valued, so composite keys use indexed paths instead
+    return ColumnEncoder(composite_max_records, 'first' if array_mode == 'first' else 'all')
+
+def scan_file_range(file_path: str, start: int, end: int, approximate: bool = False,
+                    composite_max_records: Optional[int] = None, array_mode: str = 'first',
+                    json_backend: str = 'auto'
+                    ) -> Tuple[PrimaryKeyAccumulator, StructureAccumulator, Optional[ColumnEncoder]]:
+    """Accumulate primary key and structure statistics for one byte range of a file.
+
+    A ColumnEncoder for composite key search is included when
+    composite_max_records is given.
+    """
+    pk_accumulator = PrimaryKeyAccumulator(approximate, array_mode)
+    structure_accumulator = StructureAccumulator()
+    column_encoder = _column_encoder(composite_max_records, array_mode) if composite_max_records else None
+    records = iter_json_range(file_path, start, end, json_backend)
+    if METRICS.enabled:
+        _consume_instrumented(records, pk_accumulator, structure_accumulator, column_encoder, end - start)
+        return pk_accumulator, structure_accumulator, column_encoder
     for record in records:
-        try:
-            if 'Header' in record:
-                header = record['Header']
-                if 'AssetClass' in header:
-                    asset_classes[header['AssetClass']] += 1
-                if 'InstrumentType' in header:
-                    instrument_types[header['InstrumentType']] += 1
-                if 'UseCase' in header:
-                    use_cases[header['UseCase']] += 1
-        except:
-            continue
-    
-    return {
-        'top_level_fields': dict(top_level_fields.most_common()),
-        'sample_record_keys': list(sample_record.keys()) if isinstance(sample_record, dict) else [],
-        'asset_classes': dict(asset_classes.most_common()),
-        'instrument_types': dict(instrument_types.most_common()),
-        'use_cases': dict(use_cases.most_common())
-    }
+        pk_accumulator.add_record(record)
+        structure_accumulator.add_record(record)
+        if column_encoder is not None:
+            column_encoder.add_record(record)
+    return pk_accumulator, structure_accumulator, column_encoder
+
+def analyze_file(file_path: str, max_records: Optional[int] = None, range_workers: int = 1,
+                 approximate: bool = False, composite: bool = False,
+                 composite_max_records: int = 100000, array_mode: str = 'first',
+                 json_backend: str = 'auto', sample: str = 'first', seed: Optional[int] = 0) -> Dict[str, Any]:
+    """Analyze a single JSON file in one streaming pass over its records.
 
-def analyze_file(file_path: str, max_records: int = 1000) -> Dict[str, Any]:
-    """Analyze a single JSON file."""
+    With range_workers > 1 (and no max_records limit) the file is split into
+    newline-aligned byte ranges that are scanned in separate processes and the
+    partial statistics are merged in file order. With approximate=True
+    distinct counts come from per-path HyperLogLog sketches. With
+    composite=True the first composite_max_records records are also
+    dictionary-encoded and searched for minimal multi-column keys.
+    array_mode selects how lists are profiled (see ARRAY_MODES) and
+    json_backend the decoder (see json_backends.BACKENDS). With max_records,
+    sample and seed choose which records are analyzed (see load_json_lines).
+    """
     print(f"\nAnalyzing {os.path.basename(file_path)}...")
     
-    records = load_json_lines(file_path, max_records)
-    
-    if not records:
+    pk_accumulator = PrimaryKeyAccumulator(approximate, array_mode)
+    structure_accumulator = StructureAccumulator()
+    column_encoder = _column_encoder(composite_max_records, array_mode) if composite else None
+    
+    if range_workers > 1 and max_records is None:
+        ranges = split_byte_ranges(file_path, range_workers)
+        if ranges:
+            with METRICS.stage('range_scan', bytes_read=os.path.getsize(file_path)) as stage, \
+                    ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+                futures = [executor.submit(measured_call, METRICS.enabled, scan_file_range, file_path, start, end,
+                                           approximate, composite_max_records if composite else None,
+                                           array_mode, json_backend)
+                           for start, end in ranges]
+                for future in futures:
+                    (pk_partial, structure_partial, encoder_partial), worker_metrics = future.result()
+                    METRICS.merge(worker_metrics)
+                    pk_accumulator.merge(pk_partial)
+                    structure_accumulator.merge(structure_partial)
+                    if column_encoder is not None:
+                        column_encoder.merge(encoder_partial)
+                stage.records = pk_accumulator.total_records
+    else:
+        bytes_read = 0
+        if max_records is not None and sample != 'first':
+            with METRICS.stage('sample') as stage:
+                records = load_json_lines(file_path, max_records, json_backend, sample, seed)
+                stage.records = len(records)
+        else:
+            records = iter_json_lines(file_path, max_records, json_backend)
+            if METRICS.enabled and max_records is None:
+                bytes_read = os.path.getsize(file_path)
+        if METRICS.enabled:
+            _consume_instrumented(records, pk_accumulator, structure_accumulator, column_encoder, bytes_read)
+        else:
+            for record in records:
+                pk_accumulator.add_record(record)
+                structure_accumulator.add_record(record)
+                if column_encoder is not None:
+                    column_encoder.add_record(record)
+    
+    records_analyzed = pk_accumulator.total_records
+    if not records_analyzed:
         return {'error': 'No records loaded', 'file': file_path}
     
-    print(f"  Loaded {len(records)} records")
-    
-    # Detect primary keys
-    pk_analysis = detect_primary_keys(records)
+    print(f"  Loaded {records_analyzed} records")
     
-    # Analyze data structure
-    structure_analysis = analyze_data_structure(records)
+    # Finalizing gets its own stages: the record loop above already timed the detection itself
+    with METRICS.stage('primary_key_results'):
+        pk_analysis = pk_accumulator.result()
+    if column_encoder is not None:
+        with METRICS.stage('composite_search', records=column_encoder.total_records):
+            pk_analysis['composite_key_candidates'] = find_composite_keys(column_encoder.to_numpy())
+        pk_analysis['composite_records_sampled'] = column_encoder.total_records
+    with METRICS.stage('structure_results'):
+        structure_analysis = structure_accumulator.result()
     
     return {
         'file': os.path.basename(file_path),
         'file_path': file_path,
-        'records_analyzed': len(records),
+        'records_analyzed': records_analyzed,
         'primary_key_analysis': pk_analysis,
         'structure_analysis': structure_analysis
     }
 
-def main():
+def _analyze_file_safely(file_path: str, **options) -> Dict[str, Any]:
+    """Run analyze_file, turning any exception into an error result."""
+    try:
+        return analyze_file(file_path, **options)
+    except Exception as e:
+        print(f"Error analyzing {file_path}: {e}")
+        return {'error': str(e)}
+
+# analyze_file options that only change how a file is read, not its result
+_SPEED_OPTIONS = ('range_workers', 'json_backend')
+
+def analyze_files(json_files: List[str], workers: int = 1, cache: Optional[ResultCache] = None,
+                  **options) -> Dict[str, Dict[str, Any]]:
+    """Analyze files serially or across a process pool, keyed in json_files order.
+
+    Each worker returns only the per-file summary dictionaries produced by
+    analyze_file (and its stage metrics while METRICS is enabled), so nothing
+    record-sized crosses the process boundary.
+    Extra keyword options are passed through to analyze_file. With a cache,
+    results of files unchanged since an earlier run with the same options
+    are reused and only the remaining files are analyzed.
+    """
+    results = {}
+    cache_keys = {}
+    if cache:
+        result_options = {name: value for name, value in options.items() if name not in _SPEED_OPTIONS}
+        for json_file in json_files:
+            try:
+                cache_keys[json_file] = cache.key('analyze_file', json_file, result_options)
+            except OSError:
+                continue
+            cached = cache.get(cache_keys[json_file])
+            if cached is not None:
+                print(f"\nUsing cached analysis of {os.path.basename(json_file)}")
+                results[json_file] = cached
+    pending = [json_file for json_file in json_files if json_file not in results]
+    
+    if workers <= 1 or len(pending) <= 1:
+        for json_file in pending:
+            results[json_file] = _analyze_file_safely(json_file, **options)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+            futures = [executor.submit(measured_call, METRICS.enabled, _analyze_file_safely, json_file, **options)
+                       for json_file in pending]
+            for json_file, future in zip(pending, futures):
+                results[json_file], worker_metrics = future.result()
+                METRICS.merge(worker_metrics)
+    
+    for json_file in pending:
+        if json_file in cache_keys and 'error' not in results[json_file]:
+            cache.put(cache_keys[json_file], results[json_file])
+    return {json_file: results[json_file] for json_file in json_files}
+
+def main(argv: Optional[List[str]] = None):
     """Main analysis function."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes used to analyze files in parallel (default: 1)')
+    parser.add_argument('--range-workers', type=int, default=1,
+                        help='Split each file into this many byte ranges scanned in parallel (default: 1)')
+    parser.add_argument('--approximate', action='store_true',
+                        help='Estimate distinct counts with HyperLogLog sketches; the CSV reports error bounds')
+    parser.add_argument('--composite', action='store_true',
+                        help='Also search for minimal multi-column (composite) primary keys')
+    parser.add_argument('--composite-max-records', type=int, default=100000,
+                        help='Records per file encoded for the composite key search (default: 100000)')
+    parser.add_argument('--arrays', choices=ARRAY_MODES, default='first',
+                        help="How lists are profiled: only the first element ('first', default), "
+                             "every element by index ('all'), or all elements as one [*] path ('wildcard')")
+    parser.add_argument('--json-backend', choices=BACKENDS, default='auto',
+                        help='JSON decoder to use; auto picks the fastest installed one (default: auto)')
+    parser.add_argument('--max-records', type=int, default=None,
+                        help='Analyze only this many records per file (default: all)')
+    parser.add_argument('--sample', choices=SAMPLE_MODES, default='first',
+                        help="Which records --max-records keeps: the first ones ('first', default), a "
+                             "reservoir sample ('reservoir'), lines at random byte offsets ('random'), "
+                             "or a sample stratified by AssetClass/InstrumentType ('stratified')")
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed for --sample (default: 0)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Re-analyze every file instead of reusing cached results of unchanged files')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'Directory of the result cache (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--cache-max-age-days', type=float, default=30,
+                        help='Evict cache entries unused for this many days (default: 30)')
+    parser.add_argument('--cache-max-mb', type=float, default=2048,
+                        help='Evict least recently used cache entries beyond this size (default: 2048)')
+    parser.add_argument('--cache-hash', action='store_true',
+                        help='Key cache entries on a content hash instead of the modification time')
+    parser.add_argument('--metrics', default=None, metavar='PATH',
+                        help='Write per-stage timings, throughput and peak memory to this JSON file')
+    parser.add_argument('--profile', default=None, metavar='PATH',
+                        help='Run under cProfile and write the stats to this file')
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        METRICS.enable()
+    with profiled(args.profile):
+        run_analysis(args)
+    if args.metrics:
+        METRICS.write(args.metrics)
+        print(f"Metrics written to {args.metrics}")
+
+def run_analysis(args: argparse.Namespace):
+    """Analyze the JSON files in the current directory and write the CSV reports."""
     print("JSON Primary Key Detection Analysis")
     print("=" * 50)
     
-    # Find all JSON files in the current directory
-    json_files = glob.glob("*.json")
+    # Find all JSON files in the current directory, in a stable order so
+    # serial and parallel runs produce identical reports
+    json_files = sorted(find_json_files())
     
     if not json_files:
         print("No JSON files found in the current directory.")
@@ -206,16 +785,22 @@ def main():
     for file in json_files:
         print(f"  - {file}")
     
-    all_results = {}
+    cache = None
+    if not args.no_cache:
+        cache = ResultCache(args.cache_dir, max_age_days=args.cache_max_age_days,
+                            max_size_mb=args.cache_max_mb, hash_contents=args.cache_hash)
     
     # Analyze each file
-    for json_file in json_files:
-        try:
-            result = analyze_file(json_file, max_records=500)  # Limit for performance
-            all_results[json_file] = result
-        except Exception as e:
-            print(f"Error analyzing {json_file}: {e}")
-            all_results[json_file] = {'error': str(e)}
+    with METRICS.stage('analyze_files') as stage:
+        all_results = analyze_files(json_files, workers=args.workers, cache=cache, max_records=args.max_records,
+                                    sample=args.sample, seed=args.seed, range_workers=args.range_workers,
+                                    approximate=args.approximate, composite=args.composite,
+                                    composite_max_records=args.composite_max_records,
+                                    array_mode=args.arrays, json_backend=args.json_backend)
+        stage.records = sum(result.get('records_analyzed', 0) for result in all_results.values())
+    if cache:
+        cache.evict()
+        print(f"\nCache: {cache.hits} file(s) reused, {cache.misses} analyzed")
     
     # Generate summary report
     print("\n" + "=" * 80)
@@ -236,12 +821,24 @@ def main():
             print(f"  Primary Key Candidates ({len(pk_candidates)}):")
             for i, candidate in enumerate(pk_candidates[:5], 1):  # Top 5
                 print(f"    {i}. {candidate['field']}")
-                print(f"       Uniqueness: {candidate['uniqueness_ratio']:.3f}")
+                if 'uniqueness_ratio_error' in candidate:
+                    print(f"       Uniqueness: {candidate['uniqueness_ratio']:.3f} ± {candidate['uniqueness_ratio_error']:.3f}")
+                else:
+                    print(f"       Uniqueness: {candidate['uniqueness_ratio']:.3f}")
                 print(f"       Coverage: {candidate['coverage']:.3f}")
                 print(f"       Values: {candidate['unique_values']}/{candidate['total_values']}")
         else:
             print("  No strong primary key candidates found")
         
+        composite_candidates = result['primary_key_analysis'].get('composite_key_candidates')
+        if composite_candidates:
+            print(f"  Composite Key Candidates ({len(composite_candidates)}, "
+                  f"from {result['primary_key_analysis']['composite_records_sampled']} records):")
+            for i, candidate in enumerate(composite_candidates[:5], 1):  # Top 5
+                print(f"    {i}. {' + '.join(candidate['columns'])}")
+                print(f"       Uniqueness: {candidate['uniqueness_ratio']:.3f}")
+                print(f"       Coverage: {candidate['coverage']:.3f}")
+        
         # Data structure info
         structure = result['structure_analysis']
         if 'asset_classes' in structure and structure['asset_classes']:
@@ -255,23 +852,49 @@ def main():
     
     # Create primary key candidates report
     pk_report_data = []
+    composite_mode = any('composite_key_candidates' in result.get('primary_key_analysis', {})
+                         for result in all_results.values())
     for file_name, result in all_results.items():
         if 'error' in result:
             continue
         pk_candidates = result['primary_key_analysis'].get('primary_key_candidates', [])
         for candidate in pk_candidates:
-            pk_report_data.append({
+            row = {
                 'file': file_name,
                 'field': candidate['field'],
                 'uniqueness_ratio': candidate['uniqueness_ratio'],
                 'coverage': candidate['coverage'],
                 'unique_values': candidate['unique_values'],
                 'total_values': candidate['total_values']
-            })
+            }
+            # Approximate runs report estimates with their ~95% error bounds
+            if 'unique_values_error' in candidate:
+                row['uniqueness_ratio_error'] = candidate['uniqueness_ratio_error']
+                row['unique_values_error'] = candidate['unique_values_error']
+            if composite_mode:
+                row['columns'] = candidate['field']
+            pk_report_data.append(row)
+        
+        # Composite keys list their column set; their counts are always exact
+        for candidate in result['primary_key_analysis'].get('composite_key_candidates', []):
+            row = {
+                'file': file_name,
+                'field': ' + '.join(candidate['columns']),
+                'uniqueness_ratio': candidate['uniqueness_ratio'],
+                'coverage': candidate['coverage'],
+                'unique_values': candidate['unique_values'],
+                'total_values': candidate['total_values']
+            }
+            if result['primary_key_analysis'].get('approximate'):
+                row['uniqueness_ratio_error'] = 0.0
+                row['unique_values_error'] = 0
+            row['columns'] = '|'.join(candidate['columns'])
+            pk_report_data.append(row)
     
     if pk_report_data:
-        pk_df = pd.DataFrame(pk_report_data)
-        pk_df.to_csv('primary_key_candidates.csv', index=False)
+        with METRICS.stage('write_csv', records=len(pk_report_data)):
+            pk_df = pd.DataFrame(pk_report_data)
+            pk_df.to_csv('primary_key_candidates.csv', index=False)
         print("  - primary_key_candidates.csv")
     
     # Create structure summary report
@@ -290,8 +913,9 @@ def main():
         })
     
     if structure_data:
-        structure_df = pd.DataFrame(structure_data)
-        structure_df.to_csv('data_structure_summary.csv', index=False)
+        with METRICS.stage('write_csv', records=len(structure_data)):
+            structure_df = pd.DataFrame(structure_data)
+            structure_df.to_csv('data_structure_summary.csv', index=False)
         print("  - data_structure_summary.csv")
     
     print("\nAnalysis complete!")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+JSON Backend Benchmark
+Times line-by-line decoding of a UPI JSONL file with each installed backend:
+stdlib text-mode reads versus binary reads, and full records versus only the
+fields the UPI validator needs. Generates a synthetic file if none is given.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from json_backends import available_backends, get_decoder
+from validate_upi_primary_key import UPI_FIELDS
+
+def write_sample_file(file_path: str, records: int, seed: int = 0) -> None:
+    """Write records synthetic UPI-shaped JSON lines to file_path."""
+    rng = random.Random(seed)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        for i in range(records):
+            record = {
+                "TemplateVersion": 1,
+                "Header": {"AssetClass": "Rates", "InstrumentType": rng.choice(["Swap", "Option"]),
+                           "UseCase": rng.choice(["Basis", "Fixed_Float"]), "Level": "UPI"},
+                "Identifier": {"UPI": f"QZ{i:010d}", "Status": "New", "StatusReason": None,
+                               "LastUpdateDateTime": f"2025-09-{rng.randint(1, 28):02d}T00:00:00"},
+                "Derived": {"ShortName": f"Rates/{rng.randrange(50)}",
+                            "CFI": [{"Version": "2015", "Value": "SRCCSP",
+                                     "Category": {"Code": "S", "Value": "Swaps"},
+                                     "Attributes": [{"Name": "Underlying", "Value": f"v{rng.randrange(3)}"},
+                                                    {"Name": "Delivery", "Value": f"d{rng.randrange(4)}"}]}]},
+                "Attributes": {"ReferenceRate": f"RATE{rng.randrange(40)}", "Tenor": rng.randrange(30),
+                               "Currency": rng.choice(["USD", "EUR", "GBP"]),
+                               "Notes": "x" * rng.randrange(200)}
+            }
+            f.write(json.dumps(record) + "\n")
+
+def time_text_json(file_path: str) -> float:
+    """Baseline: text-mode reads decoded with json.loads, as the scripts originally did."""
+    start = time.perf_counter()
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                json.loads(line)
+    return time.perf_counter() - start
+
+def time_binary(file_path: str, decode: Callable) -> float:
+    start = time.perf_counter()
+    with open(file_path, 'rb') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                decode(line)
+    return time.perf_counter() - start
+
+def run_benchmark(file_path: str, repeats: int = 3) -> List[Dict[str, object]]:
+    """Best-of-repeats timings for every backend and decoding mode."""
+    with open(file_path, 'rb') as f:
+        records = sum(1 for line in f if line.strip())
+    size_mb = os.path.getsize(file_path) / (1024 * 1024)
+
+    cases = [('json (text mode)', 'full', lambda: time_text_json(file_path))]
+    for backend in available_backends():
+        full_decoder = get_decoder(backend)
+        fields_decoder = get_decoder(backend, UPI_FIELDS)
+        cases.append((backend, 'full', lambda d=full_decoder: time_binary(file_path, d)))
+        cases.append((backend, 'UPI fields', lambda d=fields_decoder: time_binary(file_path, d)))
+
+    results = []
+    for backend, mode, run in cases:
+        elapsed = min(run() for _ in range(repeats))
+        results.append({
+            'backend': backend,
+            'mode': mode,
+            'seconds': elapsed,
+            'records_per_sec': records / elapsed,
+            'mb_per_sec': size_mb / elapsed
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON decoding backends on a JSONL file.')
+    parser.add_argument('file', nargs='?', help='JSONL file to decode (default: generate a synthetic one)')
+    parser.add_argument('--records', type=int, default=200000,
+                        help='Records in the generated file (default: 200000)')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs per case; the best is kept (default: 3)')
+    args = parser.parse_args()
+
+    temp_path = None
+    file_path = args.file
+    if file_path is None:
+        fd, temp_path = tempfile.mkstemp(prefix='upi_bench_', suffix='.json')
+        os.close(fd)
+        print(f"Generating {args.records} synthetic records...")
+        write_sample_file(temp_path, args.records)
+        file_path = temp_path
+
+    try:
+        print(f"Decoding {file_path} ({os.path.getsize(file_path) / (1024 * 1024):.1f} MB)")
+        results = run_benchmark(file_path, repeats=args.repeats)
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+    baseline = results[0]['seconds']
+    print(f"\n{'Backend':<18} {'Mode':<12} {'Records/s':>12} {'MB/s':>8} {'Speedup':>8}")
+    print("-" * 62)
+    for result in results:
+        print(f"{result['backend']:<18} {result['mode']:<12} {result['records_per_sec']:>12,.0f} "
+              f"{result['mb_per_sec']:>8.1f} {baseline / result['seconds']:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
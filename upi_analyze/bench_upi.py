@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+UPI Analyzer Benchmark
+Generates synthetic snapshots at several scales and reports wall time,
+records/sec and peak RSS for each analyzer stage: loading, primary key
+detection, structure analysis and UPI validation. Each stage runs in a
+fresh process so its peak RSS is measured on its own.
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from generate_synthetic_upi import generate_snapshots
+from metrics import peak_rss_mb
+
+STAGES = ('load', 'detect_primary_keys', 'analyze_data_structure', 'validate_upi')
+
+DEFAULT_SCALES = (10000, 1000000, 10000000)
+
+def run_stage(stage: str, json_files: List[str], json_backend: str = 'auto', workers: int = 1) -> Dict[str, Any]:
+    """Run one stage over the files in this process and time it."""
+    from analyze_json_primary_keys import iter_json_lines, PrimaryKeyAccumulator, StructureAccumulator
+    from validate_upi_primary_key import collect_exact_upis
+
+    start = time.perf_counter()
+    records = 0
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if stage == 'load':
+            for json_file in json_files:
+                for _ in iter_json_lines(json_file, json_backend=json_backend):
+                    records += 1
+        elif stage == 'detect_primary_keys':
+            for json_file in json_files:
+                accumulator = PrimaryKeyAccumulator()
+                for record in iter_json_lines(json_file, json_backend=json_backend):
+                    accumulator.add_record(record)
+                accumulator.result()
+                records += accumulator.total_records
+        elif stage == 'analyze_data_structure':
+            for json_file in json_files:
+                accumulator = StructureAccumulator()
+                for record in iter_json_lines(json_file, json_backend=json_backend):
+                    accumulator.add_record(record)
+                accumulator.result()
+                records += accumulator.total_records
+        elif stage == 'validate_upi':
+            summary = collect_exact_upis(json_files, workers=workers, json_backend=json_backend)
+            records = summary['total_upis']
+        else:
+            raise ValueError(f"Unknown stage {stage!r}; expected one of {STAGES}")
+    wall = time.perf_counter() - start
+
+    return {
+        'stage': stage,
+        'records': records,
+        'wall_seconds': wall,
+        'records_per_sec': records / wall if wall else 0.0,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def run_stage_in_subprocess(stage: str, json_files: List[str], json_backend: str, workers: int) -> Dict[str, Any]:
+    command = [sys.executable, os.path.abspath(__file__), '--stage', stage,
+               '--json-backend', json_backend, '--workers', str(workers)] + json_files
+    output = subprocess.run(command, check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def ensure_dataset(data_dir: str, records: int, seed: int, duplicate_rate: float, nesting_depth: int) -> List[str]:
+    """Generate (or reuse) the snapshots for one scale."""
+    scale_dir = os.path.join(data_dir, f"records_{records}_seed_{seed}_dup_{duplicate_rate}_depth_{nesting_depth}")
+    marker = os.path.join(scale_dir, '.complete')
+    if not os.path.exists(marker):
+        print(f"Generating {records} records in {scale_dir}...")
+        generate_snapshots(scale_dir, records, seed=seed, duplicate_rate=duplicate_rate,
+                           nesting_depth=nesting_depth)
+        open(marker, 'w').close()
+    return sorted(glob.glob(os.path.join(scale_dir, '*.json')))
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scales', type=int, nargs='+', default=list(DEFAULT_SCALES),
+                        help='Total record counts to benchmark (default: 10000 1000000 10000000)')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES),
+                        help='Stages to run (default: all)')
+    parser.add_argument('--data-dir', default='bench_data',
+                        help='Where generated snapshots are kept and reused (default: bench_data)')
+    parser.add_argument('--duplicate-rate', type=float, default=0.001,
+                        help='Fraction of duplicated UPIs in the generated data (default: 0.001)')
+    parser.add_argument('--nesting-depth', type=int, default=0,
+                        help='Extra nesting levels in the generated records (default: 0)')
+    parser.add_argument('--seed', type=int, default=0, help='Generator seed (default: 0)')
+    parser.add_argument('--workers', type=int, default=1, help='Workers for UPI validation (default: 1)')
+    parser.add_argument('--json-backend', default='auto', help='JSON decoder to use (default: auto)')
+    parser.add_argument('--output', default=None, help='Also write the results to this JSON file')
+    parser.add_argument('--stage', choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument('files', nargs='*', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.stage:
+        # Child process: run one stage and report it as the last line of stdout
+        print(json.dumps(run_stage(args.stage, args.files, args.json_backend, args.workers)))
+        return
+
+    data_dir = os.path.abspath(args.data_dir)
+    results = []
+    for records in args.scales:
+        json_files = ensure_dataset(data_dir, records, args.seed, args.duplicate_rate, args.nesting_depth)
+        size_mb = sum(os.path.getsize(path) for path in json_files) / (1024 * 1024)
+        print(f"\n{records} records ({size_mb:.1f} MB in {len(json_files)} files)")
+        print(f"  {'Stage':<24} {'Wall (s)':>10} {'Records/s':>12} {'Peak RSS (MB)':>14}")
+        for stage in args.stages:
+            result = run_stage_in_subprocess(stage, json_files, args.json_backend, args.workers)
+            result.update(scale=records, input_mb=size_mb)
+            results.append(result)
+            rss = f"{result['peak_rss_mb']:.0f}" if result['peak_rss_mb'] is not None else 'n/a'
+            print(f"  {stage:<24} {result['wall_seconds']:>10.2f} {result['records_per_sec']:>12,.0f} {rss:>14}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
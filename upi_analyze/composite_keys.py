@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Composite Primary Key Discovery
+Dictionary-encodes leaf field paths into integer columns and searches for
+minimal column combinations that uniquely identify records, using vectorized
+partition refinement.
+"""
+
+from array import array
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Code used for records where a path is missing or null
+MISSING_CODE = 0
+
+class ColumnEncoder:
+    """Streams records into one dictionary-encoded integer column per leaf path.
+
+    Leaf paths follow the same rules as PrimaryKeyAccumulator and values are
+    compared by str(value). Lists are followed through their first element
+    (array_mode 'first') or through every element by index ('all'); a
+    multi-valued [*] path cannot form a column. Records past max_records are
+    ignored so memory stays bounded at max_records x paths x 4 bytes.
+    """
+
+    def __init__(self, max_records: Optional[int] = 100000, array_mode: str = 'first'):
+        if array_mode not in ('first', 'all'):
+            raise ValueError("array_mode must be 'first' or 'all'")
+        self.max_records = max_records
+        self.array_mode = array_mode
+        self.total_records = 0
+        self.dictionaries: Dict[str, Dict[str, int]] = {}
+        self.columns: Dict[str, array] = {}
+
+    def add_record(self, record: Any) -> None:
+        if self.max_records is not None and self.total_records >= self.max_records:
+            return
+
+        codes = {}
+        self._walk(record, "", codes)
+
+        for path, code in codes.items():
+            if path not in self.columns:
+                self.columns[path] = array('i', [MISSING_CODE]) * self.total_records
+        for path, column in self.columns.items():
+            column.append(codes.get(path, MISSING_CODE))
+        self.total_records += 1
+
+    def _walk(self, obj: Any, prefix: str, codes: Dict[str, int]) -> None:
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                current_path = f"{prefix}.{key}" if prefix else key
+                if isinstance(value, (dict, list)):
+                    self._walk(value, current_path, codes)
+                elif value is not None:
+                    dictionary = self.dictionaries.get(current_path)
+                    if dictionary is None:
+                        dictionary = self.dictionaries[current_path] = {}
+                    text = str(value)
+                    code = dictionary.get(text)
+                    if code is None:
+                        code = dictionary[text] = len(dictionary) + 1
+                    codes[current_path] = code
+        elif isinstance(obj, list) and obj:
+            if self.array_mode == 'first':
+                self._walk(obj[0], f"{prefix}[0]", codes)
+            else:
+                for index, element in enumerate(obj):
+                    self._walk(element, f"{prefix}[{index}]", codes)
+
+    def merge(self, other: 'ColumnEncoder') -> None:
+        """Append the rows of an encoder that saw a later part of the file, re-mapping its codes."""
+        take = other.total_records
+        if self.max_records is not None:
+            take = min(take, max(self.max_records - self.total_records, 0))
+        if take <= 0:
+            return
+
+        for path in other.columns:
+            if path not in self.columns:
+                self.columns[path] = array('i', [MISSING_CODE]) * self.total_records
+                self.dictionaries[path] = {}
+
+        for path, column in self.columns.items():
+            other_column = other.columns.get(path)
+            if other_column is None:
+                column.extend(array('i', [MISSING_CODE]) * take)
+                continue
+
+            # remap[other_code] -> code in this encoder's dictionary
+            dictionary = self.dictionaries[path]
+            remap = np.zeros(len(other.dictionaries[path]) + 1, dtype=np.int32)
+            for text, other_code in other.dictionaries[path].items():
+                code = dictionary.get(text)
+                if code is None:
+                    code = dictionary[text] = len(dictionary) + 1
+                remap[other_code] = code
+            other_codes = np.frombuffer(other_column, dtype=np.int32)[:take]
+            column.frombytes(remap[other_codes].tobytes())
+
+        self.total_records += take
+
+    def to_numpy(self) -> Dict[str, np.ndarray]:
+        return {path: np.frombuffer(column, dtype=np.int32) for path, column in self.columns.items()}
+
+def _refine(group_ids: np.ndarray, codes: np.ndarray, cardinality: int) -> Tuple[np.ndarray, int]:
+    """Intersect a partition (group_ids) with a column, returning the new group ids and count."""
+    combined = group_ids.astype(np.int64) * (cardinality + 1) + codes
+    unique_keys, new_ids = np.unique(combined, return_inverse=True)
+    return new_ids.astype(np.int32), len(unique_keys)
+
+def _group_count(columns: Dict[str, np.ndarray], combo: Tuple[str, ...], cardinalities: Dict[str, int]) -> int:
+    """Number of distinct value tuples of a column combination over all rows."""
+    group_ids = np.zeros(len(columns[combo[0]]), dtype=np.int32)
+    group_count = 1
+    for path in combo:
+        group_ids, group_count = _refine(group_ids, columns[path], cardinalities[path])
+    return group_count
+
+def find_composite_keys(columns: Dict[str, np.ndarray], max_size: int = 3, min_uniqueness: float = 1.0,
+                        beam_width: int = 200, max_results: int = 20, sample_size: int = 4096,
+                        seed: int = 0) -> List[Dict[str, Any]]:
+    """Find minimal column combinations whose value tuples are (nearly) unique.
+
+    The search is level-wise: combinations of size k extend non-key
+    combinations of size k-1 by one column, refining their partition of a
+    fixed random sample of rows. Only combinations that look unique on the
+    sample are verified against every row, so every reported key is exact.
+    It prunes:
+      * constant columns and columns that are unique on their own (those are
+        single-field keys, so any combination containing them is not minimal);
+      * supersets of keys already found, and combinations with a pruned subset;
+      * on the last level, extensions whose best possible group count
+        (groups x cardinality) cannot reach the target;
+      * all but the beam_width combinations with the most sample groups per level.
+    """
+    if not columns:
+        return []
+    total = len(next(iter(columns.values())))
+    if total < 2:
+        return []
+    target = int(np.ceil(total * min_uniqueness))
+
+    rows = np.arange(total)
+    if total > sample_size:
+        rows = np.sort(np.random.default_rng(seed).choice(total, sample_size, replace=False))
+    sample = {path: codes[rows] for path, codes in columns.items()}
+    sample_target = int(np.ceil(len(rows) * min_uniqueness))
+
+    cardinalities = {path: int(codes.max()) for path, codes in columns.items()}
+    full_counts = {}
+
+    # Level 1: single columns that are neither constant nor already a key
+    level = {}
+    for path, codes in columns.items():
+        _, full_counts[path] = _refine(np.zeros(total, dtype=np.int32), codes, cardinalities[path])
+        if full_counts[path] <= 1 or full_counts[path] >= target:
+            continue
+        level[(path,)] = _refine(np.zeros(len(rows), dtype=np.int32), sample[path], cardinalities[path])
+
+    ordered_paths = sorted((combo[0] for combo in level), key=lambda path: -full_counts[path])
+    path_rank = {path: rank for rank, path in enumerate(ordered_paths)}
+
+    keys = []
+    for size in range(2, max_size + 1):
+        next_level = {}
+        for combo, (group_ids, group_count) in level.items():
+            # Upper bound on the groups reachable by adding one column
+            combo_bound = float(np.prod([cardinalities[column] + 1 for column in combo], dtype=float))
+            for path in ordered_paths[path_rank[combo[-1]] + 1:]:
+                candidate = combo + (path,)
+                if any(set(key['columns']) <= set(candidate) for key in keys):
+                    continue
+                # Apriori: every (k-1)-subset must be a surviving non-key
+                if size > 2 and any(subset not in level for subset in combinations(candidate, size - 1)):
+                    continue
+                # On the last level an extension that cannot reach the target is useless
+                if size == max_size and combo_bound * (cardinalities[path] + 1) < target:
+                    continue
+
+                new_ids, new_count = _refine(group_ids, sample[path], cardinalities[path])
+                if new_count >= sample_target:
+                    full_count = _group_count(columns, candidate, cardinalities)
+                    if full_count >= target:
+                        present = np.ones(total, dtype=bool)
+                        for column in candidate:
+                            present &= columns[column] != MISSING_CODE
+                        keys.append({
+                            'columns': candidate,
+                            'uniqueness_ratio': full_count / total,
+                            'coverage': float(np.count_nonzero(present)) / total,
+                            'unique_values': full_count,
+                            'total_values': total
+                        })
+                        continue
+                if size < max_size:
+                    next_level[candidate] = (new_ids, new_count)
+
+        if len(keys) >= max_results or not next_level:
+            break
+
+        # Keep the most discriminating partial combinations for the next level
+        if len(next_level) > beam_width:
+            best = sorted(next_level, key=lambda combo: -next_level[combo][1])[:beam_width]
+            next_level = {combo: next_level[combo] for combo in best}
+        level = next_level
+
+    keys.sort(key=lambda key: (len(key['columns']), -key['uniqueness_ratio'], -key['coverage']))
+    return keys[:max_results]
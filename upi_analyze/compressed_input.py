@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Compressed Input Streams
+Opens gzip (.gz), zip (.zip) and snappy framed (.sz/.snappy) snapshots as
+binary streams of their decompressed JSON lines, so they can be scanned
+without first being decompressed to disk. Block-framed inputs - BGZF-style
+gzip, whose members record their own size, and the snappy framing format -
+are decompressed in parallel worker threads; other gzip and zip inputs are
+decompressed in one background thread ahead of the parser.
+"""
+
+import argparse
+import glob
+import io
+import os
+import struct
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, List, Optional
+
+try:
+    import snappy
+except ImportError:
+    snappy = None
+
+# Suffix -> compression; anything else is read as plain JSON lines
+COMPRESSIONS = {'.gz': 'gzip', '.zip': 'zip', '.sz': 'snappy', '.snappy': 'snappy'}
+
+# Snapshot file patterns picked up by the analyzers, plain files first
+JSON_PATTERNS = ('*.json', '*.json.gz', '*.zip', '*.json.sz', '*.json.snappy')
+
+DECOMPRESS_THREADS = min(8, os.cpu_count() or 1)
+
+READ_SIZE = 1024 * 1024
+
+# BGZF blocks hold at most 64 KB; about this much compressed input is
+# handed to a worker thread at a time
+_BATCH_BYTES = 1024 * 1024
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_BGZF_BLOCK_INPUT = 0xff00
+_BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+_SNAPPY_STREAM_ID = b'\xff\x06\x00\x00sNaPpY'
+_SNAPPY_COMPRESSED = 0x00
+_SNAPPY_UNCOMPRESSED = 0x01
+
+def compression_of(file_path: str) -> Optional[str]:
+    """Compression of a file judged by its suffix ('gzip', 'zip', 'snappy'), or None for plain files."""
+    return COMPRESSIONS.get(os.path.splitext(file_path)[1].lower())
+
+def find_json_files(directory: Optional[str] = None) -> List[str]:
+    """Plain and compressed JSON lines snapshots in a directory, default the current one (see JSON_PATTERNS)."""
+    return [path for pattern in JSON_PATTERNS
+            for path in glob.glob(os.path.join(directory, pattern) if directory else pattern)]
+
+class _ChunkReader(io.RawIOBase):
+    """Raw stream over an iterator of byte chunks; closing it closes the iterator."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._chunk = memoryview(b'')
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._chunk:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._chunk = memoryview(chunk)
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+    def close(self) -> None:
+        if not self.closed:
+            self._chunks.close()
+        super().close()
+
+def _ordered_map(func: Callable[[Any], bytes], items: Iterable[Any], threads: int) -> Iterator[bytes]:
+    """Yield func(item) in input order, keeping at most 2 * threads items in flight."""
+    if threads <= 1:
+        for item in items:
+            yield func(item)
+        return
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        pending = deque()
+        try:
+            for item in items:
+                pending.append(executor.submit(func, item))
+                if len(pending) >= 2 * threads:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+def _readahead(chunks: Iterator[bytes], depth: int = 4) -> Iterator[bytes]:
+    """Produce chunks in a background thread, up to depth chunks ahead of the consumer."""
+    executor = ThreadPoolExecutor(max_workers=1)
+    pending = deque(executor.submit(next, chunks, None) for _ in range(depth))
+    try:
+        while True:
+            chunk = pending.popleft().result()
+            if chunk is None:
+                break
+            pending.append(executor.submit(next, chunks, None))
+            yield chunk
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+        chunks.close()
+
+def _bgzf_block_size(header: bytes) -> Optional[int]:
+    """Total size of a gzip member from the BGZF 'BC' subfield of its header, or None if it has none.
+
+    header must hold the fixed 12 header bytes and the whole extra field.
+    """
+    if len(header) < 12 or header[:2] != _GZIP_MAGIC or not header[3] & 0x04:
+        return None
+    extra_end = 12 + struct.unpack_from('<H', header, 10)[0]
+    position = 12
+    while position + 4 <= min(extra_end, len(header)):
+        subfield_length = struct.unpack_from('<H', header, position + 2)[0]
+        if header[position:position + 2] == b'BC' and subfield_length == 2 and position + 6 <= len(header):
+            return struct.unpack_from('<H', header, position + 4)[0] + 1
+        position += 4 + subfield_length
+    return None
+
+def _bgzf_batches(f: BinaryIO) -> Iterator[List[bytes]]:
+    """Read whole BGZF members, grouped into batches of about _BATCH_BYTES."""
+    batch = []
+    batch_bytes = 0
+    while True:
+        header = f.read(12)
+        if not header:
+            break
+        if len(header) == 12:
+            header += f.read(struct.unpack_from('<H', header, 10)[0])
+        block_size = _bgzf_block_size(header)
+        if block_size is None:
+            raise ValueError(f"Not a BGZF block at offset {f.tell() - len(header)}")
+        block = header + f.read(block_size - len(header))
+        if len(block) != block_size:
+            raise EOFError("Truncated BGZF block")
+        batch.append(block)
+        batch_bytes += block_size
+        if batch_bytes >= _BATCH_BYTES:
+            yield batch
+            batch = []
+            batch_bytes = 0
+    if batch:
+        yield batch
+
+def _gunzip_blocks(blocks: List[bytes]) -> bytes:
+    """Decompress whole gzip members (checking their CRCs) and join the results."""
+    return b''.join(zlib.decompress(block, wbits=31) for block in blocks)
+
+def _gzip_chunks(f: BinaryIO) -> Iterator[bytes]:
+    """Decompress a gzip stream of one or more members serially."""
+    decompressor = zlib.decompressobj(wbits=31)
+    in_member = False
+    while True:
+        data = f.read(READ_SIZE)
+        if not data:
+            break
+        while data:
+            chunk = decompressor.decompress(data)
+            if chunk:
+                yield chunk
+            in_member = not decompressor.eof
+            if in_member:
+                break
+            # Next member of a multi-member file
+            data = decompressor.unused_data
+            decompressor = zlib.decompressobj(wbits=31)
+    if in_member:
+        raise EOFError("Truncated gzip stream")
+
+def gzip_chunks(file_path: str, threads: int = DECOMPRESS_THREADS) -> Iterator[bytes]:
+    """Decompressed chunks of a gzip file.
+
+    BGZF-style files are inflated in parallel threads; other files (whose
+    member boundaries are only found by inflating them) in one thread
+    running ahead of the consumer.
+    """
+    with open(file_path, 'rb') as f:
+        if _bgzf_block_size(f.peek(1024)[:1024]) is not None:
+            yield from _ordered_map(_gunzip_blocks, _bgzf_batches(f), threads)
+        else:
+            yield from _readahead(_gzip_chunks(f))
+
+def zip_members(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    """Members to read from an archive: its .json/.jsonl files, or every file if there are none."""
+    files = [info for info in archive.infolist() if not info.is_dir()]
+    json_files = [info for info in files if info.filename.lower().endswith(('.json', '.jsonl'))]
+    return json_files or files
+
+def zip_chunks(file_path: str) -> Iterator[bytes]:
+    """Decompressed chunks of the JSON members of a zip archive, in archive order."""
+    with zipfile.ZipFile(file_path) as archive:
+        for info in zip_members(archive):
+            with archive.open(info) as member:
+                last = b''
+                while True:
+                    chunk = member.read(READ_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+                    last = chunk
+            # Members are concatenated, so each must end its last line
+            if last and not last.endswith(b'\n'):
+                yield b'\n'
+
+def _snappy_chunk_data(chunk: bytes) -> bytes:
+    if chunk[0] == _SNAPPY_COMPRESSED:
+        return snappy.uncompress(chunk[8:])
+    return chunk[8:]
+
+def _snappy_batch(chunks: List[bytes]) -> bytes:
+    return b''.join(_snappy_chunk_data(chunk) for chunk in chunks)
+
+def _snappy_batches(f: BinaryIO) -> Iterator[List[bytes]]:
+    """Read the data chunks of a snappy framed stream, skipping padding and skippable chunks."""
+    if f.read(len(_SNAPPY_STREAM_ID)) != _SNAPPY_STREAM_ID:
+        raise ValueError("Not a snappy framed stream (missing stream identifier)")
+    batch = []
+    batch_bytes = 0
+    while True:
+        header = f.read(4)
+        if not header:
+            break
+        if len(header) < 4:
+            raise EOFError("Truncated snappy chunk header")
+        chunk_type = header[0]
+        length = int.from_bytes(header[1:], 'little')
+        body = f.read(length)
+        if len(body) != length:
+            raise EOFError("Truncated snappy chunk")
+        if chunk_type in (_SNAPPY_COMPRESSED, _SNAPPY_UNCOMPRESSED):
+            batch.append(header + body)
+            batch_bytes += length
+            if batch_bytes >= _BATCH_BYTES:
+                yield batch
+                batch = []
+                batch_bytes = 0
+        elif chunk_type < 0x80:
+            raise ValueError(f"Unsupported snappy chunk type 0x{chunk_type:02x}")
+        # 0x80-0xfe: skippable chunks (and repeated stream identifiers)
+    if batch:
+        yield batch
+
+def snappy_chunks(file_path: str, threads: int = DECOMPRESS_THREADS) -> Iterator[bytes]:
+    """Decompressed chunks of a snappy framed file, with chunks inflated in parallel threads.
+
+    Chunk checksums are not verified.
+    """
+    if snappy is None:
+        raise ImportError("python-snappy is required for snappy inputs (pip install python-snappy)")
+    with open(file_path, 'rb') as f:
+        yield from _ordered_map(_snappy_batch, _snappy_batches(f), threads)
+
+def estimate_decompressed_size(file_path: str, sample_bytes: int = 4 * 1024 * 1024) -> int:
+    """Decompressed size of a file without decompressing all of it.
+
+    Exact for zip (from the member sizes); gzip and snappy sizes are
+    extrapolated from the compression ratio of the first sample_bytes.
+    """
+    compression = compression_of(file_path)
+    size = os.path.getsize(file_path)
+    if compression is None:
+        return size
+    if compression == 'zip':
+        with zipfile.ZipFile(file_path) as archive:
+            return sum(info.file_size for info in zip_members(archive))
+
+    with open(file_path, 'rb') as f:
+        sample = f.read(sample_bytes)
+    consumed = decompressed = 0
+    try:
+        if compression == 'gzip':
+            consumed = len(sample)
+            for chunk in _gzip_chunks(io.BytesIO(sample)):
+                decompressed += len(chunk)
+        else:
+            if snappy is None:
+                raise ImportError("python-snappy is required for snappy inputs (pip install python-snappy)")
+            for batch in _snappy_batches(io.BytesIO(sample)):
+                for chunk in batch:
+                    consumed += len(chunk)
+                    decompressed += len(_snappy_chunk_data(chunk))
+    except EOFError:
+        # The sample usually ends inside a member or chunk
+        pass
+    if not consumed or not decompressed:
+        return size
+    return int(size * decompressed / consumed)
+
+def open_input(file_path: str, threads: int = DECOMPRESS_THREADS) -> BinaryIO:
+    """Open a plain or compressed JSON lines file as a binary stream of its decompressed bytes.
+
+    The result iterates over lines like a file opened in 'rb' mode and
+    should be closed (or used as a context manager) to stop the worker
+    threads.
+    """
+    compression = compression_of(file_path)
+    if compression is None:
+        return open(file_path, 'rb')
+    if compression == 'gzip':
+        chunks = gzip_chunks(file_path, threads)
+    elif compression == 'zip':
+        chunks = _readahead(zip_chunks(file_path))
+    else:
+        chunks = snappy_chunks(file_path, threads)
+    return io.BufferedReader(_ChunkReader(chunks), buffer_size=READ_SIZE)
+
+def _bgzf_block(data: bytes, level: int) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    deflated = compressor.compress(data) + compressor.flush()
+    header = (b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00'
+              + struct.pack('<H', 18 + len(deflated) + 8 - 1))
+    return header + deflated + struct.pack('<II', zlib.crc32(data), len(data))
+
+def write_bgzf(input_path: str, output_path: str, level: int = 6, threads: int = DECOMPRESS_THREADS) -> None:
+    """Gzip a file as BGZF blocks (readable by any gzip tool) so open_input can inflate it in parallel."""
+    def blocks() -> Iterator[bytes]:
+        with open(input_path, 'rb') as f:
+            while True:
+                data = f.read(_BGZF_BLOCK_INPUT * 16)
+                if not data:
+                    break
+                yield data
+
+    def compress(data: bytes) -> bytes:
+        return b''.join(_bgzf_block(data[i:i + _BGZF_BLOCK_INPUT], level)
+                        for i in range(0, len(data), _BGZF_BLOCK_INPUT))
+
+    with open(output_path, 'wb') as out:
+        for compressed in _ordered_map(compress, blocks(), threads):
+            out.write(compressed)
+        out.write(_BGZF_EOF)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('files', nargs='+', help='JSON lines files to compress to <file>.gz as BGZF')
+    parser.add_argument('--level', type=int, default=6, help='Deflate level (default: 6)')
+    parser.add_argument('--threads', type=int, default=DECOMPRESS_THREADS,
+                        help=f'Compression threads (default: {DECOMPRESS_THREADS})')
+    args = parser.parse_args(argv)
+
+    for file_path in args.files:
+        write_bgzf(file_path, file_path + '.gz', args.level, args.threads)
+        print(f"  - {file_path}.gz ({os.path.getsize(file_path + '.gz') / (1024 * 1024):.1f} MB)")
+
+if __name__ == "__main__":
+    main()
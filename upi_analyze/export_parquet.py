@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+UPI Parquet Exporter
+Streams JSON lines snapshots, flattens every record to one row of leaf
+columns (Header.*, Identifier.*, Derived.CFI[n].*, Attributes.*) and writes
+Parquet files in bounded row groups, partitioned by AssetClass and snapshot
+date, so Databricks can read the columns without re-parsing JSON.
+"""
+
+import argparse
+import glob
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from analyze_json_primary_keys import child_path, iter_json_lines
+from json_backends import BACKENDS
+
+_SNAPSHOT_DATE = re.compile(r'-(\d{4})(\d{2})(\d{2})\.json$')
+
+_UNSAFE_PATH_CHARS = re.compile(r'[^A-Za-z0-9_.-]')
+
+def flatten_record(obj: Any, prefix: str = "", row: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Flatten a record into {leaf path: value}, following every list element by index.
+
+    Paths use the analyzer's notation (e.g. Derived.CFI[0].Attributes[1].Value)
+    and match the column expressions in columns_index.sql.
+    """
+    if row is None:
+        row = {}
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            flatten_record(value, child_path(prefix, key), row)
+    elif isinstance(obj, list):
+        for index, element in enumerate(obj):
+            flatten_record(element, child_path(prefix, index), row)
+    elif prefix:
+        row[prefix] = obj
+    return row
+
+def snapshot_date(file_path: str) -> str:
+    """The YYYY-MM-DD date of a <prefix>-YYYYMMDD.json snapshot, or 'unknown'."""
+    match = _SNAPSHOT_DATE.search(os.path.basename(file_path))
+    return '-'.join(match.groups()) if match else 'unknown'
+
+def _string_array(values: List[Any]) -> 'pa.Array':
+    return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+
+def _column_array(values: List[Any], current_type: Optional['pa.DataType']) -> 'pa.Array':
+    # Keep the column's current type when the batch fits it; string columns
+    # absorb any value, otherwise Arrow infers a new type and mixed-type
+    # columns fall back to strings
+    if current_type is not None:
+        try:
+            return pa.array(values, type=current_type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            if pa.types.is_string(current_type):
+                return _string_array(values)
+    try:
+        array = pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        return _string_array(values)
+    if pa.types.is_null(array.type):
+        # Columns that are all null so far are most often optional strings
+        return pa.array(values, type=pa.string())
+    if pa.types.is_floating(array.type) and any(
+            type(value) is int and not -2 ** 63 <= value < 2 ** 63 for value in values):
+        # Integers beyond int64 would silently lose precision as doubles
+        return _string_array(values)
+    return array
+
+class PartitionWriter:
+    """Writes the rows of one partition as part-<stem>-NNNNN.parquet files.
+
+    Rows are buffered up to row_group_size and written as one row group, so
+    memory stays bounded by a single row group. A row group whose columns
+    or types differ from the open file's schema starts a new part file.
+    """
+
+    def __init__(self, directory: str, stem: str, row_group_size: int = 100000,
+                 compression: str = 'snappy'):
+        self.directory = directory
+        self.stem = stem
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.rows: List[Dict[str, Any]] = []
+        self.schema = None
+        self.writer = None
+        self.paths: List[str] = []
+        self.rows_written = 0
+
+        os.makedirs(directory, exist_ok=True)
+        # Re-exporting a file replaces its previous parts
+        for old_path in glob.glob(os.path.join(directory, f"part-{glob.escape(stem)}-*.parquet")):
+            os.remove(old_path)
+
+    def add(self, row: Dict[str, Any]) -> None:
+        self.rows.append(row)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def _to_table(self) -> 'pa.Table':
+        names = list(self.schema.names) if self.schema is not None else []
+        known = set(names)
+        for row in self.rows:
+            for name in row:
+                if name not in known:
+                    known.add(name)
+                    names.append(name)
+
+        arrays = []
+        for name in names:
+            current_type = None
+            if self.schema is not None and self.schema.get_field_index(name) != -1:
+                current_type = self.schema.field(name).type
+            arrays.append(_column_array([row.get(name) for row in self.rows], current_type))
+        return pa.Table.from_arrays(arrays, names=names)
+
+    def flush(self) -> None:
+        if not self.rows:
+            return
+        table = self._to_table()
+        if self.writer is None or not table.schema.equals(self.schema):
+            self._close_writer()
+            path = os.path.join(self.directory, f"part-{self.stem}-{len(self.paths):05d}.parquet")
+            self.writer = pq.ParquetWriter(path, table.schema, compression=self.compression)
+            self.schema = table.schema
+            self.paths.append(path)
+        self.writer.write_table(table, row_group_size=self.row_group_size)
+        self.rows_written += len(self.rows)
+        self.rows = []
+
+    def _close_writer(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def close(self) -> None:
+        self.flush()
+        self._close_writer()
+
+def export_file(file_path: str, output_dir: str, row_group_size: int = 100000,
+                compression: str = 'snappy', json_backend: str = 'auto') -> Dict[str, Any]:
+    """Export one snapshot to <output_dir>/AssetClass=<class>/snapshot_date=<date>/ part files."""
+    if pa is None:
+        raise ImportError("pyarrow is required for Parquet export (pip install pyarrow)")
+
+    date = snapshot_date(file_path)
+    stem = _UNSAFE_PATH_CHARS.sub('_', os.path.splitext(os.path.basename(file_path))[0])
+    writers: Dict[str, PartitionWriter] = {}
+    records = 0
+    try:
+        for record in iter_json_lines(file_path, json_backend=json_backend):
+            header = record.get('Header') if isinstance(record, dict) else None
+            asset_class = header.get('AssetClass') if isinstance(header, dict) else None
+            partition = _UNSAFE_PATH_CHARS.sub('_', str(asset_class)) if asset_class else 'unknown'
+
+            writer = writers.get(partition)
+            if writer is None:
+                directory = os.path.join(output_dir, f"AssetClass={partition}", f"snapshot_date={date}")
+                writer = writers[partition] = PartitionWriter(directory, stem, row_group_size, compression)
+            writer.add(flatten_record(record))
+            records += 1
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    return {
+        'file': os.path.basename(file_path),
+        'records': records,
+        'partitions': sorted(writers),
+        'parquet_files': [path for writer in writers.values() for path in writer.paths]
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('files', nargs='*', help='Snapshots to export (default: *.json in the current directory)')
+    parser.add_argument('-o', '--output-dir', default='parquet',
+                        help='Root directory of the partitioned dataset (default: parquet)')
+    parser.add_argument('--row-group-size', type=int, default=100000,
+                        help='Rows buffered per partition and written per row group (default: 100000)')
+    parser.add_argument('--compression', default='snappy',
+                        choices=('snappy', 'zstd', 'gzip', 'lz4', 'brotli', 'none'),
+                        help='Parquet compression codec (default: snappy)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes exporting files in parallel (default: 1)')
+    parser.add_argument('--json-backend', choices=BACKENDS, default='auto',
+                        help='JSON decoder to use; auto picks the fastest installed one (default: auto)')
+    args = parser.parse_args(argv)
+
+    if pa is None:
+        parser.error("pyarrow is required for Parquet export (pip install pyarrow)")
+
+    json_files = sorted(args.files or glob.glob("*.json"))
+    if not json_files:
+        print("No JSON files found in the current directory.")
+        return
+
+    options = dict(output_dir=args.output_dir, row_group_size=args.row_group_size,
+                   compression=args.compression, json_backend=args.json_backend)
+    print(f"Exporting {len(json_files)} file(s) to {args.output_dir}/")
+    if args.workers > 1 and len(json_files) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(json_files))) as executor:
+            futures = [executor.submit(export_file, json_file, **options) for json_file in json_files]
+            results = [future.result() for future in futures]
+    else:
+        results = [export_file(json_file, **options) for json_file in json_files]
+
+    for result in results:
+        print(f"  {result['file']}: {result['records']} records -> {len(result['parquet_files'])} "
+              f"Parquet file(s) in {', '.join(result['partitions']) or 'no partitions'}")
+
+if __name__ == "__main__":
+    main()
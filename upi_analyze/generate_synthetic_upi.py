@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Synthetic UPI Data Generator
+Writes deterministic JSON lines snapshots shaped like the real UPI files
+(TemplateVersion/Header/Identifier/Derived/Attributes, with per-asset-class
+instrument types and use cases) so the analyzers can be tested and
+benchmarked without the production data.
+"""
+
+import argparse
+import json
+import os
+import random
+from typing import Any, Dict, List, Optional
+
+ASSET_CLASSES = {
+    'Commodities': {
+        'instrument_types': ['Swap'],
+        'use_cases': ['Basis_Swap', 'Single_Index', 'Multi_Exotic_Swap'],
+        'cfi_category': ('J', 'Swaps'),
+    },
+    'Credit': {
+        'instrument_types': ['Swap'],
+        'use_cases': ['Index'],
+        'cfi_category': ('S', 'Swaps'),
+    },
+    'Equity': {
+        'instrument_types': ['Forward', 'Option', 'Swap'],
+        'use_cases': ['Non_Standard', 'Price_Return_Basic_Performance_Single_Index', 'Basket',
+                      'Single_Index', 'Parameter_Return_Dividend_Basket', 'Portfolio_Swap',
+                      'Parameter_Return_Variance_Single_Index'],
+        'cfi_category': ('S', 'Swaps'),
+    },
+    'Foreign_Exchange': {
+        'instrument_types': ['Forward', 'Swap', 'Option'],
+        'use_cases': ['Forward', 'FX_Swap', 'NDF', 'Vanilla_Option', 'Barrier_Option', 'Digital_Option',
+                      'Rolling_Spot', 'Contract_For_Difference', 'NDO'],
+        'cfi_category': ('J', 'Forwards'),
+    },
+    'Rates': {
+        'instrument_types': ['Swap'],
+        'use_cases': ['Basis', 'Fixed_Float', 'Fixed_Float_OIS', 'Cross_Currency_Basis',
+                      'Cross_Currency_Fixed_Float', 'Inflation_Fixed_Float_Zero_Coupon'],
+        'cfi_category': ('S', 'Swaps'),
+    },
+    'Other': {
+        'instrument_types': ['Swap', 'Other', 'Option'],
+        'use_cases': ['Non_Standard'],
+        'cfi_category': ('M', 'Others'),
+    },
+}
+
+CURRENCIES = ['USD', 'EUR', 'GBP', 'JPY', 'CHF', 'AUD', 'CAD', 'SEK', 'NOK', 'BRL']
+
+REFERENCE_RATES = ['SOFR', 'ESTR', 'SONIA', 'TONA', 'SARON', 'EURIBOR', 'CORRA', 'BBSW', 'STIBOR', 'CDI']
+
+DELIVERY_TYPES = ['CASH', 'PHYS', 'OPTL']
+
+UPI_ALPHABET = '0123456789ABCDEFGHJKLMNPQRSTVWXYZ'
+
+# UPIs are 'QZ' + 10 characters; multiplying the record number by a constant
+# coprime to the code space gives unique, random-looking codes
+_UPI_SPACE = len(UPI_ALPHABET) ** 10
+_UPI_MULTIPLIER = 48271 * 2147483647
+
+def synthetic_upi(number: int, salt: int = 0) -> str:
+    """Deterministic 12-character UPI; distinct numbers map to distinct UPIs for the same salt."""
+    code = ((number + 1) * _UPI_MULTIPLIER + salt * 7919) % _UPI_SPACE
+    chars = []
+    for _ in range(10):
+        code, digit = divmod(code, len(UPI_ALPHABET))
+        chars.append(UPI_ALPHABET[digit])
+    return 'QZ' + ''.join(reversed(chars))
+
+def _nested_details(rng: random.Random, depth: int) -> Dict[str, Any]:
+    details = {'Sequence': rng.randrange(100), 'Flag': rng.random() < 0.5}
+    if depth > 1:
+        details['Details'] = _nested_details(rng, depth - 1)
+    return details
+
+def generate_record(rng: random.Random, asset_class: str, upi: str, snapshot_date: str,
+                    nesting_depth: int = 0) -> Dict[str, Any]:
+    """One UPI record of the given asset class; nesting_depth adds that many nested Attributes.Details levels."""
+    profile = ASSET_CLASSES[asset_class]
+    instrument_type = rng.choice(profile['instrument_types'])
+    use_case = rng.choice(profile['use_cases'])
+    currency = rng.choice(CURRENCIES)
+    reference_rate = rng.choice(REFERENCE_RATES)
+    category_code, category_value = profile['cfi_category']
+    delivery = rng.choice(DELIVERY_TYPES)
+
+    cfi_value = category_code + ''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for _ in range(5))
+    cfi = [{
+        'Version': '2015',
+        'VersionStatus': 'Current',
+        'Value': cfi_value,
+        'Category': {'Code': category_code, 'Value': category_value},
+        'Group': {'Code': cfi_value[1], 'Value': instrument_type},
+        'Attributes': [
+            {'Name': 'Underlying Assets', 'Code': cfi_value[2], 'Value': reference_rate},
+            {'Name': 'Return or Payout Trigger', 'Code': cfi_value[3], 'Value': use_case},
+            {'Name': 'Not Applicable', 'Code': 'X', 'Value': 'Not Applicable'},
+            {'Name': 'Delivery', 'Code': cfi_value[5], 'Value': delivery},
+        ],
+    }]
+    if rng.random() < 0.7:
+        cfi.append({'Version': '2021', 'VersionStatus': 'Draft', 'Value': cfi_value[:4] + 'XX'})
+
+    attributes = {
+        'NotionalCurrency': currency,
+        'ReferenceRate': reference_rate,
+        'ReferenceRateTermValue': rng.choice([1, 3, 6, 12]),
+        'ReferenceRateTermUnit': rng.choice(['DAYS', 'MNTH', 'YEAR']),
+        'NotionalSchedule': rng.choice(['Constant', 'Accreting', 'Amortising']),
+        'DeliveryType': delivery,
+    }
+    if 'Basis' in use_case or 'Cross_Currency' in use_case:
+        attributes['OtherLegReferenceRate'] = rng.choice(REFERENCE_RATES)
+        attributes['OtherLegReferenceRateTermValue'] = rng.choice([1, 3, 6])
+        attributes['OtherLegReferenceRateTermUnit'] = 'MNTH'
+    if nesting_depth > 0:
+        attributes['Details'] = _nested_details(rng, nesting_depth)
+
+    return {
+        'TemplateVersion': 1,
+        'Header': {
+            'AssetClass': asset_class,
+            'InstrumentType': instrument_type,
+            'UseCase': use_case,
+            'Level': 'UPI',
+        },
+        'Identifier': {
+            'UPI': upi,
+            'Status': 'New' if rng.random() < 0.95 else 'Deprecated',
+            'StatusReason': None,
+            'LastUpdateDateTime': f"{snapshot_date[:4]}-{snapshot_date[4:6]}-{rng.randint(1, 28):02d}"
+                                  f"T{rng.randrange(24):02d}:{rng.randrange(60):02d}:00",
+        },
+        'Derived': {
+            'ClassificationType': rng.choice(['CFI', 'ISDA']),
+            'UnderlyingAssetType': reference_rate,
+            'SingleorMultiCurrency': rng.choice(['Single Currency', 'Multi Currency']),
+            'CFIDeliveryType': delivery,
+            'ShortName': f"{asset_class[:3].upper()}/{instrument_type}/{use_case}/{currency}",
+            'UnderlierName': f"{reference_rate} {rng.choice([1, 3, 6, 12])}M",
+            'CFI': cfi,
+        },
+        'Attributes': attributes,
+    }
+
+def write_synthetic_file(file_path: str, records: int, asset_class: str = 'Rates', seed: int = 0,
+                         duplicate_rate: float = 0.0, nesting_depth: int = 0,
+                         snapshot_date: str = '20250920') -> int:
+    """Write records synthetic lines to file_path; returns the number of duplicated UPIs written.
+
+    The output depends only on the arguments. With duplicate_rate > 0 that
+    fraction of records reuses the UPI of an earlier record in the file.
+    """
+    if asset_class not in ASSET_CLASSES:
+        raise ValueError(f"Unknown asset class {asset_class!r}; expected one of {list(ASSET_CLASSES)}")
+    rng = random.Random(f"{seed}:{asset_class}:{snapshot_date}")
+    salt = sorted(ASSET_CLASSES).index(asset_class) + seed * len(ASSET_CLASSES)
+    duplicates = 0
+    issued = 0
+    with open(file_path, 'w', encoding='utf-8', buffering=1024 * 1024) as f:
+        for _ in range(records):
+            if issued and rng.random() < duplicate_rate:
+                upi = synthetic_upi(rng.randrange(issued), salt)
+                duplicates += 1
+            else:
+                upi = synthetic_upi(issued, salt)
+                issued += 1
+            record = generate_record(rng, asset_class, upi, snapshot_date, nesting_depth)
+            f.write(json.dumps(record) + "\n")
+    return duplicates
+
+def generate_snapshots(output_dir: str, records: int, asset_classes: Optional[List[str]] = None,
+                       seed: int = 0, duplicate_rate: float = 0.0, nesting_depth: int = 0,
+                       snapshot_date: str = '20250920') -> List[str]:
+    """Split records across one <AssetClass>-<date>.json file per asset class; returns their paths."""
+    asset_classes = asset_classes or list(ASSET_CLASSES)
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for i, asset_class in enumerate(asset_classes):
+        count = records // len(asset_classes) + (1 if i < records % len(asset_classes) else 0)
+        path = os.path.join(output_dir, f"{asset_class}-{snapshot_date}.json")
+        write_synthetic_file(path, count, asset_class, seed, duplicate_rate, nesting_depth, snapshot_date)
+        paths.append(path)
+    return paths
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=10000,
+                        help='Total records, split evenly across the asset classes (default: 10000)')
+    parser.add_argument('--asset-classes', nargs='+', choices=list(ASSET_CLASSES), default=None,
+                        help='Asset classes to generate (default: all)')
+    parser.add_argument('--duplicate-rate', type=float, default=0.0,
+                        help='Fraction of records reusing an earlier UPI of the same file (default: 0)')
+    parser.add_argument('--nesting-depth', type=int, default=0,
+                        help='Extra nested Attributes.Details levels per record (default: 0)')
+    parser.add_argument('--date', default='20250920', help='Snapshot date YYYYMMDD (default: 20250920)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('-o', '--output-dir', default='.', help='Directory to write into (default: .)')
+    args = parser.parse_args(argv)
+
+    paths = generate_snapshots(args.output_dir, args.records, args.asset_classes, args.seed,
+                               args.duplicate_rate, args.nesting_depth, args.date)
+    for path in paths:
+        print(f"  - {path} ({os.path.getsize(path) / (1024 * 1024):.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+JSON Decoding Backends
+Selects the fastest installed JSON decoder (orjson, msgspec, or the stdlib
+json module) for the UPI scanners. All decoders take the raw bytes of one
+line and raise a ValueError subclass on malformed input.
+"""
+
+import json
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+BACKENDS = ('auto', 'orjson', 'msgspec', 'json')
+
+def available_backends() -> List[str]:
+    """Names of the concrete backends that can be used in this environment."""
+    backends = []
+    if orjson is not None:
+        backends.append('orjson')
+    if msgspec is not None:
+        backends.append('msgspec')
+    backends.append('json')
+    return backends
+
+def resolve_backend(backend: str = 'auto') -> str:
+    """Turn 'auto' into the preferred installed backend; reject unknown or missing ones.
+
+    orjson is preferred even when only a few fields are needed: on UPI
+    records its full decode still beats msgspec skipping the unused fields
+    (see bench_json_backends.py).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend {backend!r}; expected one of {BACKENDS}")
+    installed = available_backends()
+    if backend == 'auto':
+        return installed[0]
+    if backend not in installed:
+        raise ValueError(f"JSON backend {backend!r} is not installed")
+    return backend
+
+def _msgspec_fields_decoder(fields: Tuple[str, ...]) -> Callable[[bytes], Any]:
+    # Only the named top-level fields are decoded (as plain Python values);
+    # all other fields are skipped by the parser
+    record_type = msgspec.defstruct(
+        'PartialRecord', [(field, Any, msgspec.UNSET) for field in fields], kw_only=True)
+    decoder = msgspec.json.Decoder(record_type)
+    unset = msgspec.UNSET
+
+    def decode(line: bytes) -> Any:
+        record = decoder.decode(line)
+        result = {}
+        for field in fields:
+            value = getattr(record, field)
+            if value is not unset:
+                result[field] = value
+        return result
+
+    return decode
+
+@lru_cache(maxsize=None)
+def get_decoder(backend: str = 'auto', fields: Optional[Tuple[str, ...]] = None) -> Callable[[bytes], Any]:
+    """Return a function decoding one JSON line (bytes) into Python objects.
+
+    If fields is given the caller only needs those top-level fields, and the
+    result may omit the others (a dict is always returned for objects). With
+    msgspec that avoids decoding the rest of the record; other backends
+    decode the full record.
+    """
+    backend = resolve_backend(backend)
+    if backend == 'orjson':
+        return orjson.loads
+    if backend == 'msgspec':
+        if fields:
+            return _msgspec_fields_decoder(tuple(fields))
+        return msgspec.json.Decoder().decode
+    return json.loads
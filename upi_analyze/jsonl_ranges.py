@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+JSON Lines Byte-Range Helpers
+Splits a large JSON lines file into newline-aligned byte ranges so that
+separate workers can scan one file in parallel. Compressed files cannot be
+split and are streamed whole (see compressed_input).
+"""
+
+import mmap
+import os
+from typing import Iterator, List, Optional, Tuple
+
+from compressed_input import compression_of, open_input
+
+def split_byte_ranges(file_path: str, parts: int) -> List[Tuple[int, Optional[int]]]:
+    """Split a file into at most `parts` [start, end) ranges that begin on a line start.
+
+    A compressed file comes back as the single range (0, None), its whole
+    decompressed stream.
+    """
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return []
+    if compression_of(file_path) is not None:
+        return [(0, None)]
+    if parts <= 1:
+        return [(0, size)]
+
+    boundaries = [0]
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in range(1, parts):
+            target = max(size * i // parts, boundaries[-1])
+            newline = mm.find(b'\n', target)
+            if newline == -1:
+                break
+            boundary = newline + 1
+            if boundary > boundaries[-1] and boundary < size:
+                boundaries.append(boundary)
+    boundaries.append(size)
+
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+def iter_range_lines(file_path: str, start: int = 0, end: int = None) -> Iterator[Tuple[int, bytes]]:
+    """Yield (line_number, raw_line) for lines starting in [start, end), numbered from 1 within the range.
+
+    Compressed files can only be read whole (start 0, end None).
+    """
+    if compression_of(file_path) is not None:
+        if start != 0 or end is not None:
+            raise ValueError(f"Cannot read a byte range of compressed file {file_path}")
+        with open_input(file_path) as f:
+            yield from enumerate(f, 1)
+        return
+    if end is None:
+        end = os.path.getsize(file_path)
+    if end <= start:
+        return
+
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        mm.seek(start)
+        line_num = 0
+        while mm.tell() < end:
+            line = mm.readline()
+            if not line:
+                break
+            line_num += 1
+            yield line_num, line
+
+def iter_range_offsets(file_path: str, start: int = 0, end: int = None) -> Iterator[Tuple[int, bytes]]:
+    """Yield (byte_offset, raw_line) for lines starting in [start, end), offsets relative to the file start.
+
+    Offsets are for seeking back into the file, so compressed files, which
+    have no such offsets, raise ValueError.
+    """
+    if compression_of(file_path) is not None:
+        raise ValueError(f"Cannot index byte offsets of compressed file {file_path}; decompress it first")
+    if end is None:
+        end = os.path.getsize(file_path)
+    if end <= start:
+        return
+
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        mm.seek(start)
+        offset = start
+        while offset < end:
+            line = mm.readline()
+            if not line:
+                break
+            yield offset, line
+            offset += len(line)
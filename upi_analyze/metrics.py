@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Stage Metrics
+Lightweight per-stage instrumentation for the analyzers: wall and CPU time,
+records and bytes processed, throughput and peak memory, written as a JSON
+metrics file. While disabled every hook is a no-op, so instrumented code
+paths cost next to nothing.
+"""
+
+import cProfile
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size in MB of this process or its largest finished child (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _max_mb(first: Optional[float], second: Optional[float]) -> Optional[float]:
+    if first is None or second is None:
+        return second if first is None else first
+    return max(first, second)
+
+def _ensure_parent_dir(path: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+class StageStats:
+    """Totals for one named stage across all the times it ran."""
+
+    __slots__ = ('calls', 'wall_seconds', 'cpu_seconds', 'records', 'bytes_read', 'peak_rss_mb')
+
+    def __init__(self):
+        self.calls = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.records = 0
+        self.bytes_read = 0
+        self.peak_rss_mb = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'wall_seconds': self.wall_seconds,
+            'cpu_seconds': self.cpu_seconds,
+            'records': self.records,
+            'bytes_read': self.bytes_read,
+            'records_per_sec': self.records / self.wall_seconds if self.wall_seconds else None,
+            'mb_per_sec': self.bytes_read / (1024 * 1024) / self.wall_seconds if self.wall_seconds else None,
+            'peak_rss_mb': self.peak_rss_mb
+        }
+
+class _NullStage:
+    """Stand-in returned by Metrics.stage() while disabled."""
+
+    __slots__ = ()
+    records = 0
+    bytes_read = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __setattr__(self, name, value):
+        # Callers may do `stage.records += n`; drop it
+        pass
+
+_NULL_STAGE = _NullStage()
+
+class _Stage:
+    __slots__ = ('metrics', 'name', 'records', 'bytes_read', '_wall', '_cpu')
+
+    def __init__(self, metrics: 'Metrics', name: str, records: int, bytes_read: int):
+        self.metrics = metrics
+        self.name = name
+        self.records = records
+        self.bytes_read = bytes_read
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.add(self.name, time.perf_counter() - self._wall, self.records, self.bytes_read,
+                         cpu_seconds=time.process_time() - self._cpu)
+        return False
+
+class Metrics:
+    """Collects StageStats by name; disabled until enable() is called."""
+
+    def __init__(self):
+        self.enabled = False
+        self.stages: Dict[str, StageStats] = {}
+        self.started = time.perf_counter()
+        # Largest peak reported by a pool worker that merged its stages in
+        self.worker_peak_rss_mb: Optional[float] = None
+
+    def enable(self) -> None:
+        self.enabled = True
+        self.stages = {}
+        self.started = time.perf_counter()
+        self.worker_peak_rss_mb = None
+
+    def stage(self, name: str, records: int = 0, bytes_read: int = 0):
+        """Context manager timing one run of a stage; set .records/.bytes_read on it as work is done."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, records, bytes_read)
+
+    def add(self, name: str, wall_seconds: float, records: int = 0, bytes_read: int = 0,
+            cpu_seconds: float = 0.0, calls: int = 1) -> None:
+        """Record time spent in a stage that was measured by the caller."""
+        if not self.enabled:
+            return
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        stats.calls += calls
+        stats.wall_seconds += wall_seconds
+        stats.cpu_seconds += cpu_seconds
+        stats.records += records
+        stats.bytes_read += bytes_read
+        stats.peak_rss_mb = peak_rss_mb()
+
+    def merge(self, worker_metrics: Optional[Tuple[Dict[str, StageStats], Optional[float]]]) -> None:
+        """Add the (stages, peak RSS) a pool worker returned from measured_call; None is ignored."""
+        if not self.enabled or worker_metrics is None:
+            return
+        stages, worker_peak = worker_metrics
+        for name, worker_stats in stages.items():
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = StageStats()
+            stats.calls += worker_stats.calls
+            stats.wall_seconds += worker_stats.wall_seconds
+            stats.cpu_seconds += worker_stats.cpu_seconds
+            stats.records += worker_stats.records
+            stats.bytes_read += worker_stats.bytes_read
+            stats.peak_rss_mb = _max_mb(stats.peak_rss_mb, worker_stats.peak_rss_mb)
+        self.worker_peak_rss_mb = _max_mb(self.worker_peak_rss_mb, worker_peak)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            'command': sys.argv,
+            'total_wall_seconds': time.perf_counter() - self.started,
+            'peak_rss_mb': _max_mb(peak_rss_mb(), self.worker_peak_rss_mb),
+            'stages': {name: stats.to_dict() for name, stats in self.stages.items()}
+        }
+
+    def write(self, path: str) -> None:
+        """Write the report as JSON."""
+        _ensure_parent_dir(path)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+# Process-wide collector used by the analyzers
+METRICS = Metrics()
+
+def measured_call(metrics_enabled: bool, function: Callable[..., Any], *args, **kwargs
+                  ) -> Tuple[Any, Optional[Tuple[Dict[str, StageStats], Optional[float]]]]:
+    """Call function in a pool worker; returns (result, worker metrics) for METRICS.merge() in the parent.
+
+    Pool processes are reused and forked ones inherit the parent's
+    collector, so METRICS starts afresh for every call. The worker metrics
+    are None unless metrics_enabled.
+    """
+    if not metrics_enabled:
+        METRICS.enabled = False
+        return function(*args, **kwargs), None
+    METRICS.enable()
+    result = function(*args, **kwargs)
+    return result, (METRICS.stages, peak_rss_mb())
+
+@contextlib.contextmanager
+def profiled(output_path: Optional[str] = None) -> Iterator[None]:
+    """Run the block under cProfile and dump the stats to output_path; no-op when it is None."""
+    if output_path is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _ensure_parent_dir(output_path)
+        profiler.dump_stats(output_path)
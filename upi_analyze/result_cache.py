@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Incremental Result Cache
+Persists per-file scan results between runs, keyed on the file's path, size
+and modification time (optionally its content hash) plus the options that
+affect the result, so daily runs only re-scan new or changed snapshots.
+"""
+
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+# Bump when the layout of cached values changes so old entries are ignored
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = '.upi_cache'
+
+ENTRY_FILE = 'entry.pkl'
+
+def file_fingerprint(file_path: str, hash_contents: bool = False) -> tuple:
+    """Identify a file's current contents by (path, size, mtime) or (path, size, content hash)."""
+    stat = os.stat(file_path)
+    if not hash_contents:
+        return os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(4 * 1024 * 1024), b''):
+            digest.update(block)
+    return os.path.abspath(file_path), stat.st_size, digest.hexdigest()
+
+class ResultCache:
+    """Directory of cache entries, one sub-directory per key.
+
+    Each entry holds the pickled value and, optionally, attached files (such
+    as sorted UPI runs) that were moved into the entry when it was stored.
+    Entries are written to a temporary directory and renamed into place, so
+    a crashed run never leaves a partial entry behind. Reading an entry
+    refreshes its last-used time, which drives evict().
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_age_days: Optional[float] = 30,
+                 max_size_mb: Optional[float] = 2048, hash_contents: bool = False):
+        self.cache_dir = cache_dir
+        self.max_age_days = max_age_days
+        self.max_size_mb = max_size_mb
+        self.hash_contents = hash_contents
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, namespace: str, file_path: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """Cache key for a result computed by namespace over file_path with the given options."""
+        identity = (CACHE_VERSION, namespace, file_fingerprint(file_path, self.hash_contents),
+                    sorted((options or {}).items()))
+        return hashlib.blake2b(repr(identity).encode('utf-8'), digest_size=16).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if there is no usable entry."""
+        entry_path = os.path.join(self._entry_dir(key), ENTRY_FILE)
+        try:
+            with open(entry_path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(entry_path)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def attachment_paths(self, key: str) -> List[str]:
+        """Paths of the files attached to an entry, in the order they were attached."""
+        entry_dir = self._entry_dir(key)
+        return [os.path.join(entry_dir, name) for name in sorted(os.listdir(entry_dir)) if name != ENTRY_FILE]
+
+    def fits(self, paths: Sequence[str]) -> bool:
+        """Whether files of this total size can be kept without evict() removing them straight away."""
+        if self.max_size_mb is None:
+            return True
+        return sum(os.path.getsize(path) for path in paths) <= self.max_size_mb * 1024 * 1024
+
+    def put(self, key: str, value: Any, attachments: Sequence[str] = ()) -> List[str]:
+        """Store value under key, moving the attachment files into the entry.
+
+        Returns the new paths of the attachments. If the attachments alone
+        exceed max_size_mb, or another run stored the same key first,
+        nothing is stored and the attachments are returned where they were.
+        """
+        if not self.fits(attachments):
+            return list(attachments)
+        staging_dir = tempfile.mkdtemp(prefix='.staging_', dir=self.cache_dir)
+        try:
+            with open(os.path.join(staging_dir, ENTRY_FILE), 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            for index, path in enumerate(attachments):
+                shutil.move(path, os.path.join(staging_dir, f"{index:06d}{os.path.splitext(path)[1]}"))
+            os.rename(staging_dir, self._entry_dir(key))
+        except OSError:
+            # Put moved attachments back so the caller's paths stay valid
+            for index, path in enumerate(attachments):
+                staged = os.path.join(staging_dir, f"{index:06d}{os.path.splitext(path)[1]}")
+                if os.path.exists(staged):
+                    shutil.move(staged, path)
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            return list(attachments)
+        return self.attachment_paths(key)
+
+    def evict(self) -> int:
+        """Remove entries unused for max_age_days, then the least recently used beyond max_size_mb.
+
+        Returns the number of entries removed. Abandoned staging directories
+        older than a day are removed as well.
+        """
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            if not os.path.isdir(entry_dir):
+                continue
+            if name.startswith('.staging_'):
+                if now - os.path.getmtime(entry_dir) > 86400:
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                continue
+            try:
+                last_used = os.path.getmtime(os.path.join(entry_dir, ENTRY_FILE))
+                size = sum(os.path.getsize(os.path.join(entry_dir, f)) for f in os.listdir(entry_dir))
+            except OSError:
+                last_used, size = 0, 0
+            entries.append((last_used, size, entry_dir))
+
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+        max_bytes = None if self.max_size_mb is None else self.max_size_mb * 1024 * 1024
+        removed = 0
+        for last_used, size, entry_dir in entries:
+            expired = self.max_age_days is not None and now - last_used > self.max_age_days * 86400
+            oversized = max_bytes is not None and total_size > max_bytes
+            if not expired and not oversized:
+                continue
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= size
+            removed += 1
+        return removed
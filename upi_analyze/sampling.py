@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Record Sampling
+Representative alternatives to reading the first N lines of a JSON lines
+file: reservoir sampling over the whole stream, random byte-offset sampling
+for very large files, and sampling stratified by AssetClass/InstrumentType.
+"""
+
+import math
+import mmap
+import os
+import random
+from collections import defaultdict
+from itertools import islice
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+# 'first' keeps the historical first-N behaviour
+SAMPLE_MODES = ('first', 'reservoir', 'random', 'stratified')
+
+# Below this size random-seek sampling reads the whole file instead, where
+# a reservoir sample is cheap and exact
+RANDOM_SEEK_MIN_BYTES = 64 * 1024 * 1024
+
+def _open_unit(rng: random.Random) -> float:
+    """Uniform value in the open interval (0, 1)."""
+    while True:
+        value = rng.random()
+        if value > 0.0:
+            return value
+
+def reservoir_sample(items: Iterable[Any], k: int, rng: random.Random) -> List[Any]:
+    """Uniform sample of k items from a stream of unknown length, kept in stream order.
+
+    Uses Algorithm L, which draws random numbers only for the items that
+    enter the reservoir and skips over the rest.
+    """
+    if k <= 0:
+        return []
+    iterator = enumerate(items)
+    reservoir = list(islice(iterator, k))
+    if len(reservoir) == k:
+        weight = math.exp(math.log(_open_unit(rng)) / k)
+        while True:
+            skip = int(math.log(_open_unit(rng)) / math.log(1 - weight)) if weight < 1 else 0
+            entry = next(islice(iterator, skip, None), None)
+            if entry is None:
+                break
+            reservoir[rng.randrange(k)] = entry
+            weight *= math.exp(math.log(_open_unit(rng)) / k)
+    reservoir.sort(key=lambda entry: entry[0])
+    return [item for _, item in reservoir]
+
+def random_line_sample(file_path: str, k: int, rng: random.Random,
+                       max_probes: Optional[int] = None) -> List[bytes]:
+    """Sample k distinct non-blank lines by seeking to random byte offsets, in file order.
+
+    A random offset lands in a line with probability proportional to the
+    line's length, so each probe is accepted with probability
+    min_length / length, where min_length is the shortest line probed so
+    far. That makes every accepted line equally likely regardless of its
+    length. A line keeps its smallest acceptance draw over all probes that
+    hit it, so rejected lines stay eligible and repeated acceptances of a
+    line count once. Only the probed lines are read, so the cost depends
+    on k and the spread of line lengths rather than on the file size.
+    Fewer than k lines are returned if max_probes (default 50 * k + 1000)
+    runs out first.
+    """
+    size = os.path.getsize(file_path)
+    if size == 0 or k <= 0:
+        return []
+    if max_probes is None:
+        max_probes = 50 * k + 1000
+
+    # line start -> (smallest acceptance draw, line length)
+    probed: Dict[int, Tuple[float, float]] = {}
+    min_length = None
+    accepted = 0
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for _ in range(max_probes):
+            offset = rng.randrange(size)
+            # Resync on newlines: the line holding the offset runs from the
+            # byte after the previous newline through the next one
+            start = mm.rfind(b'\n', 0, offset) + 1
+            draw = rng.random()
+            if start in probed:
+                best, length = probed[start]
+                if draw < best and length != math.inf:
+                    probed[start] = (draw, length)
+                    if best * length >= min_length > draw * length:
+                        accepted += 1
+                        if accepted >= k:
+                            break
+                continue
+
+            end = mm.find(b'\n', offset)
+            end = size if end == -1 else end + 1
+            if not mm[start:end].strip():
+                probed[start] = (1.0, math.inf)
+                continue
+
+            length = end - start
+            probed[start] = (draw, length)
+            if min_length is None or length < min_length:
+                min_length = length
+                accepted = sum(1 for d, n in probed.values() if d * n < min_length)
+            elif draw * length < min_length:
+                accepted += 1
+            if accepted >= k:
+                break
+
+        if min_length is None:
+            return []
+        starts = sorted(start for start, (draw, length) in probed.items() if draw * length < min_length)
+        lines = []
+        for start in starts:
+            end = mm.find(b'\n', start)
+            lines.append(mm[start:size if end == -1 else end + 1])
+    return lines
+
+def asset_class_stratum(record: Any) -> Tuple[Any, Any]:
+    """Default stratum of a record: (Header.AssetClass, Header.InstrumentType)."""
+    header = record.get('Header') if isinstance(record, dict) else None
+    if not isinstance(header, dict):
+        return None, None
+    return header.get('AssetClass'), header.get('InstrumentType')
+
+def allocate_proportionally(counts: Dict[Hashable, int], k: int) -> Dict[Hashable, int]:
+    """Split k sample slots across strata in proportion to their sizes (largest remainder).
+
+    Every stratum gets at least one slot when k allows, so rare strata are
+    always represented, and no stratum gets more slots than it has items.
+    """
+    total = sum(counts.values())
+    if total <= k:
+        return dict(counts)
+
+    allocation = {}
+    if k >= len(counts):
+        allocation = {stratum: 1 for stratum in counts}
+    remaining = k - sum(allocation.values())
+    capacity = {stratum: count - allocation.get(stratum, 0) for stratum, count in counts.items()}
+    capacity_total = sum(capacity.values())
+
+    shares = {stratum: remaining * cap / capacity_total for stratum, cap in capacity.items()}
+    for stratum, share in shares.items():
+        allocation[stratum] = allocation.get(stratum, 0) + int(share)
+    leftover = k - sum(allocation.values())
+    by_remainder = sorted(shares, key=lambda stratum: (int(shares[stratum]) - shares[stratum], str(stratum)))
+    for stratum in by_remainder:
+        if leftover <= 0:
+            break
+        if allocation[stratum] < counts[stratum]:
+            allocation[stratum] += 1
+            leftover -= 1
+    return allocation
+
+def stratified_sample(records: Iterable[Any], k: int, rng: random.Random,
+                      stratum: Callable[[Any], Hashable] = asset_class_stratum) -> List[Any]:
+    """Sample k records with each stratum represented in proportion to its size, in stream order.
+
+    One pass keeps a reservoir of up to k records per stratum; once the
+    stratum sizes are known each reservoir is cut down to its allocation
+    (a uniform subset of a uniform sample is still uniform).
+    """
+    if k <= 0:
+        return []
+    reservoirs: Dict[Hashable, List[Tuple[int, Any]]] = defaultdict(list)
+    counts: Dict[Hashable, int] = defaultdict(int)
+    for index, record in enumerate(records):
+        key = stratum(record)
+        counts[key] += 1
+        reservoir = reservoirs[key]
+        if len(reservoir) < k:
+            reservoir.append((index, record))
+        else:
+            slot = rng.randrange(counts[key])
+            if slot < k:
+                reservoir[slot] = (index, record)
+
+    sample = []
+    for key, size in allocate_proportionally(counts, k).items():
+        sample.extend(rng.sample(reservoirs[key], size))
+    sample.sort(key=lambda entry: entry[0])
+    return [record for _, record in sample]
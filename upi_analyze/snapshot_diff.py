@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+UPI Snapshot Diff
+Compares two dated snapshots of the same asset class (e.g. Rates-20250913.json
+and Rates-20250920.json) by UPI and writes the added, removed and changed
+records as JSON lines. Only the older snapshot is indexed, as a compact
+UPI -> (byte offset, state hash) map; the newer one is streamed.
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import mmap
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, Optional, Tuple
+
+from jsonl_ranges import split_byte_ranges, iter_range_lines, iter_range_offsets
+from sketches import hash64
+from json_backends import BACKENDS, get_decoder
+
+# Identifier fields whose change marks a UPI as changed
+STATE_FIELDS = ('Status', 'LastUpdateDateTime')
+
+# Top-level fields the diff reads; decoders may skip everything else
+DIFF_FIELDS = ('Identifier',)
+
+# Index value of a UPI already matched against the new snapshot
+MATCHED = -1
+
+_SNAPSHOT_NAME = re.compile(r'^(?P<prefix>.+)-(?P<date>\d{8})\.json$')
+
+def parse_state(line: bytes, decode: Callable[[bytes], Any]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """Decode a line into (upi, Identifier dict); upi is None when the record has none."""
+    try:
+        record = decode(line)
+    except ValueError:
+        return None, None
+    identifier = record.get('Identifier') if isinstance(record, dict) else None
+    if not isinstance(identifier, dict) or identifier.get('UPI') is None:
+        return None, None
+    return identifier['UPI'], identifier
+
+def state_hash(identifier: Dict[str, Any]) -> int:
+    """64-bit hash of the STATE_FIELDS of an Identifier."""
+    return hash64('\x1f'.join(repr(identifier.get(field)) for field in STATE_FIELDS))
+
+def index_range(file_path: str, start: int = 0, end: Optional[int] = None,
+                json_backend: str = 'auto') -> Tuple[Dict[str, int], int]:
+    """Index the records whose lines start in [start, end) as UPI -> (offset << 64 | state hash).
+
+    Packing both into one int keeps an entry to a str key and a single int
+    object. Returns the index and the number of repeated UPIs (the first
+    occurrence is kept).
+    """
+    decode = get_decoder(json_backend, DIFF_FIELDS)
+    index = {}
+    repeats = 0
+    for offset, line in iter_range_offsets(file_path, start, end):
+        upi, identifier = parse_state(line, decode)
+        if upi is None:
+            continue
+        if upi in index:
+            repeats += 1
+        else:
+            index[upi] = (offset << 64) | state_hash(identifier)
+    return index, repeats
+
+def build_index(file_path: str, workers: int = 1, json_backend: str = 'auto') -> Tuple[Dict[str, int], int]:
+    """Index a whole snapshot, splitting it into byte ranges across workers when workers > 1."""
+    ranges = split_byte_ranges(file_path, workers) if workers > 1 else []
+    if len(ranges) <= 1:
+        return index_range(file_path, json_backend=json_backend)
+
+    index = {}
+    repeats = 0
+    with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = [executor.submit(index_range, file_path, start, end, json_backend) for start, end in ranges]
+        for future in futures:
+            partial, partial_repeats = future.result()
+            repeats += partial_repeats
+            # Ranges arrive in file order, so existing entries are the first occurrences
+            for upi, value in partial.items():
+                if upi in index:
+                    repeats += 1
+                else:
+                    index[upi] = value
+    return index, repeats
+
+def _write_change(out: BinaryIO, change: str, upi: str, raw_record: bytes,
+                  changed_fields: Optional[Dict[str, Any]] = None) -> None:
+    # The record is copied from the snapshot as-is instead of being re-encoded
+    out.write(b'{"change":"' + change.encode('ascii') + b'","upi":' + json.dumps(upi).encode('utf-8'))
+    if changed_fields is not None:
+        out.write(b',"changed_fields":' + json.dumps(changed_fields).encode('utf-8'))
+    out.write(b',"record":' + raw_record.strip() + b'}\n')
+
+def _map_snapshot(snapshot_file: BinaryIO):
+    """Read-only mmap of a snapshot; an empty one can't be mapped and has nothing to read back."""
+    if os.fstat(snapshot_file.fileno()).st_size == 0:
+        return contextlib.nullcontext()
+    return mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+def diff_snapshots(old_path: str, new_path: str, out: BinaryIO, workers: int = 1,
+                   json_backend: str = 'auto') -> Dict[str, int]:
+    """Write added, removed and changed records between two snapshots to out as JSON lines.
+
+    Each output line is {"change": ..., "upi": ..., "record": ...}; changed
+    lines also carry "changed_fields" mapping each STATE_FIELD that moved to
+    [old, new]. Added and changed lines hold the new record, removed lines
+    the old one. Memory is bounded by the old snapshot's index plus the
+    UPIs added in the new one. Returns the counts of each kind of change.
+    The new snapshot may be compressed; the old one is read back by byte
+    offset and must be plain JSON lines (ValueError otherwise).
+    """
+    print(f"Indexing {os.path.basename(old_path)}...", file=sys.stderr)
+    index, old_repeats = build_index(old_path, workers, json_backend)
+    print(f"  {len(index)} UPIs indexed", file=sys.stderr)
+
+    decode = get_decoder(json_backend, DIFF_FIELDS)
+    counts = {'added': 0, 'removed': 0, 'changed': 0, 'unchanged': 0,
+              'old_repeats': old_repeats, 'new_repeats': 0}
+
+    print(f"Comparing {os.path.basename(new_path)}...", file=sys.stderr)
+    with open(old_path, 'rb') as old_file, \
+            _map_snapshot(old_file) as old_map:
+        for _, line in iter_range_lines(new_path):
+            upi, identifier = parse_state(line, decode)
+            if upi is None:
+                continue
+
+            value = index.get(upi)
+            if value == MATCHED:
+                counts['new_repeats'] += 1
+                continue
+            index[upi] = MATCHED
+            if value is None:
+                _write_change(out, 'added', upi, line)
+                counts['added'] += 1
+                continue
+            if value & 0xFFFFFFFFFFFFFFFF == state_hash(identifier):
+                counts['unchanged'] += 1
+                continue
+
+            # Only changed records pay for re-reading the old side
+            old_map.seek(value >> 64)
+            _, old_identifier = parse_state(old_map.readline(), decode)
+            changed_fields = {field: [old_identifier.get(field), identifier.get(field)]
+                              for field in STATE_FIELDS
+                              if old_identifier.get(field) != identifier.get(field)}
+            _write_change(out, 'changed', upi, line, changed_fields)
+            counts['changed'] += 1
+
+        # Whatever was never matched has been removed; read it back in file order
+        removed = sorted((value >> 64, upi) for upi, value in index.items() if value != MATCHED)
+        del index
+        for offset, upi in removed:
+            old_map.seek(offset)
+            _write_change(out, 'removed', upi, old_map.readline())
+        counts['removed'] = len(removed)
+
+    return counts
+
+def latest_snapshot_pair(prefix: str, directory: str = '.') -> Tuple[str, str]:
+    """Return the two most recent <prefix>-YYYYMMDD.json files in directory as (older, newer)."""
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, f"{glob.escape(prefix)}-*.json")):
+        match = _SNAPSHOT_NAME.match(os.path.basename(path))
+        if match and match.group('prefix') == prefix:
+            snapshots.append((match.group('date'), path))
+    if len(snapshots) < 2:
+        raise ValueError(f"Need at least two {prefix}-YYYYMMDD.json snapshots, found {len(snapshots)}")
+    snapshots.sort()
+    return snapshots[-2][1], snapshots[-1][1]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('snapshots', nargs='+', metavar='SNAPSHOT',
+                        help='OLD.json NEW.json, or an asset class prefix (e.g. Rates) to compare '
+                             'its two latest dated snapshots in the current directory')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Diff output file (default: <prefix>-<old date>-<new date>.diff.jsonl, '
+                             'or stdout with -)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes used to index the older snapshot (default: 1)')
+    parser.add_argument('--json-backend', choices=BACKENDS, default='auto',
+                        help='JSON decoder to use; auto picks the fastest installed one (default: auto)')
+    args = parser.parse_args(argv)
+
+    if len(args.snapshots) == 1:
+        old_path, new_path = latest_snapshot_pair(args.snapshots[0])
+    elif len(args.snapshots) == 2:
+        old_path, new_path = args.snapshots
+    else:
+        parser.error('expected OLD NEW or a single snapshot prefix')
+
+    output = args.output
+    if output is None:
+        old_match = _SNAPSHOT_NAME.match(os.path.basename(old_path))
+        new_match = _SNAPSHOT_NAME.match(os.path.basename(new_path))
+        if old_match and new_match:
+            output = f"{new_match.group('prefix')}-{old_match.group('date')}-{new_match.group('date')}.diff.jsonl"
+        else:
+            output = 'snapshot.diff.jsonl'
+
+    if output == '-':
+        counts = diff_snapshots(old_path, new_path, sys.stdout.buffer, args.workers, args.json_backend)
+    else:
+        with open(output, 'wb', buffering=1024 * 1024) as out:
+            counts = diff_snapshots(old_path, new_path, out, args.workers, args.json_backend)
+
+    print(f"\n{os.path.basename(old_path)} -> {os.path.basename(new_path)}", file=sys.stderr)
+    print(f"  Added:     {counts['added']}", file=sys.stderr)
+    print(f"  Removed:   {counts['removed']}", file=sys.stderr)
+    print(f"  Changed:   {counts['changed']}", file=sys.stderr)
+    print(f"  Unchanged: {counts['unchanged']}", file=sys.stderr)
+    if counts['old_repeats'] or counts['new_repeats']:
+        print(f"  Repeated UPIs ignored: {counts['old_repeats']} old, {counts['new_repeats']} new", file=sys.stderr)
+    if output != '-':
+        print(f"Diff written to {output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+External Sort for UPI Duplicate Detection
+Spills sorted runs of (UPI, file, line) entries to disk under a memory budget
+and merges them back so exact duplicates can be found over any data volume.
+"""
+
+import heapq
+import os
+import tempfile
+from itertools import groupby
+from typing import AbstractSet, Iterable, Iterator, List, Optional, Tuple
+
+# Rough in-memory cost of one buffered (key, line) entry: a short str, an int
+# and the tuple holding them
+ENTRY_OVERHEAD_BYTES = 150
+
+# Maximum number of runs opened at once while merging
+DEFAULT_MAX_FAN_IN = 64
+
+# A run that has not been merged yet: (path, file_index, line_offset). Entries
+# in range runs are written as "key\tline" with range-local line numbers;
+# merged runs are written as "key\tfile_index\tline" and use file_index None.
+RunInfo = Tuple[str, Optional[int], int]
+
+def encode_key(upi: str) -> str:
+    """Escape a UPI so it can never contain the tab/newline run separators."""
+    return str(upi).encode('unicode_escape').decode('ascii')
+
+def decode_key(key: str) -> str:
+    """Inverse of encode_key."""
+    return key.encode('ascii').decode('unicode_escape')
+
+def entries_per_run(memory_mb: float) -> int:
+    """Number of entries to buffer before spilling a run for a given memory budget."""
+    return max(1000, int(memory_mb * 1024 * 1024 / ENTRY_OVERHEAD_BYTES))
+
+class RunSpiller:
+    """Buffers (UPI, line) entries and spills them to disk as sorted runs."""
+
+    def __init__(self, memory_mb: float = 256, temp_dir: Optional[str] = None):
+        self.max_entries = entries_per_run(memory_mb)
+        self.temp_dir = temp_dir
+        self.buffer: List[Tuple[str, int]] = []
+        self.runs: List[str] = []
+
+    def add(self, upi: str, line_num: int) -> None:
+        self.buffer.append((encode_key(upi), line_num))
+        if len(self.buffer) >= self.max_entries:
+            self.spill()
+
+    def spill(self) -> None:
+        if not self.buffer:
+            return
+        self.buffer.sort()
+        fd, path = tempfile.mkstemp(prefix='upi_run_', suffix='.tsv', dir=self.temp_dir)
+        with os.fdopen(fd, 'w', encoding='ascii', buffering=1024 * 1024) as f:
+            f.writelines(f"{key}\t{line_num}\n" for key, line_num in self.buffer)
+        self.runs.append(path)
+        self.buffer = []
+
+    def finish(self) -> List[str]:
+        """Spill any buffered entries and return the paths of all runs."""
+        self.spill()
+        return self.runs
+
+def _read_run(run: RunInfo) -> Iterator[Tuple[str, int, int]]:
+    path, file_index, line_offset = run
+    with open(path, 'r', encoding='ascii', buffering=1024 * 1024) as f:
+        if file_index is None:
+            for line in f:
+                key, merged_file_index, line_num = line.rstrip('\n').split('\t')
+                yield key, int(merged_file_index), int(line_num)
+        else:
+            for line in f:
+                key, line_num = line.rstrip('\n').split('\t')
+                yield key, file_index, line_offset + int(line_num)
+
+def _merge_to_run(runs: List[RunInfo], temp_dir: Optional[str], keep: AbstractSet[str] = frozenset()) -> RunInfo:
+    fd, path = tempfile.mkstemp(prefix='upi_merged_', suffix='.tsv', dir=temp_dir)
+    with os.fdopen(fd, 'w', encoding='ascii', buffering=1024 * 1024) as f:
+        for key, file_index, line_num in heapq.merge(*(_read_run(run) for run in runs)):
+            f.write(f"{key}\t{file_index}\t{line_num}\n")
+    for run_path, _, _ in runs:
+        if run_path not in keep:
+            os.remove(run_path)
+    return path, None, 0
+
+def merge_runs(runs: List[RunInfo], max_fan_in: int = DEFAULT_MAX_FAN_IN,
+               temp_dir: Optional[str] = None, keep: AbstractSet[str] = frozenset()
+               ) -> Iterator[Tuple[str, int, int]]:
+    """Merge sorted runs into one (key, file_index, line) stream, sorted by key.
+
+    When there are more runs than max_fan_in they are first merged in groups
+    into larger intermediate runs so the number of open files stays bounded.
+    All run files are deleted once consumed, except those listed in keep
+    (runs owned by the result cache).
+    """
+    runs = list(runs)
+    while len(runs) > max_fan_in:
+        runs = [_merge_to_run(runs[i:i + max_fan_in], temp_dir, keep)
+                for i in range(0, len(runs), max_fan_in)]
+    try:
+        yield from heapq.merge(*(_read_run(run) for run in runs))
+    finally:
+        for run_path, _, _ in runs:
+            if run_path not in keep and os.path.exists(run_path):
+                os.remove(run_path)
+
+def group_by_upi(merged: Iterable[Tuple[str, int, int]]) -> Iterator[Tuple[str, List[Tuple[int, int]]]]:
+    """Group a merged stream into (upi, [(file_index, line), ...]) in UPI order."""
+    for key, entries in groupby(merged, key=lambda entry: entry[0]):
+        yield decode_key(key), [(file_index, line_num) for _, file_index, line_num in entries]
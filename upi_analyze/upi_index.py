@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Persistent UPI Index
+Maps every UPI to the (file, byte offset, length) of its records so a
+single record can be fetched with one seek instead of grepping multi-GB
+snapshots. Each snapshot gets one sorted, memory-mapped segment listed in a
+manifest (or rows in an SQLite database when numpy is unavailable), and
+only new or changed snapshots are indexed on update.
+
+Usage:
+    python upi_index.py build [FILE ...]      # index *.json by default
+    python upi_index.py lookup UPI [UPI ...]
+"""
+
+import argparse
+import bisect
+import glob
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from jsonl_ranges import iter_range_offsets
+from json_backends import BACKENDS, get_decoder
+from validate_upi_primary_key import UPI_FIELDS, parse_upi_line
+
+INDEX_BACKENDS = ('auto', 'mmap', 'sqlite')
+
+DEFAULT_INDEX_DIR = '.upi_index'
+
+MANIFEST_FILE = 'manifest.json'
+
+SQLITE_FILE = 'upi_index.sqlite'
+
+# Segment header: magic, format version, key width in bytes, entry count
+_SEGMENT_HEADER = struct.Struct('<4sHHQ')
+_SEGMENT_MAGIC = b'UPIX'
+_SEGMENT_VERSION = 1
+
+# UPIs are converted to numpy arrays in chunks of this many entries while scanning
+_CHUNK_ENTRIES = 1000000
+
+def scan_upi_offsets(file_path: str, json_backend: str = 'auto') -> Iterator[Tuple[str, int, int]]:
+    """Yield (upi, byte offset, line length) for every record of a file that has a UPI.
+
+    Records are fetched back by seeking, so compressed files raise ValueError.
+    """
+    decode = get_decoder(json_backend, UPI_FIELDS)
+    for offset, line in iter_range_offsets(file_path):
+        upi, _ = parse_upi_line(line, decode)
+        if upi is not None:
+            yield str(upi), offset, len(line)
+
+def read_record(file_path: str, offset: int, length: int) -> bytes:
+    """Read one raw record line with a single seek."""
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        return f.read(length).rstrip(b'\r\n')
+
+def _file_state(file_path: str) -> Dict[str, Any]:
+    stat = os.stat(file_path)
+    return {'path': os.path.abspath(file_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def _lookup_result(upi: str, state: Dict[str, Any], offset: int, length: int) -> Dict[str, Any]:
+    """Fetch a record and flag it as stale if its snapshot changed since it was indexed."""
+    result = {'upi': upi, 'file': state['path'], 'offset': offset, 'length': length, 'record': None, 'stale': False}
+    try:
+        result['stale'] = _file_state(state['path']) != state
+        record = read_record(state['path'], offset, length)
+    except OSError:
+        result['stale'] = True
+        return result
+    # A changed file can shift offsets; only return records that still hold the UPI
+    if json.dumps(upi).encode('utf-8') in record:
+        result['record'] = record
+    else:
+        result['stale'] = True
+    return result
+
+def write_segment(path: str, entries: Iterator[Tuple[str, int, int]]) -> int:
+    """Write (upi, offset, length) entries as a sorted fixed-width table; returns the entry count.
+
+    Keys are stored as NUL-padded UTF-8 of the longest UPI's width, followed
+    by a little-endian uint64 offset and uint32 length, sorted by key (file
+    order among repeated UPIs).
+    """
+    key_chunks, offset_chunks, length_chunks = [], [], []
+    keys, offsets, lengths = [], [], []
+
+    def flush_chunk():
+        key_chunks.append(np.array(keys, dtype=bytes))
+        offset_chunks.append(np.array(offsets, dtype='<u8'))
+        length_chunks.append(np.array(lengths, dtype='<u4'))
+        keys.clear()
+        offsets.clear()
+        lengths.clear()
+
+    for upi, offset, length in entries:
+        keys.append(upi.encode('utf-8'))
+        offsets.append(offset)
+        lengths.append(length)
+        if len(keys) >= _CHUNK_ENTRIES:
+            flush_chunk()
+    if keys or not key_chunks:
+        flush_chunk()
+
+    all_keys = np.concatenate(key_chunks)
+    key_width = max(all_keys.dtype.itemsize, 1)
+    order = np.argsort(all_keys, kind='stable')
+    table = np.empty(len(all_keys), dtype=[('key', f'S{key_width}'), ('offset', '<u8'), ('length', '<u4')])
+    table['key'] = all_keys[order]
+    table['offset'] = np.concatenate(offset_chunks)[order]
+    table['length'] = np.concatenate(length_chunks)[order]
+
+    with open(path, 'wb') as f:
+        f.write(_SEGMENT_HEADER.pack(_SEGMENT_MAGIC, _SEGMENT_VERSION, key_width, len(table)))
+        table.tofile(f)
+    return len(table)
+
+class SortedSegment:
+    """Read-only view of a segment file, binary-searched through an mmap."""
+
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.key_width, self.count = _SEGMENT_HEADER.unpack_from(self._map, 0)
+        if magic != _SEGMENT_MAGIC or version != _SEGMENT_VERSION:
+            raise ValueError(f"{path} is not a version {_SEGMENT_VERSION} UPI index segment")
+        self._entry = struct.Struct(f'<{self.key_width}sQI')
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> bytes:
+        # Keys only, so bisect can search the segment like a sorted list
+        start = _SEGMENT_HEADER.size + i * self._entry.size
+        return self._map[start:start + self.key_width].rstrip(b'\0')
+
+    def find(self, upi: str) -> List[Tuple[int, int]]:
+        """(offset, length) of every entry for upi, in file order."""
+        key = upi.encode('utf-8')
+        if len(key) > self.key_width:
+            return []
+        i = bisect.bisect_left(self, key)
+        matches = []
+        while i < self.count:
+            entry_key, offset, length = self._entry.unpack_from(self._map, _SEGMENT_HEADER.size + i * self._entry.size)
+            if entry_key.rstrip(b'\0') != key:
+                break
+            matches.append((offset, length))
+            i += 1
+        return matches
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+class MmapUpiIndex:
+    """UPI index made of one SortedSegment per snapshot plus a JSON manifest."""
+
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR):
+        if np is None:
+            raise ImportError("numpy is required for the mmap index backend; use the sqlite backend")
+        self.index_dir = index_dir
+        os.makedirs(index_dir, exist_ok=True)
+        self.manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+        self.snapshots: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.snapshots = {snapshot['path']: snapshot for snapshot in json.load(f)['snapshots']}
+        self._segments: Dict[str, SortedSegment] = {}
+
+    def _save_manifest(self) -> None:
+        fd, temp_path = tempfile.mkstemp(prefix='.manifest_', dir=self.index_dir)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'version': _SEGMENT_VERSION, 'snapshots': list(self.snapshots.values())}, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def _segment(self, snapshot: Dict[str, Any]) -> SortedSegment:
+        segment = self._segments.get(snapshot['segment'])
+        if segment is None:
+            segment = self._segments[snapshot['segment']] = SortedSegment(
+                os.path.join(self.index_dir, snapshot['segment']))
+        return segment
+
+    def _drop(self, path: str) -> None:
+        snapshot = self.snapshots.pop(path)
+        segment = self._segments.pop(snapshot['segment'], None)
+        if segment is not None:
+            segment.close()
+        segment_path = os.path.join(self.index_dir, snapshot['segment'])
+        if os.path.exists(segment_path):
+            os.remove(segment_path)
+
+    def update(self, files: List[str], json_backend: str = 'auto', prune: bool = False) -> Dict[str, int]:
+        """Index files that are new or changed since they were last indexed.
+
+        With prune=True snapshots that no longer exist on disk are removed
+        from the index. The manifest is rewritten after each snapshot, so an
+        interrupted update keeps everything indexed so far.
+        """
+        counts = {'indexed': 0, 'unchanged': 0, 'pruned': 0}
+        for file_path in files:
+            state = _file_state(file_path)
+            known = self.snapshots.get(state['path'])
+            if known is not None and all(known[field] == state[field] for field in state):
+                counts['unchanged'] += 1
+                continue
+
+            print(f"Indexing {os.path.basename(file_path)}...")
+            fd, segment_path = tempfile.mkstemp(prefix='seg-', suffix='.idx', dir=self.index_dir)
+            os.close(fd)
+            try:
+                entries = write_segment(segment_path, scan_upi_offsets(file_path, json_backend))
+            except BaseException:
+                os.remove(segment_path)
+                raise
+            if known is not None:
+                self._drop(state['path'])
+            self.snapshots[state['path']] = dict(state, segment=os.path.basename(segment_path), entries=entries)
+            self._save_manifest()
+            print(f"  {entries} UPIs")
+            counts['indexed'] += 1
+
+        if prune:
+            for path in [path for path in self.snapshots if not os.path.exists(path)]:
+                self._drop(path)
+                counts['pruned'] += 1
+            self._save_manifest()
+        return counts
+
+    def lookup(self, upi: str) -> List[Dict[str, Any]]:
+        """Every indexed occurrence of upi with its raw record, newest snapshot file first."""
+        results = []
+        for path in sorted(self.snapshots, key=os.path.basename, reverse=True):
+            snapshot = self.snapshots[path]
+            state = {field: snapshot[field] for field in ('path', 'size', 'mtime_ns')}
+            for offset, length in self._segment(snapshot).find(upi):
+                results.append(_lookup_result(upi, state, offset, length))
+        return results
+
+    def close(self) -> None:
+        for segment in self._segments.values():
+            segment.close()
+        self._segments = {}
+
+class SqliteUpiIndex:
+    """UPI index stored in an SQLite table clustered on the UPI."""
+
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR):
+        os.makedirs(index_dir, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(index_dir, SQLITE_FILE))
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL, entries INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS upis (
+                upi TEXT NOT NULL, snapshot_id INTEGER NOT NULL, offset INTEGER NOT NULL,
+                length INTEGER NOT NULL, PRIMARY KEY (upi, snapshot_id, offset)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS upis_by_snapshot ON upis (snapshot_id);
+        """)
+
+    def _drop(self, snapshot_id: int) -> None:
+        self.connection.execute("DELETE FROM upis WHERE snapshot_id = ?", (snapshot_id,))
+        self.connection.execute("DELETE FROM snapshots WHERE id = ?", (snapshot_id,))
+
+    def update(self, files: List[str], json_backend: str = 'auto', prune: bool = False) -> Dict[str, int]:
+        """Index files that are new or changed since they were last indexed (see MmapUpiIndex.update)."""
+        counts = {'indexed': 0, 'unchanged': 0, 'pruned': 0}
+        for file_path in files:
+            state = _file_state(file_path)
+            known = self.connection.execute("SELECT id, size, mtime_ns FROM snapshots WHERE path = ?",
+                                            (state['path'],)).fetchone()
+            if known is not None and known[1:] == (state['size'], state['mtime_ns']):
+                counts['unchanged'] += 1
+                continue
+
+            print(f"Indexing {os.path.basename(file_path)}...")
+            with self.connection:
+                if known is not None:
+                    self._drop(known[0])
+                snapshot_id = self.connection.execute(
+                    "INSERT INTO snapshots (path, size, mtime_ns, entries) VALUES (?, ?, ?, 0)",
+                    (state['path'], state['size'], state['mtime_ns'])).lastrowid
+                # OR IGNORE: identical (upi, offset) pairs cannot occur, but keep inserts idempotent
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO upis VALUES (?, ?, ?, ?)",
+                    ((upi, snapshot_id, offset, length)
+                     for upi, offset, length in scan_upi_offsets(file_path, json_backend)))
+                entries = self.connection.execute("SELECT COUNT(*) FROM upis WHERE snapshot_id = ?",
+                                                  (snapshot_id,)).fetchone()[0]
+                self.connection.execute("UPDATE snapshots SET entries = ? WHERE id = ?", (entries, snapshot_id))
+            print(f"  {entries} UPIs")
+            counts['indexed'] += 1
+
+        if prune:
+            with self.connection:
+                for snapshot_id, path in self.connection.execute("SELECT id, path FROM snapshots").fetchall():
+                    if not os.path.exists(path):
+                        self._drop(snapshot_id)
+                        counts['pruned'] += 1
+        return counts
+
+    def lookup(self, upi: str) -> List[Dict[str, Any]]:
+        """Every indexed occurrence of upi with its raw record, newest snapshot file first."""
+        rows = self.connection.execute(
+            "SELECT s.path, s.size, s.mtime_ns, u.offset, u.length FROM upis u "
+            "JOIN snapshots s ON s.id = u.snapshot_id WHERE u.upi = ? ORDER BY u.offset", (upi,)).fetchall()
+        rows.sort(key=lambda row: os.path.basename(row[0]), reverse=True)
+        return [_lookup_result(upi, {'path': path, 'size': size, 'mtime_ns': mtime_ns}, offset, length)
+                for path, size, mtime_ns, offset, length in rows]
+
+    def close(self) -> None:
+        self.connection.close()
+
+def open_index(index_dir: str = DEFAULT_INDEX_DIR, backend: str = 'auto'):
+    """Open (creating if needed) a UPI index; 'auto' uses mmap segments when numpy is installed."""
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"backend must be one of {INDEX_BACKENDS}")
+    if backend == 'auto':
+        # Stay on whichever backend an existing index was built with
+        if os.path.exists(os.path.join(index_dir, SQLITE_FILE)) or np is None:
+            backend = 'sqlite'
+        else:
+            backend = 'mmap'
+    return MmapUpiIndex(index_dir) if backend == 'mmap' else SqliteUpiIndex(index_dir)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--index-dir', default=DEFAULT_INDEX_DIR,
+                        help=f'Directory holding the index (default: {DEFAULT_INDEX_DIR})')
+    parser.add_argument('--backend', choices=INDEX_BACKENDS, default='auto',
+                        help='Sorted mmap segments, or SQLite; auto prefers mmap when numpy is installed')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='Index new or changed snapshots')
+    build.add_argument('files', nargs='*', help='Snapshots to index (default: *.json in the current directory)')
+    build.add_argument('--prune', action='store_true', help='Drop snapshots that no longer exist')
+    build.add_argument('--json-backend', choices=BACKENDS, default='auto',
+                       help='JSON decoder to use; auto picks the fastest installed one (default: auto)')
+
+    lookup = commands.add_parser('lookup', help='Print the raw records of UPIs')
+    lookup.add_argument('upis', nargs='+', metavar='UPI')
+    args = parser.parse_args(argv)
+
+    index = open_index(args.index_dir, args.backend)
+    try:
+        if args.command == 'build':
+            json_files = sorted(args.files or glob.glob("*.json"))
+            counts = index.update(json_files, json_backend=args.json_backend, prune=args.prune)
+            print(f"Indexed {counts['indexed']} snapshot(s), {counts['unchanged']} unchanged, "
+                  f"{counts['pruned']} pruned")
+            return
+
+        found_all = True
+        for upi in args.upis:
+            results = index.lookup(upi)
+            if not results:
+                print(f"{upi}: not found", file=sys.stderr)
+                found_all = False
+            for result in results:
+                location = f"{result['file']}:{result['offset']}"
+                if result['record'] is None:
+                    print(f"{upi}: {location} is stale; rebuild the index", file=sys.stderr)
+                    continue
+                if result['stale']:
+                    print(f"{upi}: {location} changed since indexing", file=sys.stderr)
+                print(f"# {location}", file=sys.stderr)
+                sys.stdout.buffer.write(result['record'] + b'\n')
+        if not found_all:
+            sys.exit(1)
+    finally:
+        index.close()
+
+if __name__ == "__main__":
+    main()
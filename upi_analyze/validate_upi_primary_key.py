@@ -5,88 +5,491 @@ Validates that UPI is indeed a unique identifier across all files.
 """
 
 import json
-import glob
 import os
-from collections import defaultdict
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-def validate_upi_uniqueness():
-    """Validate UPI uniqueness across all JSON files."""
-    
-    print("UPI Primary Key Validation")
-    print("=" * 50)
-    
-    # Find all JSON files
-    json_files = glob.glob("*.json")
-    
+from jsonl_ranges import split_byte_ranges, iter_range_lines
+from compressed_input import estimate_decompressed_size, find_json_files, open_input
+from upi_external_sort import RunSpiller, merge_runs, group_by_upi
+from sketches import BloomFilter
+from json_backends import BACKENDS, get_decoder
+from result_cache import DEFAULT_CACHE_DIR, ResultCache
+from metrics import METRICS, profiled
+
+# Top-level fields the UPI scans read; decoders may skip everything else
+UPI_FIELDS = ('Identifier', 'Header')
+
+def parse_upi_line(line: bytes, decode: Callable[[bytes], Any] = json.loads
+                   ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """Decode one JSON line into (upi, record); upi is None when the record has none.
+
+    decode is normally get_decoder(json_backend, UPI_FIELDS), so the record
+    may only contain the UPI_FIELDS.
+    """
+    try:
+        record = decode(line)
+    except ValueError:
+        return None, None
+
+    identifier = record.get('Identifier') if isinstance(record, dict) else None
+    if isinstance(identifier, dict) and 'UPI' in identifier:
+        return identifier['UPI'], record
+    return None, record
+
+def upi_example(upi: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    """Summarise a record for the examples section of the report."""
+    return {
+        'upi': upi,
+        'asset_class': record.get('Header', {}).get('AssetClass', 'Unknown'),
+        'instrument_type': record.get('Header', {}).get('InstrumentType', 'Unknown')
+    }
+
+def scan_upi_range(file_path: str, start: int = 0, end: Optional[int] = None,
+                   max_records: Optional[int] = None, json_backend: str = 'auto') -> Dict[str, Any]:
+    """Collect the UPIs of records whose lines start in [start, end) of a file.
+
+    Line numbers are local to the range (starting at 1); 'line_count' lets the
+    caller turn them into file line numbers by adding the lines of all
+    preceding ranges.
+    """
+    decode = get_decoder(json_backend, UPI_FIELDS)
+    upis = {}
+    repeats = []
+    examples = []
+    count = 0
+    line_count = 0
+
+    for line_num, line in iter_range_lines(file_path, start, end):
+        line_count = line_num
+        if max_records is not None and count >= max_records:
+            break
+
+        # Extract UPI
+        upi, record = parse_upi_line(line, decode)
+        if upi is not None:
+            if upi in upis:
+                repeats.append((upi, line_num))
+            else:
+                upis[upi] = line_num
+
+            # Collect examples
+            if len(examples) < 10:
+                examples.append(upi_example(upi, record))
+
+            count += 1
+
+    return {
+        'upis': upis,
+        'repeats': repeats,
+        'examples': examples,
+        'line_count': line_count
+    }
+
+def scan_upi_file(file_path: str, max_records: Optional[int] = None, workers: int = 1,
+                  json_backend: str = 'auto') -> List[Dict[str, Any]]:
+    """Scan a file as one range, or as newline-aligned byte ranges across a process pool."""
+    if workers <= 1 or max_records is not None:
+        return [scan_upi_range(file_path, max_records=max_records, json_backend=json_backend)]
+
+    ranges = split_byte_ranges(file_path, workers)
+    if len(ranges) <= 1:
+        return [scan_upi_range(file_path, *ranges[0], json_backend=json_backend)] if ranges else []
+
+    with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = [executor.submit(scan_upi_range, file_path, start, end, None, json_backend)
+                   for start, end in ranges]
+        return [future.result() for future in futures]
+
+def scan_upi_range_to_runs(file_path: str, start: int = 0, end: Optional[int] = None,
+                           memory_mb: float = 256, temp_dir: Optional[str] = None,
+                           json_backend: str = 'auto') -> Dict[str, Any]:
+    """Spill the UPIs of one byte range to sorted runs on disk for exact duplicate detection.
+
+    Like scan_upi_range, line numbers in the runs are local to the range and
+    'line_count' is reported so the caller can shift them.
+    """
+    decode = get_decoder(json_backend, UPI_FIELDS)
+    spiller = RunSpiller(memory_mb=memory_mb, temp_dir=temp_dir)
+    examples = []
+    line_count = 0
+
+    try:
+        for line_num, line in iter_range_lines(file_path, start, end):
+            line_count = line_num
+            upi, record = parse_upi_line(line, decode)
+            if upi is not None:
+                spiller.add(upi, line_num)
+
+                if len(examples) < 10:
+                    examples.append(upi_example(upi, record))
+        runs = spiller.finish()
+    except BaseException:
+        for run_path in spiller.finish():
+            os.remove(run_path)
+        raise
+
+    return {
+        'runs': runs,
+        'examples': examples,
+        'line_count': line_count
+    }
+
+def _new_summary() -> Dict[str, Any]:
+    return {
+        'total_upis': 0,
+        'file_upi_counts': {},
+        'duplicate_count': 0,
+        'duplicate_upis': defaultdict(list),
+        'examples': [],
+        'sample_upi': None,
+        'charset': set(),
+        'lengths': set()
+    }
+
+def collect_sampled_upis(json_files: List[str], workers: int = 1, json_backend: str = 'auto',
+                         cache: Optional[ResultCache] = None) -> Dict[str, Any]:
+    """Check UPI uniqueness with in-memory sets, limited to 1000 records per file unless workers > 1.
+
+    With a cache, the per-file scan results of unchanged files are reused.
+    Only the 1000-record samples are cached: an unlimited scan holds every
+    UPI of the file, which the cross-file check needs but the cache should
+    not keep.
+    """
+    summary = _new_summary()
     all_upis = set()
-    file_upi_counts = {}
-    duplicate_upis = defaultdict(list)
-    upi_examples = []
+    duplicate_upis = summary['duplicate_upis']
+    upi_examples = summary['examples']
     
     for json_file in json_files:
         print(f"Processing {json_file}...")
         
         file_upis = set()
-        count = 0
         
+        # Limit for performance unless the file is split across workers
+        max_records = None if workers > 1 else 1000
         try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                for line_num, line in enumerate(f, 1):
-                    if count >= 1000:  # Limit for performance
-                        break
-                        
-                    try:
-                        record = json.loads(line.strip())
-                        
-                        # Extract UPI
-                        if 'Identifier' in record and 'UPI' in record['Identifier']:
-                            upi = record['Identifier']['UPI']
-                            
-                            # Check for duplicates within file
-                            if upi in file_upis:
-                                duplicate_upis[upi].append(f"{json_file}:line_{line_num}")
-                            else:
-                                file_upis.add(upi)
-                            
-                            # Check for duplicates across files
-                            if upi in all_upis:
-                                duplicate_upis[upi].append(f"{json_file}:line_{line_num}")
-                            else:
-                                all_upis.add(upi)
-                            
-                            # Collect examples
-                            if len(upi_examples) < 10:
-                                upi_examples.append({
-                                    'upi': upi,
-                                    'file': json_file,
-                                    'asset_class': record.get('Header', {}).get('AssetClass', 'Unknown'),
-                                    'instrument_type': record.get('Header', {}).get('InstrumentType', 'Unknown')
-                                })
-                            
-                            count += 1
-                            
-                    except json.JSONDecodeError:
-                        continue
-                        
+            use_cache = cache is not None and max_records is not None
+            cache_key = cache.key('upi_sampled', json_file, {'max_records': max_records}) if use_cache else None
+            partials = cache.get(cache_key) if use_cache else None
+            if partials is None:
+                with METRICS.stage('scan_upis') as stage:
+                    partials = scan_upi_file(json_file, max_records=max_records, workers=workers,
+                                             json_backend=json_backend)
+                    stage.records = sum(partial['line_count'] for partial in partials)
+                    if max_records is None:
+                        stage.bytes_read = os.path.getsize(json_file)
+                if use_cache:
+                    cache.put(cache_key, partials)
+            else:
+                print("  Using cached scan")
         except Exception as e:
             print(f"  Error reading {json_file}: {e}")
             continue
         
-        file_upi_counts[json_file] = len(file_upis)
+        # Merge partial results in file order, shifting range-local line
+        # numbers by the lines of all preceding ranges
+        line_offset = 0
+        for partial in partials:
+            for upi, line_num in partial['upis'].items():
+                location = f"{json_file}:line_{line_offset + line_num}"
+                
+                # Check for duplicates within file
+                if upi in file_upis:
+                    duplicate_upis[upi].append(location)
+                else:
+                    file_upis.add(upi)
+                
+                # Check for duplicates across files
+                if upi in all_upis:
+                    duplicate_upis[upi].append(location)
+                else:
+                    all_upis.add(upi)
+            
+            # Repeats within a range are duplicates both within the file and across files
+            for upi, line_num in partial['repeats']:
+                location = f"{json_file}:line_{line_offset + line_num}"
+                duplicate_upis[upi].extend([location, location])
+            
+            for example in partial['examples']:
+                if len(upi_examples) < 10:
+                    upi_examples.append(dict(example, file=json_file))
+            
+            line_offset += partial['line_count']
+        
+        summary['file_upi_counts'][json_file] = len(file_upis)
         print(f"  Found {len(file_upis)} unique UPIs")
     
+    summary['total_upis'] = len(all_upis)
+    summary['duplicate_count'] = len(duplicate_upis)
+    if all_upis:
+        summary['sample_upi'] = next(iter(all_upis))
+        summary['charset'] = set(''.join(all_upis))
+        summary['lengths'] = {len(upi) for upi in all_upis}
+    return summary
+
+def collect_exact_upis(json_files: List[str], workers: int = 1, memory_mb: float = 256,
+                       temp_dir: Optional[str] = None, max_duplicate_details: int = 1000,
+                       json_backend: str = 'auto', cache: Optional[ResultCache] = None) -> Dict[str, Any]:
+    """Check UPI uniqueness over every record with an external sort bounded by memory_mb.
+
+    Each file (or byte range of a file, with workers > 1) is scanned into
+    sorted runs on disk; the runs are then merged so every UPI's occurrences
+    arrive together with their file:line locations. Only the first
+    max_duplicate_details duplicated UPIs keep their locations in memory.
+    With a cache, each file's sorted runs are kept in the cache and reused
+    while the file is unchanged, so only new files are scanned.
+    """
+    summary = _new_summary()
+    runs = []
+    cached_runs = set()
+    
+    # With several workers each one gets its share of the memory budget
+    worker_memory_mb = memory_mb / max(workers, 1)
+    
+    for file_index, json_file in enumerate(json_files):
+        print(f"Processing {json_file}...")
+        
+        try:
+            cache_key = cache.key('upi_runs', json_file) if cache else None
+            cached = cache.get(cache_key) if cache else None
+        except OSError as e:
+            print(f"  Error reading {json_file}: {e}")
+            continue
+        if cached is not None:
+            print("  Using cached UPI runs")
+            file_runs = list(zip(cache.attachment_paths(cache_key), cached['line_offsets']))
+            cached_runs.update(run_path for run_path, _ in file_runs)
+            runs.extend((run_path, file_index, line_offset) for run_path, line_offset in file_runs)
+            for example in cached['examples']:
+                if len(summary['examples']) < 10:
+                    summary['examples'].append(dict(example, file=json_file))
+            summary['file_upi_counts'][json_file] = 0
+            continue
+        
+        ranges = split_byte_ranges(json_file, workers) if workers > 1 else [(0, None)]
+        try:
+            with METRICS.stage('scan_upis', bytes_read=os.path.getsize(json_file)) as stage:
+                if len(ranges) > 1:
+                    with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+                        futures = [executor.submit(scan_upi_range_to_runs, json_file, start, end,
+                                                   worker_memory_mb, temp_dir, json_backend)
+                                   for start, end in ranges]
+                        partials = [future.result() for future in futures]
+                else:
+                    partials = [scan_upi_range_to_runs(json_file, memory_mb=memory_mb, temp_dir=temp_dir,
+                                                       json_backend=json_backend)]
+                stage.records = sum(partial['line_count'] for partial in partials)
+        except Exception as e:
+            print(f"  Error reading {json_file}: {e}")
+            continue
+        
+        file_runs = []
+        file_examples = []
+        line_offset = 0
+        for partial in partials:
+            file_runs.extend((run_path, line_offset) for run_path in partial['runs'])
+            file_examples.extend(partial['examples'])
+            line_offset += partial['line_count']
+        
+        if cache and not cache.fits([run_path for run_path, _ in file_runs]):
+            # Moving them in would only have evict() delete them again
+            print("  UPI runs exceed the cache size limit; not caching them")
+        elif cache:
+            run_paths = cache.put(cache_key, {'line_offsets': [offset for _, offset in file_runs],
+                                              'examples': file_examples[:10]},
+                                  attachments=[run_path for run_path, _ in file_runs])
+            if run_paths != [run_path for run_path, _ in file_runs]:
+                cached_runs.update(run_paths)
+            file_runs = [(run_path, offset) for run_path, (_, offset) in zip(run_paths, file_runs)]
+        
+        runs.extend((run_path, file_index, line_offset) for run_path, line_offset in file_runs)
+        for example in file_examples:
+            if len(summary['examples']) < 10:
+                summary['examples'].append(dict(example, file=json_file))
+        summary['file_upi_counts'][json_file] = 0
+    
+    print(f"Merging {len(runs)} sorted UPI runs...")
+    file_upi_counts = summary['file_upi_counts']
+    with METRICS.stage('merge_runs') as stage:
+        for upi, occurrences in group_by_upi(merge_runs(runs, temp_dir=temp_dir, keep=cached_runs)):
+            summary['total_upis'] += 1
+            stage.records += len(occurrences)
+            if summary['sample_upi'] is None:
+                summary['sample_upi'] = upi
+            summary['charset'].update(upi)
+            summary['lengths'].add(len(upi))
+            
+            for file_index in {file_index for file_index, _ in occurrences}:
+                file_upi_counts[json_files[file_index]] += 1
+            
+            if len(occurrences) > 1:
+                summary['duplicate_count'] += 1
+                if len(summary['duplicate_upis']) < max_duplicate_details:
+                    summary['duplicate_upis'][upi] = [f"{json_files[file_index]}:line_{line_num}"
+                                                      for file_index, line_num in occurrences]
+    
+    for json_file, count in file_upi_counts.items():
+        print(f"  {json_file}: found {count} unique UPIs")
+    return summary
+
+def estimate_line_count(json_files: List[str], sample_lines: int = 1000) -> int:
+    """Estimate the total number of lines in the files from their sizes and average line length.
+
+    Compressed files use their estimated decompressed size and the lines
+    at the start of their decompressed stream, so none is read in full.
+    """
+    total = 0
+    for json_file in json_files:
+        try:
+            size = estimate_decompressed_size(json_file)
+            sampled_bytes = sampled_lines = 0
+            with open_input(json_file) as f:
+                for line in f:
+                    sampled_bytes += len(line)
+                    sampled_lines += 1
+                    if sampled_lines >= sample_lines:
+                        break
+        except Exception:
+            continue
+        if sampled_lines:
+            total += int(size / (sampled_bytes / sampled_lines)) + 1
+    return total
+
+def collect_bloom_upis(json_files: List[str], error_rate: float = 0.001,
+                       capacity: Optional[int] = None, max_duplicate_details: int = 1000,
+                       json_backend: str = 'auto') -> Dict[str, Any]:
+    """Check UPI uniqueness over every record with a Bloom filter pre-check.
+
+    The first pass adds every UPI to a Bloom filter and keeps only the UPIs
+    the filter reports as possibly seen before. The second pass records the
+    locations of just those candidates, so the final duplicate list is exact
+    while memory stays proportional to the filter plus the candidates.
+    """
+    summary = _new_summary()
+    decode = get_decoder(json_backend, UPI_FIELDS)
+    if capacity is None:
+        capacity = max(estimate_line_count(json_files), 1000)
+    bloom = BloomFilter(capacity, error_rate)
+    candidates = set()
+    occurrences_per_file = {}
+    
+    print(f"Bloom filter: {bloom.num_bits / 8 / (1024 * 1024):.1f} MB for ~{capacity} UPIs "
+          f"at {error_rate:.4%} false positive rate")
+    
+    # Pass 1: flag UPIs that are possibly repeated
+    for json_file in json_files:
+        print(f"Processing {json_file}...")
+        occurrences = 0
+        try:
+            with METRICS.stage('bloom_pass1', bytes_read=os.path.getsize(json_file)) as stage:
+                for _, line in iter_range_lines(json_file):
+                    upi, record = parse_upi_line(line, decode)
+                    if upi is None:
+                        continue
+                    occurrences += 1
+                    if bloom.add(upi):
+                        candidates.add(upi)
+                    else:
+                        if summary['sample_upi'] is None:
+                            summary['sample_upi'] = upi
+                        summary['charset'].update(upi)
+                        summary['lengths'].add(len(upi))
+                    if len(summary['examples']) < 10:
+                        summary['examples'].append(dict(upi_example(upi, record), file=json_file))
+                stage.records = occurrences
+        except Exception as e:
+            print(f"  Error reading {json_file}: {e}")
+            continue
+        occurrences_per_file[json_file] = occurrences
+    
+    print(f"Bloom filter flagged {len(candidates)} candidate UPIs "
+          f"(expected false positive rate {bloom.false_positive_rate():.4%})")
+    
+    # Pass 2: exact locations for the candidates only
+    locations = defaultdict(list)
+    if candidates:
+        for json_file in occurrences_per_file:
+            with METRICS.stage('bloom_pass2', records=occurrences_per_file[json_file],
+                               bytes_read=os.path.getsize(json_file)):
+                for line_num, line in iter_range_lines(json_file):
+                    upi, _ = parse_upi_line(line, decode)
+                    if upi in candidates:
+                        locations[upi].append((json_file, line_num))
+    
+    # Each UPI counts once overall and once per file it appears in
+    extra_occurrences = 0
+    extra_per_file = Counter()
+    for upi, upi_locations in locations.items():
+        extra_occurrences += len(upi_locations) - 1
+        files = Counter(json_file for json_file, _ in upi_locations)
+        for json_file, count in files.items():
+            extra_per_file[json_file] += count - 1
+        if len(upi_locations) > 1:
+            summary['duplicate_count'] += 1
+            if len(summary['duplicate_upis']) < max_duplicate_details:
+                summary['duplicate_upis'][upi] = [f"{json_file}:line_{line_num}"
+                                                  for json_file, line_num in upi_locations]
+    
+    for json_file, occurrences in occurrences_per_file.items():
+        summary['file_upi_counts'][json_file] = occurrences - extra_per_file[json_file]
+        print(f"  {json_file}: found {summary['file_upi_counts'][json_file]} unique UPIs")
+    summary['total_upis'] = sum(occurrences_per_file.values()) - extra_occurrences
+    
+    # UPIs only ever seen as candidates were skipped above
+    for upi in locations:
+        summary['charset'].update(upi)
+        summary['lengths'].add(len(upi))
+    return summary
+
+def validate_upi_uniqueness(workers: int = 1, exact: bool = False, memory_mb: float = 256,
+                            temp_dir: Optional[str] = None, bloom: bool = False,
+                            bloom_error_rate: float = 0.001, json_backend: str = 'auto',
+                            cache: Optional[ResultCache] = None):
+    """Validate UPI uniqueness across all JSON files.
+
+    cache is used by the exact mode and the single-worker sampled mode; the
+    Bloom mode needs one filter over every file and always re-scans.
+    """
+    
+    print("UPI Primary Key Validation")
+    print("=" * 50)
+    
+    # Find all JSON files
+    json_files = find_json_files()
+    
+    with METRICS.stage('validate_upi_uniqueness') as stage:
+        if bloom:
+            summary = collect_bloom_upis(json_files, error_rate=bloom_error_rate, json_backend=json_backend)
+        elif exact:
+            summary = collect_exact_upis(json_files, workers=workers, memory_mb=memory_mb, temp_dir=temp_dir,
+                                         json_backend=json_backend, cache=cache)
+        else:
+            summary = collect_sampled_upis(json_files, workers=workers, json_backend=json_backend, cache=cache)
+        stage.records = summary['total_upis']
+    
+    if cache:
+        cache.evict()
+        if cache.hits or cache.misses:
+            print(f"Cache: {cache.hits} file(s) reused, {cache.misses} scanned")
+    
+    file_upi_counts = summary['file_upi_counts']
+    duplicate_upis = summary['duplicate_upis']
+    
     print("\n" + "=" * 50)
     print("VALIDATION RESULTS")
     print("=" * 50)
     
-    print(f"Total unique UPIs across all files: {len(all_upis)}")
+    print(f"Total unique UPIs across all files: {summary['total_upis']}")
     print(f"Total files processed: {len(file_upi_counts)}")
     
     print("\nUPIs per file:")
     for file_name, count in file_upi_counts.items():
         print(f"  {file_name}: {count} UPIs")
     
-    print(f"\nDuplicate UPIs found: {len(duplicate_upis)}")
+    print(f"\nDuplicate UPIs found: {summary['duplicate_count']}")
     if duplicate_upis:
         print("Duplicate UPI details:")
         for upi, locations in list(duplicate_upis.items())[:5]:  # Show first 5
@@ -95,20 +498,19 @@ def validate_upi_uniqueness():
         print("✅ No duplicate UPIs found - UPI is a valid unique identifier!")
     
     print("\nUPI Examples:")
-    for example in upi_examples:
+    for example in summary['examples']:
         print(f"  {example['upi']} - {example['asset_class']} {example['instrument_type']} ({example['file']})")
     
     # UPI format analysis
     print(f"\nUPI Format Analysis:")
-    if all_upis:
-        sample_upi = next(iter(all_upis))
+    if summary['sample_upi'] is not None:
+        sample_upi = summary['sample_upi']
         print(f"  Sample UPI: {sample_upi}")
         print(f"  UPI Length: {len(sample_upi)} characters")
-        print(f"  Character set: {''.join(sorted(set(''.join(all_upis))))}")
+        print(f"  Character set: {''.join(sorted(summary['charset']))}")
         
         # Check length consistency
-        lengths = [len(upi) for upi in all_upis]
-        unique_lengths = set(lengths)
+        unique_lengths = summary['lengths']
         print(f"  Length consistency: {len(unique_lengths)} unique length(s): {sorted(unique_lengths)}")
         
         if len(unique_lengths) == 1:
@@ -117,14 +519,61 @@ def validate_upi_uniqueness():
             print(f"  ⚠️  UPIs have varying lengths")
     
     return {
-        'total_upis': len(all_upis),
-        'duplicates': len(duplicate_upis),
+        'total_upis': summary['total_upis'],
+        'duplicates': summary['duplicate_count'],
         'files_processed': len(file_upi_counts),
-        'is_unique': len(duplicate_upis) == 0
+        'is_unique': summary['duplicate_count'] == 0
     }
 
 if __name__ == "__main__":
-    results = validate_upi_uniqueness()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Split each file into byte ranges scanned by this many processes; '
+                             'scans the full file instead of the first 1000 records (default: 1)')
+    parser.add_argument('--exact', action='store_true',
+                        help='Check every record using an on-disk external sort instead of in-memory sets')
+    parser.add_argument('--memory-mb', type=float, default=256,
+                        help='Memory budget for buffered UPIs in --exact mode (default: 256)')
+    parser.add_argument('--temp-dir', default=None,
+                        help='Directory for sorted UPI runs in --exact mode (default: system temp dir)')
+    parser.add_argument('--bloom', action='store_true',
+                        help='Check every record using a Bloom filter pre-check and a second pass '
+                             'over the flagged UPIs only')
+    parser.add_argument('--bloom-error-rate', type=float, default=0.001,
+                        help='Target false positive rate of the Bloom filter (default: 0.001)')
+    parser.add_argument('--json-backend', choices=BACKENDS, default='auto',
+                        help='JSON decoder to use; auto picks the fastest installed one (default: auto)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Re-scan every file instead of reusing cached results of unchanged files')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'Directory of the result cache (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--cache-max-age-days', type=float, default=30,
+                        help='Evict cache entries unused for this many days (default: 30)')
+    parser.add_argument('--cache-max-mb', type=float, default=2048,
+                        help='Evict least recently used cache entries beyond this size (default: 2048)')
+    parser.add_argument('--cache-hash', action='store_true',
+                        help='Key cache entries on a content hash instead of the modification time')
+    parser.add_argument('--metrics', default=None, metavar='PATH',
+                        help='Write per-stage timings, throughput and peak memory to this JSON file')
+    parser.add_argument('--profile', default=None, metavar='PATH',
+                        help='Run under cProfile and write the stats to this file')
+    args = parser.parse_args()
+
+    cache = None
+    if not args.no_cache:
+        cache = ResultCache(args.cache_dir, max_age_days=args.cache_max_age_days,
+                            max_size_mb=args.cache_max_mb, hash_contents=args.cache_hash)
+
+    if args.metrics:
+        METRICS.enable()
+    with profiled(args.profile):
+        results = validate_upi_uniqueness(workers=args.workers, exact=args.exact,
+                                          memory_mb=args.memory_mb, temp_dir=args.temp_dir,
+                                          bloom=args.bloom, bloom_error_rate=args.bloom_error_rate,
+                                          json_backend=args.json_backend, cache=cache)
+    if args.metrics:
+        METRICS.write(args.metrics)
+        print(f"Metrics written to {args.metrics}")
     
     print("\n" + "=" * 50)
     print("CONCLUSION")
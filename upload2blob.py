@@ -1,31 +1,300 @@
 from azure.storage.blob import BlobServiceClient, BlobClient
+import base64
+import bisect
+import hashlib
+import json
+import math
 import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-def upload_large_file_to_blob(file_path, container_name, blob_name, connection_string):
+MB = 1024 * 1024
+
+# Service limits for block blobs
+MAX_BLOCKS = 50000
+MAX_BLOCK_SIZE = 4000 * MB
+
+# Seconds between checkpoint writes while blocks are being staged
+CHECKPOINT_INTERVAL = 2.0
+
+
+class AdaptiveTuner:
+    """Chooses concurrency and block size from the throughput observed so far.
+
+    Concurrency hill-climbs: after each window of completed blocks the
+    measured throughput is compared with the previous window and the last
+    change is kept going if it helped or reversed if it hurt. At the same
+    point the block size is doubled or halved to keep the window's average
+    staging time near target_block_seconds, so fast links get fewer, bigger
+    requests. Every failed attempt to stage a block halves the concurrency.
+    Buffered data is capped at max_buffer_bytes (concurrency * block size).
+    """
+
+    def __init__(self, concurrency=4, min_concurrency=1, max_concurrency=32, block_size=4 * MB,
+                 min_block_size=1 * MB, max_block_size=100 * MB, target_block_seconds=2.0,
+                 max_buffer_bytes=1024 * MB):
+        self.concurrency = concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.block_size = block_size
+        self.min_block_size = min_block_size
+        self.max_block_size = max_block_size
+        self.target_block_seconds = target_block_seconds
+        self.max_buffer_bytes = max_buffer_bytes
+        self._direction = 1
+        self._last_throughput = None
+        self._window_bytes = 0
+        self._window_blocks = 0
+        self._window_seconds = 0.0
+        self._window_start = time.monotonic()
+        # block_failed() is called from the staging threads
+        self._lock = threading.Lock()
+
+    def _clamp(self):
+        self.concurrency = max(self.min_concurrency, min(self.max_concurrency, self.concurrency))
+        self.block_size = max(self.min_block_size, min(self.max_block_size, self.block_size,
+                                                       self.max_buffer_bytes // self.concurrency))
+
+    def block_done(self, size, seconds):
+        with self._lock:
+            self._block_done(size, seconds)
+
+    def _block_done(self, size, seconds):
+        self._window_bytes += size
+        self._window_blocks += 1
+        self._window_seconds += seconds
+        if self._window_blocks < max(self.concurrency, 4):
+            return
+
+        now = time.monotonic()
+        throughput = self._window_bytes / max(now - self._window_start, 1e-9)
+        if self._last_throughput is not None and throughput < self._last_throughput * 0.95:
+            self._direction = -self._direction
+        self._last_throughput = throughput
+        self.concurrency += self._direction * max(1, self.concurrency // 4)
+
+        block_seconds = self._window_seconds / self._window_blocks
+        if block_seconds < self.target_block_seconds / 2:
+            self.block_size *= 2
+        elif block_seconds > self.target_block_seconds * 2:
+            self.block_size //= 2
+
+        self._window_bytes = 0
+        self._window_blocks = 0
+        self._window_seconds = 0.0
+        self._window_start = now
+        self._clamp()
+
+    def block_failed(self):
+        with self._lock:
+            self.concurrency //= 2
+            self._direction = 1
+            self._last_throughput = None
+            self._clamp()
+
+    @property
+    def throughput(self):
+        return self._last_throughput
+
+
+def block_id_for(offset, length):
+    """Deterministic, fixed-length block id for a file range, so a resumed upload recognises its blocks."""
+    return f"{offset:016x}{length:08x}"
+
+
+def block_md5(data):
+    return base64.b64encode(hashlib.md5(data).digest()).decode("ascii")
+
+
+def stage_block_with_retry(blob_client, block_id, data, retries=5, backoff=1.0, tuner=None):
+    """Stage one block with its MD5 checked by the service; returns (base64 MD5, seconds for the last try).
+
+    Each failed attempt is reported to tuner, so the upload backs off while it retries.
+    """
+    md5 = block_md5(data)
+    for attempt in range(retries + 1):
+        start = time.monotonic()
+        try:
+            blob_client.stage_block(block_id, data, length=len(data), validate_content=True)
+            return md5, time.monotonic() - start
+        except Exception:
+            if tuner is not None:
+                tuner.block_failed()
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+class UploadCheckpoint:
+    """JSON record of the blocks already staged for one file/blob pair.
+
+    It is only trusted when the file's size and modification time and the
+    target blob still match.
+    """
+
+    def __init__(self, path, file_path, blob_client):
+        stat = os.stat(file_path)
+        self.path = path
+        self.identity = {
+            "file_size": stat.st_size,
+            "file_mtime_ns": stat.st_mtime_ns,
+            "container": blob_client.container_name,
+            "blob": blob_client.blob_name,
+        }
+        # offset -> {"id", "length", "md5"}
+        self.blocks = {}
+        self._saved_at = 0.0
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        if state.get("identity") == self.identity:
+            self.blocks = {int(offset): block for offset, block in state["blocks"].items()}
+
+    def save(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._saved_at < CHECKPOINT_INTERVAL:
+            return
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"identity": self.identity, "blocks": self.blocks}, f)
+        os.replace(temp_path, self.path)
+        self._saved_at = now
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def upload_file_in_blocks(file_path, blob_client, checkpoint_path=None, tuner=None, retries=5,
+                          verify_resumed=False):
+    """Upload a file as a block blob, resuming from checkpoint_path when a previous attempt stopped.
+
+    Blocks are read in file order and staged concurrently, with the
+    concurrency and block size driven by tuner (see AdaptiveTuner). Every
+    staged block is recorded in the checkpoint. On a retry, blocks that are
+    still staged on the service are reused and only the gaps are uploaded;
+    with verify_resumed their file ranges are re-read and must still match
+    the recorded MD5.
+    The block list is committed in file order at the end and the checkpoint
+    removed. Returns a summary dict.
+    """
+    tuner = tuner or AdaptiveTuner()
+    checkpoint_path = checkpoint_path or f"{file_path}.upload-checkpoint.json"
+    checkpoint = UploadCheckpoint(checkpoint_path, file_path, blob_client)
+    checkpoint.load()
+    file_size = checkpoint.identity["file_size"]
+
+    # Reuse only blocks the service still holds (uncommitted blocks expire after a week)
+    if checkpoint.blocks:
+        _, uncommitted = blob_client.get_block_list("uncommitted")
+        staged = {block.id: block.size for block in uncommitted}
+        checkpoint.blocks = {offset: block for offset, block in checkpoint.blocks.items()
+                             if staged.get(block["id"]) == block["length"]}
+    if verify_resumed and checkpoint.blocks:
+        with open(file_path, "rb") as f:
+            for offset, block in list(checkpoint.blocks.items()):
+                f.seek(offset)
+                if block_md5(f.read(block["length"])) != block["md5"]:
+                    del checkpoint.blocks[offset]
+    resumed_bytes = sum(block["length"] for block in checkpoint.blocks.values())
+    staged_offsets = sorted(checkpoint.blocks)
+
+    start_time = time.monotonic()
+    uploaded_bytes = 0
+    offset = 0
+    block_count = len(checkpoint.blocks)
+    in_flight = {}
+    with open(file_path, "rb") as f, ThreadPoolExecutor(max_workers=tuner.max_concurrency) as executor:
+        try:
+            while offset < file_size or in_flight:
+                while offset < file_size and len(in_flight) < tuner.concurrency:
+                    if offset in checkpoint.blocks:
+                        offset += checkpoint.blocks[offset]["length"]
+                        continue
+                    # Stay within the block count limit and stop at the next staged block
+                    blocks_left = max(MAX_BLOCKS - block_count - len(in_flight), 1)
+                    length = max(tuner.block_size, math.ceil((file_size - offset) / blocks_left))
+                    length = min(length, MAX_BLOCK_SIZE, file_size - offset)
+                    position = bisect.bisect_right(staged_offsets, offset)
+                    next_staged = staged_offsets[position] if position < len(staged_offsets) else file_size
+                    length = min(length, next_staged - offset)
+
+                    f.seek(offset)
+                    data = f.read(length)
+                    block_id = block_id_for(offset, length)
+                    future = executor.submit(stage_block_with_retry, blob_client, block_id, data, retries,
+                                             tuner=tuner)
+                    in_flight[future] = (offset, length, block_id)
+                    offset += length
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                # Record every block that made it before giving up on a failed one,
+                # so a retry does not upload them again
+                error = None
+                for future in done:
+                    block_offset, length, block_id = in_flight.pop(future)
+                    try:
+                        md5, seconds = future.result()
+                    except Exception as e:
+                        error = error or e
+                        continue
+                    checkpoint.blocks[block_offset] = {"id": block_id, "length": length, "md5": md5}
+                    block_count += 1
+                    uploaded_bytes += length
+                    tuner.block_done(length, seconds)
+                if error is not None:
+                    checkpoint.save(force=True)
+                    raise error
+                checkpoint.save()
+        finally:
+            for future in in_flight:
+                future.cancel()
+            checkpoint.save(force=True)
+
+    blob_client.commit_block_list([checkpoint.blocks[o]["id"] for o in sorted(checkpoint.blocks)])
+    checkpoint.remove()
+
+    elapsed = time.monotonic() - start_time
+    return {
+        "size": file_size,
+        "blocks": len(checkpoint.blocks),
+        "uploaded_bytes": uploaded_bytes,
+        "resumed_bytes": resumed_bytes,
+        "seconds": elapsed,
+        "mb_per_sec": uploaded_bytes / MB / elapsed if elapsed else 0.0,
+        "final_concurrency": tuner.concurrency,
+        "final_block_size": tuner.block_size,
+    }
+
+
+def upload_large_file_to_blob(file_path, container_name, blob_name, connection_string, checkpoint_path=None):
     try:
         # Create BlobServiceClient using the connection string
         blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-        
+
         # Get a BlobClient for the specified container and blob
         blob_client = blob_service_client.get_blob_client(container=container_name, blob=blob_name)
-        
-        # Set the chunk size for uploading (4MB in this example)
-        chunk_size = 4 * 1024 * 1024  # 4 MB
-        
-        # Upload the file to Azure Blob Storage using parallel upload
-        with open(file_path, "rb") as file:
-            blob_client.upload_blob(data=file, blob_type="BlockBlob", length=os.path.getsize(file_path),
-                                    max_concurrency=4, max_size=chunk_size)
-        
-        print(f"File '{os.path.basename(file_path)}' uploaded to '{blob_name}' in container '{container_name}' successfully.")
-    
+
+        # Stage blocks concurrently, resuming from the checkpoint of an earlier failed attempt
+        summary = upload_file_in_blocks(file_path, blob_client, checkpoint_path)
+
+        print(f"File '{os.path.basename(file_path)}' uploaded to '{blob_name}' in container '{container_name}' "
+              f"successfully ({summary['blocks']} blocks, {summary['resumed_bytes']} bytes resumed, "
+              f"{summary['mb_per_sec']:.1f} MB/s).")
+
     except Exception as e:
         print(f"An error occurred: {str(e)}")
 
-# Usage
-local_file_path = '/path/to/your/large/file.txt'
-your_container_name = 'your-container-name'
-your_blob_name = 'your-blob-name'
-your_connection_string = 'YOUR_AZURE_STORAGE_CONNECTION_STRING'
+if __name__ == "__main__":
+    # Usage
+    local_file_path = '/path/to/your/large/file.txt'
+    your_container_name = 'your-container-name'
+    your_blob_name = 'your-blob-name'
+    your_connection_string = 'YOUR_AZURE_STORAGE_CONNECTION_STRING'
 
-upload_large_file_to_blob(local_file_path, your_container_name, your_blob_name, your_connection_string)
+    upload_large_file_to_blob(local_file_path, your_container_name, your_blob_name, your_connection_string)